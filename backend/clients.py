@@ -0,0 +1,303 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+import groq
+from groq import AsyncGroq
+
+# Requests to each provider go through one pooled client, a token bucket
+# (requests per second, bursting to *_RATE_BURST; 0 disables the limit) and
+# a retry loop: 429, 5xx and connection errors are retried up to
+# CLIENT_MAX_RETRIES times with full-jitter exponential backoff from
+# CLIENT_RETRY_BACKOFF seconds (capped at CLIENT_RETRY_MAX_DELAY), or after
+# the server's Retry-After when it sends one. The Groq default matches the
+# 30 requests per minute of its vision models on the free tier.
+GROQ_REQUESTS_PER_SECOND = float(os.getenv("GROQ_REQUESTS_PER_SECOND", "0.5"))
+GROQ_RATE_BURST = int(os.getenv("GROQ_RATE_BURST", "5"))
+OLLAMA_REQUESTS_PER_SECOND = float(os.getenv("OLLAMA_REQUESTS_PER_SECOND", "0"))
+OLLAMA_RATE_BURST = int(os.getenv("OLLAMA_RATE_BURST", "8"))
+CLIENT_MAX_RETRIES = int(os.getenv("CLIENT_MAX_RETRIES", "4"))
+CLIENT_RETRY_BACKOFF = float(os.getenv("CLIENT_RETRY_BACKOFF", "0.5"))
+CLIENT_RETRY_MAX_DELAY = float(os.getenv("CLIENT_RETRY_MAX_DELAY", "30"))
+CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "32"))
+CLIENT_TIMEOUT = float(os.getenv("CLIENT_TIMEOUT", "300"))
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+
+class RetryableStatus(Exception):
+    """An HTTP response worth retrying (429 or 5xx)"""
+
+    def __init__(self, status: int, retry_after: Optional[float] = None, body: str = ""):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second on average, up to `capacity` at once"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Wait for a token, returns how long that took"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        # The lock queues waiters in order, so a burst is served first come first served
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class LatencyHistogram:
+    """Call latencies counted in LATENCY_BUCKETS"""
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): count
+                        for bound, count in zip(LATENCY_BUCKETS, self.counts)},
+        }
+
+
+def _parse_retry_after(header: Optional[str]) -> Optional[float]:
+    """Seconds of a Retry-After header (the HTTP-date form is ignored)"""
+    try:
+        return max(float(header), 0.0) if header is not None else None
+    except ValueError:
+        return None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Delay requested by the server, if the error carries one"""
+    if isinstance(error, RetryableStatus):
+        return error.retry_after
+    response = getattr(error, "response", None)
+    return _parse_retry_after(response.headers.get("retry-after") if response is not None else None)
+
+
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(error, (
+        RetryableStatus,
+        aiohttp.ClientConnectionError,
+        asyncio.TimeoutError,
+        groq.RateLimitError,
+        groq.InternalServerError,
+        groq.APIConnectionError,
+    ))
+
+
+class ProviderClient:
+    """Rate limiting, retries and latency tracking shared by every call to one provider"""
+
+    def __init__(self, name: str, rate: float, burst: int, max_retries: int = None):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = CLIENT_MAX_RETRIES if max_retries is None else max_retries
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.stats = {"calls": 0, "retries": 0, "errors": 0, "rate_limited": 0, "throttle_seconds": 0.0}
+        self._loop = None
+        self._closing: set = set()
+
+    async def call(self, operation: str, request: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `request` under the rate limit, retrying transient failures
+
+        Latency is recorded per operation for every attempt, throttling excluded.
+        """
+        histogram = self.latency.setdefault(operation, LatencyHistogram())
+        self.stats["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            self.stats["throttle_seconds"] += await self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                result = await request()
+                histogram.observe(time.perf_counter() - start)
+                return result
+            except Exception as e:
+                histogram.observe(time.perf_counter() - start)
+                if getattr(e, "status", None) == 429 or getattr(e, "status_code", None) == 429:
+                    self.stats["rate_limited"] += 1
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    self.stats["errors"] += 1
+                    raise
+                # Full jitter: concurrent callers that failed together don't retry together
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, CLIENT_RETRY_BACKOFF * 2 ** attempt)
+                delay = min(delay, CLIENT_RETRY_MAX_DELAY)
+                self.stats["retries"] += 1
+                print(f"🟡 {self.name} {operation} failed ({str(e)[:100]}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "latency": {operation: histogram.snapshot() for operation, histogram in self.latency.items()}}
+
+    def _bound_to_running_loop(self) -> bool:
+        """Whether connections opened earlier belong to the running event loop
+
+        Connections can't move between loops, so a client used from a new
+        loop (worker processes, scripts calling asyncio.run again) reconnects,
+        and the session or client of the previous loop is closed.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return True
+        previous, self._loop = self._loop, loop
+        self.bucket = TokenBucket(self.bucket.rate, self.bucket.capacity)
+        closing = self._detach()
+        if closing is not None:
+            if previous.is_running():
+                # Still serving another thread: close the connections on the loop that owns them
+                asyncio.run_coroutine_threadsafe(closing, previous)
+            else:
+                # The loop is gone, close the session and its pool from this one
+                task = asyncio.ensure_future(closing)
+                self._closing.add(task)
+                task.add_done_callback(self._closed)
+        return False
+
+    def _closed(self, task: asyncio.Task) -> None:
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"🟡 Could not close a previous {self.name} client: {task.exception()}")
+
+    def _detach(self) -> Optional[Awaitable[None]]:
+        """Forget the current session or client, returning what closes it (None if there is nothing to close)"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        closing = self._detach()
+        if closing is not None:
+            await closing
+
+
+class HTTPClient(ProviderClient):
+    """JSON over HTTP through one pooled aiohttp session (used for Ollama)"""
+
+    def __init__(self, name: str, rate: float, burst: int, max_retries: int = None):
+        super().__init__(name, rate, burst, max_retries)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def session(self) -> aiohttp.ClientSession:
+        if not self._bound_to_running_loop() or self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=CLIENT_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(total=CLIENT_TIMEOUT)
+            )
+        return self._session
+
+    def _detach(self) -> Optional[Awaitable[None]]:
+        session, self._session = self._session, None
+        return session.close() if session is not None and not session.closed else None
+
+    async def request(self, method: str, url: str, operation: str, payload: Dict[str, Any] = None) -> str:
+        """Send a request and return the body of its successful response"""
+        async def attempt() -> str:
+            async with self.session().request(
+                method, url, json=payload, headers={"Accept": "application/json"}
+            ) as response:
+                body = await response.text()
+                if response.status == 429 or response.status >= 500:
+                    raise RetryableStatus(response.status, _parse_retry_after(response.headers.get("Retry-After")), body)
+                if response.status >= 400:
+                    raise Exception(f"{self.name} {operation} failed with HTTP {response.status}: {body[:200]}")
+                return body
+
+        return await self.call(operation, attempt)
+
+
+class GroqClient(ProviderClient):
+    """One AsyncGroq client (pooled httpx connections), with retries handled here instead of by the SDK"""
+
+    def __init__(self, name: str, rate: float, burst: int, max_retries: int = None):
+        super().__init__(name, rate, burst, max_retries)
+        self._client: Optional[AsyncGroq] = None
+
+    def client(self) -> AsyncGroq:
+        # GROQ_BASE_URL is read by the SDK, e.g. to point it at the stub backend
+        if not self._bound_to_running_loop() or self._client is None:
+            self._client = AsyncGroq(max_retries=0, timeout=CLIENT_TIMEOUT)
+        return self._client
+
+    async def chat(self, operation: str, **kwargs) -> Any:
+        return await self.call(operation, lambda: self.client().chat.completions.create(**kwargs))
+
+    def _detach(self) -> Optional[Awaitable[None]]:
+        client, self._client = self._client, None
+        return client.close() if client is not None else None
+
+
+_clients: Dict[str, ProviderClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client() -> HTTPClient:
+    """The process-wide client for the Ollama API"""
+    with _clients_lock:
+        if "ollama" not in _clients:
+            _clients["ollama"] = HTTPClient("Ollama", OLLAMA_REQUESTS_PER_SECOND, OLLAMA_RATE_BURST)
+        return _clients["ollama"]
+
+
+def get_groq_client() -> GroqClient:
+    """The process-wide client for the Groq API"""
+    with _clients_lock:
+        if "groq" not in _clients:
+            _clients["groq"] = GroqClient("Groq", GROQ_REQUESTS_PER_SECOND, GROQ_RATE_BURST)
+        return _clients["groq"]
+
+
+def get_client_metrics() -> Dict[str, Any]:
+    """Call, retry and error counters and latency histograms of every provider client"""
+    return {name: client.metrics() for name, client in list(_clients.items())}
+
+
+async def close_clients() -> None:
+    for client in list(_clients.values()):
+        await client.close()
@@ -0,0 +1,110 @@
+import os
+import asyncio
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from .clip_extractor import check_clip_request, write_clip
+from .dedup import get_video_registry
+
+# Extracted sequences are kept in CLIP_CACHE_DIR, least recently served
+# first out once they take more than CLIP_CACHE_MAX_BYTES. 0 disables the
+# cache and clips are streamed straight from ffmpeg.
+CLIP_CACHE_DIR = os.getenv("CLIP_CACHE_DIR", "clip_cache")
+CLIP_CACHE_MAX_BYTES = int(os.getenv("CLIP_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+class ClipCache:
+    """Size-bounded LRU of extracted sequences on disk.
+
+    Clips are keyed by the content hash of the source video, the time range
+    and the extraction mode, so renamed or re-uploaded copies of a video
+    share entries. Concurrent requests for a clip that is being extracted
+    wait for that extraction instead of starting their own.
+    """
+
+    def __init__(self, directory: str = CLIP_CACHE_DIR, max_bytes: int = CLIP_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "clips": 0, "bytes": 0}
+
+        # Rebuild the LRU order from access times, dropping interrupted writes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        files = []
+        for path in self.directory.iterdir():
+            if path.name.endswith(".tmp.mp4"):
+                path.unlink(missing_ok=True)
+            elif path.suffix == ".mp4":
+                stat = path.stat()
+                files.append((stat.st_atime, path.stem, stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+        self.size = sum(self._entries.values())
+        self.stats.update(clips=len(self._entries), bytes=self.size)
+
+    async def get(self, video_path: str, time_start: float, time_end: float, mode: Optional[str] = None) -> Path:
+        """Path of the cached clip, extracting it first if needed"""
+        mode = check_clip_request(video_path, time_start, time_end, mode)
+        # Registered videos were hashed on upload or ingest, others are read once
+        registry = get_video_registry()
+        video_hash = registry.content_hash(video_path)
+        if video_hash is None:
+            video_hash = await asyncio.get_running_loop().run_in_executor(None, registry.file_hash, video_path)
+        key = hashlib.sha256(f"{video_hash}:{time_start:.3f}:{time_end:.3f}:{mode}".encode()).hexdigest()
+        path = self.directory / f"{key}.mp4"
+
+        if key in self._entries and path.exists():
+            self.stats["hits"] += 1
+            self._entries.move_to_end(key)
+            os.utime(path)
+            return path
+
+        task = self._pending.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            # A separate task, so the extraction outlives a client that disconnects
+            task = asyncio.ensure_future(self._extract(key, video_path, time_start, time_end, mode))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _extract(self, key: str, video_path: str, time_start: float, time_end: float, mode: str) -> Path:
+        path = self.directory / f"{key}.mp4"
+        tmp_path = self.directory / f"{key}.tmp.mp4"
+        try:
+            await write_clip(video_path, time_start, time_end, str(tmp_path), mode)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self._add(key, path.stat().st_size)
+        return path
+
+    def _add(self, key: str, size: int) -> None:
+        self.size += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        # Always keep the newest clip, even when it alone exceeds the budget
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            old_key, old_size = self._entries.popitem(last=False)
+            try:
+                (self.directory / f"{old_key}.mp4").unlink(missing_ok=True)
+            except OSError as e:
+                # Still being served on a platform that can't delete open files
+                print(f"🟡 Could not evict cached clip {old_key}: {str(e)}")
+            self.size -= old_size
+            self.stats["evictions"] += 1
+        self.stats.update(clips=len(self._entries), bytes=self.size)
+
+
+_clip_cache: Optional[ClipCache] = None
+
+
+def get_clip_cache() -> Optional[ClipCache]:
+    """The process-wide clip cache, None when CLIP_CACHE_MAX_BYTES is 0"""
+    global _clip_cache
+    if _clip_cache is None and CLIP_CACHE_MAX_BYTES > 0:
+        _clip_cache = ClipCache()
+    return _clip_cache
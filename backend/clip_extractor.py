@@ -0,0 +1,217 @@
+import os
+import shutil
+import asyncio
+import tempfile
+from typing import AsyncIterator, Optional
+
+# How sequences are cut out of the source video:
+#   "copy"    - stream copy from the keyframe at or before the start, no
+#               re-encoding, so the clip may begin up to one GOP early
+#   "precise" - re-encode just the requested range with a fast x264 preset,
+#               frame accurate
+#   "moviepy" - the original moviepy subclip + libx264/aac re-encode
+CLIP_MODE = os.getenv("CLIP_MODE", "copy")
+CLIP_MODES = ("copy", "precise", "moviepy")
+CLIP_CHUNK_SIZE = int(os.getenv("CLIP_CHUNK_SIZE", str(64 * 1024)))
+
+# Fragmented MP4 needs no seekable output, so bytes can be sent as ffmpeg writes them
+FRAGMENTED_MP4 = ["-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4"]
+
+
+def find_ffmpeg() -> Optional[str]:
+    """Return an ffmpeg binary, falling back to the one bundled with imageio."""
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def ffmpeg_clip_command(
+    ffmpeg: str,
+    video_path: str,
+    time_start: float,
+    time_end: float,
+    mode: str,
+    output_path: Optional[str] = None
+):
+    """ffmpeg arguments writing the clip between two timestamps to `output_path`
+
+    Without an output path the clip is written to stdout as fragmented MP4.
+    Files get a regular MP4 with the index up front, which players can seek.
+    """
+    # Seeking before -i jumps straight to the nearest keyframe instead of decoding from the start
+    command = [
+        ffmpeg, "-nostdin", "-loglevel", "error",
+        "-ss", f"{time_start:.3f}", "-i", video_path, "-t", f"{time_end - time_start:.3f}",
+        "-map", "0:v:0", "-map", "0:a:0?",
+    ]
+    if mode == "copy":
+        command += ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+    else:
+        command += [
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac",
+        ]
+    if output_path is None:
+        return command + FRAGMENTED_MP4 + ["pipe:1"]
+    return command + ["-movflags", "+faststart", "-f", "mp4", "-y", output_path]
+
+
+async def stream_ffmpeg_clip(
+    video_path: str,
+    time_start: float,
+    time_end: float,
+    mode: str = "copy"
+) -> AsyncIterator[bytes]:
+    """Start ffmpeg and return an iterator over the clip bytes as they are produced.
+
+    The first chunk is read before returning, so a failing extraction raises
+    here rather than after the response headers have been sent.
+    """
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        raise Exception("No ffmpeg binary found")
+
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_clip_command(ffmpeg, video_path, time_start, time_end, mode),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    first_chunk = await process.stdout.read(CLIP_CHUNK_SIZE)
+    if not first_chunk:
+        error = (await process.stderr.read()).decode(errors="replace").strip()
+        await process.wait()
+        raise Exception(f"ffmpeg failed to extract the sequence: {error or process.returncode}")
+
+    async def iterchunks():
+        try:
+            chunk = first_chunk
+            while chunk:
+                yield chunk
+                chunk = await process.stdout.read(CLIP_CHUNK_SIZE)
+            await process.wait()
+            if process.returncode:
+                error = (await process.stderr.read()).decode(errors="replace").strip()
+                print(f"🔴 ffmpeg exited with {process.returncode} while streaming a sequence: {error}")
+        finally:
+            # The client went away before the end of the clip
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    return iterchunks()
+
+
+async def write_ffmpeg_clip(
+    video_path: str,
+    time_start: float,
+    time_end: float,
+    output_path: str,
+    mode: str = "copy"
+) -> str:
+    """Cut the clip between two timestamps into `output_path` with ffmpeg"""
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        raise Exception("No ffmpeg binary found")
+
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_clip_command(ffmpeg, video_path, time_start, time_end, mode, output_path),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    if process.returncode:
+        error = stderr.decode(errors="replace").strip()
+        raise Exception(f"ffmpeg failed to extract the sequence: {error or process.returncode}")
+    return output_path
+
+
+def write_moviepy_clip(video_path: str, time_start: float, time_end: float, output_path: Optional[str] = None) -> str:
+    """Re-encode the subclip with moviepy into `output_path` (a temporary file by default) and return its path"""
+    from moviepy.editor import VideoFileClip
+
+    print("🟢 Loading video with moviepy")
+    video = VideoFileClip(video_path)
+    try:
+        print(f"🟢 Extracting subclip from {time_start} to {time_end}")
+        # Sequences ending on the last sampled frame can reach past the end of the video
+        clip = video.subclip(time_start, min(time_end, video.duration))
+        if output_path is None:
+            with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
+                output_path = temp_file.name
+
+        print("🟢 Writing video with audio")
+        clip.write_videofile(
+            output_path,
+            codec='libx264',
+            audio_codec='aac',
+            temp_audiofile=None,
+            remove_temp=True,
+            logger=None
+        )
+        clip.close()
+        return output_path
+    finally:
+        video.close()
+
+
+async def stream_moviepy_clip(video_path: str, time_start: float, time_end: float) -> AsyncIterator[bytes]:
+    """Encode the whole clip with moviepy (off the event loop), then stream the file"""
+    output_path = await asyncio.get_running_loop().run_in_executor(
+        None, write_moviepy_clip, video_path, time_start, time_end
+    )
+
+    def iterfile():
+        try:
+            with open(output_path, 'rb') as f:
+                yield from iter(lambda: f.read(CLIP_CHUNK_SIZE), b"")
+        finally:
+            try:
+                os.unlink(output_path)
+            except Exception as cleanup_error:
+                print(f"🔴 Error during cleanup: {str(cleanup_error)}")
+
+    return iterfile()
+
+
+def check_clip_request(video_path: str, time_start: float, time_end: float, mode: Optional[str] = None) -> str:
+    """Validate a clip request and return the mode that will serve it"""
+    mode = mode or CLIP_MODE
+    if mode not in CLIP_MODES:
+        raise ValueError(f"Unknown clip mode {mode}, expected one of {CLIP_MODES}")
+    if time_end <= time_start:
+        raise ValueError(f"time_end ({time_end}) must be after time_start ({time_start})")
+    if not os.path.isfile(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+
+    if mode != "moviepy" and find_ffmpeg() is None:
+        print("🟡 No ffmpeg binary found, falling back to moviepy")
+        mode = "moviepy"
+    return mode
+
+
+async def write_clip(video_path: str, time_start: float, time_end: float, output_path: str, mode: Optional[str] = None) -> str:
+    """Write the MP4 of a sequence to `output_path`, using `mode` (see CLIP_MODES)"""
+    mode = check_clip_request(video_path, time_start, time_end, mode)
+    if mode == "moviepy":
+        return await asyncio.get_running_loop().run_in_executor(
+            None, write_moviepy_clip, video_path, time_start, time_end, output_path
+        )
+    return await write_ffmpeg_clip(video_path, time_start, time_end, output_path, mode)
+
+
+async def stream_clip(
+    video_path: str,
+    time_start: float,
+    time_end: float,
+    mode: Optional[str] = None
+):
+    """Return an iterator over the MP4 bytes of a sequence, using `mode` (see CLIP_MODES)"""
+    mode = check_clip_request(video_path, time_start, time_end, mode)
+    if mode == "moviepy":
+        return await stream_moviepy_clip(video_path, time_start, time_end)
+    return await stream_ffmpeg_clip(video_path, time_start, time_end, mode)
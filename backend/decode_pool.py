@@ -0,0 +1,183 @@
+import os
+import re
+import subprocess
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import frame_encoding
+from .clip_extractor import find_ffmpeg
+from .dedup import perceptual_hash
+from .frame_encoding import encode_frame
+from .frame_sampler import frame_signature, get_video_info, sample_frames
+
+# With fixed-interval sampling, videos of at least PARALLEL_DECODE_MIN_SECONDS
+# are split into keyframe-aligned ranges of about DECODE_RANGE_SECONDS that
+# DECODE_PROCESSES processes decode and sample concurrently (1 decodes every
+# video in a thread of the API process, as before).
+DECODE_PROCESSES = int(os.getenv("DECODE_PROCESSES", "1"))
+DECODE_RANGE_SECONDS = float(os.getenv("DECODE_RANGE_SECONDS", "60"))
+PARALLEL_DECODE_MIN_SECONDS = float(os.getenv("PARALLEL_DECODE_MIN_SECONDS", "120"))
+
+# (frame_number, timestamp, jpeg, signature, frame_hash)
+PreparedSample = Tuple[int, float, bytes, np.ndarray, int]
+
+_PTS = re.compile(r"^0,\s*-?\d+,\s*(-?\d+),")
+
+
+def prepare_sample(
+    frame_number: int,
+    timestamp: float,
+    frame: np.ndarray,
+    quality: int = None,
+    max_dimension: int = None
+) -> PreparedSample:
+    """Everything the pipeline needs from a decoded frame, so the frame itself can be dropped
+
+    The JPEG is sent to the vision model and saved as the thumbnail, the
+    signature flags near-identical consecutive samples and the perceptual
+    hash finds matching frames across videos.
+    """
+    jpeg = encode_frame(frame, quality, max_dimension)
+    return frame_number, timestamp, jpeg, frame_signature(frame), perceptual_hash(frame)
+
+
+def prepare_samples(samples: Iterator[Tuple[int, float, np.ndarray]]) -> Iterator[PreparedSample]:
+    for frame_number, timestamp, frame in samples:
+        yield prepare_sample(frame_number, timestamp, frame)
+
+
+def keyframe_positions(video_path: str, fps: float) -> List[int]:
+    """Frame numbers of the video's keyframes, read from packet flags without decoding
+
+    Returns an empty list when ffmpeg is unavailable or fails.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return []
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-v", "error", "-i", video_path, "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"],
+            capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"🟡 Could not list keyframes of {video_path}: {str(e)}")
+        return []
+
+    time_base = None
+    keyframes = []
+    for line in result.stdout.splitlines():
+        if line.startswith("#tb 0:"):
+            numerator, denominator = line.split(":")[1].strip().split("/")
+            time_base = int(numerator) / int(denominator)
+            continue
+        match = _PTS.match(line)
+        # framecrc only prints packet flags ("F=0x...") when they aren't exactly "keyframe"
+        if match and time_base and "F=" not in line:
+            keyframes.append(round(int(match.group(1)) * time_base * fps))
+    return sorted(set(keyframes))
+
+
+def split_ranges(frame_count: int, fps: float, keyframes: List[int], range_seconds: float) -> List[Tuple[int, int]]:
+    """Cut [0, frame_count) into ranges of about `range_seconds`, each starting on a keyframe
+
+    A range starting on a keyframe can be decoded from its first frame
+    without decoding any frame of the previous range. Without keyframes the
+    boundaries fall every `range_seconds`.
+    """
+    step = max(int(fps * range_seconds), 1)
+    boundaries = [0]
+    keyframes = np.asarray(sorted(k for k in keyframes if 0 < k < frame_count), dtype=np.int64)
+    for target in range(step, frame_count, step):
+        if len(keyframes):
+            # Last keyframe at or before the target
+            index = np.searchsorted(keyframes, target, side="right") - 1
+            if index < 0:
+                continue
+            target = int(keyframes[index])
+        if target > boundaries[-1]:
+            boundaries.append(target)
+    boundaries.append(frame_count)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def prepare_range(
+    video_path: str,
+    interval_seconds: float,
+    start_frame: int,
+    end_frame: int,
+    quality: int,
+    max_dimension: int
+) -> List[PreparedSample]:
+    """Decode and prepare the samples of one range (runs in a pool process)"""
+    return [
+        prepare_sample(frame_number, timestamp, frame, quality, max_dimension)
+        for frame_number, timestamp, frame in sample_frames(video_path, interval_seconds, start_frame, end_frame)
+    ]
+
+
+def parallel_samples(
+    video_path: str,
+    interval_seconds: float,
+    processes: int = None,
+    range_seconds: float = None
+) -> Iterator[PreparedSample]:
+    """Prepared samples of a whole video, decoded range by range in the process pool, in timestamp order
+
+    At most two ranges per process are decoded ahead of the consumer, which
+    bounds memory when captioning is slower than decoding.
+    """
+    processes = processes or DECODE_PROCESSES
+    range_seconds = range_seconds or DECODE_RANGE_SECONDS
+    info = get_video_info(video_path, interval_seconds)
+    ranges = split_ranges(info["frame_count"], info["fps"], keyframe_positions(video_path, info["fps"]), range_seconds)
+    print(f"🟢 Decoding {video_path} as {len(ranges)} ranges in {processes} processes")
+
+    pool = get_decode_pool(processes)
+    settings = (frame_encoding.FRAME_JPEG_QUALITY, frame_encoding.FRAME_MAX_DIMENSION)
+    pending = deque()
+    ranges = iter(ranges)
+    try:
+        while True:
+            while len(pending) < processes * 2:
+                next_range = next(ranges, None)
+                if next_range is None:
+                    break
+                pending.append(pool.submit(prepare_range, video_path, interval_seconds, *next_range, *settings))
+            if not pending:
+                return
+            # Ranges are consumed in submission order, so samples come out sorted by timestamp
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def use_parallel_decode(duration: float, sampling_mode: str, processes: Optional[int] = None) -> bool:
+    """Whether a video should go through the decode pool"""
+    processes = processes or DECODE_PROCESSES
+    return processes > 1 and sampling_mode == "fixed" and duration >= PARALLEL_DECODE_MIN_SECONDS
+
+
+_decode_pools = {}
+_pool_lock = threading.Lock()
+
+
+def get_decode_pool(processes: int) -> ProcessPoolExecutor:
+    """The process-wide pool of `processes` decode processes, shared by all videos"""
+    with _pool_lock:
+        if processes not in _decode_pools:
+            # Spawned rather than forked: the parent runs threads (asyncio executors, FAISS)
+            _decode_pools[processes] = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+        return _decode_pools[processes]
+
+
+def close_decode_pools() -> None:
+    with _pool_lock:
+        for pool in _decode_pools.values():
+            pool.shutdown(cancel_futures=True)
+        _decode_pools.clear()
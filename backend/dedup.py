@@ -0,0 +1,277 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+import cv2
+import numpy as np
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Videos are identified by the SHA-256 of their content: uploading a file
+# that was already processed (or is being processed) returns its task.
+VIDEO_REGISTRY_PATH = os.getenv("VIDEO_REGISTRY_PATH", "video_registry.db")
+
+# Frames of the same video whose 64-bit difference hashes are at most
+# FRAME_HASH_DISTANCE bits apart reuse each other's caption and embedding.
+# Across videos the hashes must be at most FRAME_HASH_CROSS_VIDEO_DISTANCE
+# bits apart (identical by default): dark, static or talking-head frames of
+# unrelated videos often land within a few bits of each other. The last
+# FRAME_DEDUP_SIZE captioned frames are remembered per vision model (0
+# disables frame dedup).
+FRAME_HASH_DISTANCE = int(os.getenv("FRAME_HASH_DISTANCE", "4"))
+FRAME_HASH_CROSS_VIDEO_DISTANCE = int(os.getenv("FRAME_HASH_CROSS_VIDEO_DISTANCE", "0"))
+FRAME_DEDUP_SIZE = int(os.getenv("FRAME_DEDUP_SIZE", "20000"))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hash_file(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """SHA-256 of a file's content, the key of the video registry"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def perceptual_hash(frame: np.ndarray) -> int:
+    """64-bit difference hash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its right neighbour
+
+    Robust to re-encoding, scaling and small brightness changes, unlike a
+    hash of the pixels.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class VideoRegistry:
+    """Content hash -> task of every uploaded video, in SQLite
+
+    Also remembers the hash of every file hashed through `file_hash`, with
+    its size and modification time, so unchanged files are not read again.
+    """
+
+    def __init__(self, path: str = VIDEO_REGISTRY_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS videos (
+                sha256 TEXT PRIMARY KEY,
+                task_id TEXT NOT NULL,
+                video_path TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS videos_path ON videos (video_path)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self.stats = {"lookups": 0, "hits": 0}
+
+    def find(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """The task that processed (or is processing) this content, unless it failed or its file is gone"""
+        with self._lock:
+            self.stats["lookups"] += 1
+            row = self._conn.execute(
+                "SELECT task_id, video_path, status FROM videos WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        if row is None or row[2] == "failed" or not os.path.exists(row[1]):
+            return None
+        self.stats["hits"] += 1
+        return {"task_id": row[0], "video_path": row[1], "status": row[2]}
+
+    def content_hash(self, video_path: str) -> Optional[str]:
+        """SHA-256 recorded for a registered video file, as uploaded or ingested"""
+        paths = {video_path, os.path.normpath(video_path), os.path.abspath(video_path)}
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT sha256 FROM videos WHERE video_path IN ({', '.join('?' * len(paths))}) ORDER BY updated DESC LIMIT 1",
+                tuple(paths)
+            ).fetchone()
+        return row[0] if row else None
+
+    def file_hash(self, path: str) -> str:
+        """SHA-256 of a file, read again only when its size or modification time changed since it was last hashed"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        if row is not None:
+            return row[0]
+        sha256 = hash_file(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)", (path, stat.st_size, stat.st_mtime_ns, sha256)
+            )
+            self._conn.commit()
+        return sha256
+
+    def register(self, sha256: str, task_id: str, video_path: str) -> None:
+        """Record a video whose processing is starting"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, 'processing', ?)",
+                (sha256, task_id, video_path, time.time())
+            )
+            self._conn.commit()
+
+    def set_status(self, sha256: str, status: str) -> None:
+        """Mark a video as "done" or "failed" (failed videos are processed again on the next upload)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE videos SET status = ?, updated = ? WHERE sha256 = ?", (status, time.time(), sha256)
+            )
+            self._conn.commit()
+
+
+class FrameDedupIndex:
+    """Recently captioned frames of one vision model, searchable by perceptual hash.
+
+    Each entry remembers the caption and, once computed, the embedding of
+    that caption for every embedding model, so a matching frame skips both
+    the vision model and the embedding call. Frames match within
+    `max_distance` bits in the same video, `cross_video_distance` otherwise.
+    """
+
+    def __init__(self, capacity: int = None, max_distance: int = None, cross_video_distance: int = None):
+        self.capacity = FRAME_DEDUP_SIZE if capacity is None else capacity
+        self.max_distance = FRAME_HASH_DISTANCE if max_distance is None else max_distance
+        self.cross_video_distance = (
+            FRAME_HASH_CROSS_VIDEO_DISTANCE if cross_video_distance is None else cross_video_distance
+        )
+        capacity = self.capacity
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        # Keyed by the hash of the video's path, so nothing outlives the entries of a video
+        self._videos = np.zeros(capacity, dtype=np.int64)
+        self._captions: List[Optional[str]] = [None] * capacity
+        self._vectors: List[Dict[str, List[float]]] = [{} for _ in range(capacity)]  # model -> vector
+        self._slots: Dict[str, int] = {}  # caption -> slot, to attach embeddings
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "caption_hits": 0, "embedding_lookups": 0, "embedding_hits": 0}
+
+    def find_caption(self, frame_hash: int, video: str = None) -> Optional[str]:
+        """Caption of the closest stored frame close enough to `frame_hash`, a frame of `video`"""
+        with self._lock:
+            self.stats["lookups"] += 1
+            if not self._size:
+                return None
+            differences = self._hashes[:self._size] ^ np.uint64(frame_hash)
+            distances = _POPCOUNT[differences.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+            same_video = self._videos[:self._size] == hash(video)
+            # Out of reach entries are pushed past any real distance (64 bits)
+            distances[distances > np.where(same_video, self.max_distance, self.cross_video_distance)] = 65
+            slot = int(np.argmin(distances))
+            if distances[slot] > 64:
+                return None
+            self.stats["caption_hits"] += 1
+            return self._captions[slot]
+
+    def add_caption(self, frame_hash: int, caption: str, video: str = None) -> None:
+        """Remember the caption of a frame of `video`, replacing the oldest entry once full"""
+        if not self.capacity:
+            return
+        with self._lock:
+            slot = self._next
+            old_caption = self._captions[slot]
+            if old_caption is not None and self._slots.get(old_caption) == slot:
+                del self._slots[old_caption]
+            self._hashes[slot] = frame_hash
+            self._videos[slot] = hash(video)
+            self._captions[slot] = caption
+            self._vectors[slot] = {}
+            self._slots[caption] = slot
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def find_embedding(self, caption: str, model: str) -> Optional[List[float]]:
+        with self._lock:
+            self.stats["embedding_lookups"] += 1
+            slot = self._slots.get(caption)
+            vector = self._vectors[slot].get(model) if slot is not None else None
+            if vector is not None:
+                self.stats["embedding_hits"] += 1
+            return vector
+
+    def add_embedding(self, caption: str, model: str, vector: List[float]) -> None:
+        """Attach an embedding to a stored caption (ignored for captions not in the index)"""
+        with self._lock:
+            slot = self._slots.get(caption)
+            if slot is not None:
+                self._vectors[slot][model] = vector
+
+
+def dedup_encoder(
+    encode: Callable[[List[str]], Awaitable[List[List[float]]]],
+    frame_index: FrameDedupIndex,
+    model: str
+) -> Callable[[List[str]], Awaitable[List[List[float]]]]:
+    """Wrap a batch encoder so captions already embedded for the frame index are not embedded again"""
+    async def encode_with_reuse(texts: List[str]) -> List[List[float]]:
+        known = {text: frame_index.find_embedding(text, model) for text in set(texts)}
+        # Each missing caption is embedded once, however many frames share it
+        missing = [text for text, vector in known.items() if vector is None]
+        if missing:
+            for text, vector in zip(missing, await encode(missing)):
+                known[text] = vector
+                frame_index.add_embedding(text, model, vector)
+        return [known[text] for text in texts]
+
+    return encode_with_reuse
+
+
+_video_registry: Optional[VideoRegistry] = None
+_frame_indexes: Dict[str, FrameDedupIndex] = {}
+_instances_lock = threading.Lock()
+
+
+def get_video_registry() -> VideoRegistry:
+    """The process-wide registry of processed videos"""
+    global _video_registry
+    with _instances_lock:
+        if _video_registry is None:
+            _video_registry = VideoRegistry()
+        return _video_registry
+
+
+def get_frame_index(vision_model: str) -> FrameDedupIndex:
+    """The process-wide frame dedup index for captions from `vision_model`"""
+    with _instances_lock:
+        if vision_model not in _frame_indexes:
+            _frame_indexes[vision_model] = FrameDedupIndex()
+        return _frame_indexes[vision_model]
+
+
+def get_dedup_metrics() -> Dict[str, Any]:
+    """Hit counters and hit rates of the video and frame dedup layers"""
+    def rate(hits, lookups):
+        return hits / lookups if lookups else 0.0
+
+    metrics: Dict[str, Any] = {}
+    if _video_registry is not None:
+        stats = _video_registry.stats
+        metrics["videos"] = {**stats, "hit_rate": rate(stats["hits"], stats["lookups"])}
+    metrics["frames"] = {
+        model: {
+            **index.stats,
+            "caption_hit_rate": rate(index.stats["caption_hits"], index.stats["lookups"]),
+            "embedding_hit_rate": rate(index.stats["embedding_hits"], index.stats["embedding_lookups"]),
+        }
+        for model, index in _frame_indexes.items()
+    }
+    return metrics
@@ -0,0 +1,80 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from transformers import AutoModel
+
+JINA_MODEL_NAME = "jinaai/jina-embeddings-v2-base-en"
+
+# Inference runs on a dedicated pool so slow encodes never starve the
+# default executor used for decoding and file I/O.
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "2"))
+
+_models: Dict[str, Any] = {}
+_load_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=EMBEDDING_THREADS, thread_name_prefix="embedding")
+_metrics: Dict[str, Dict[str, float]] = {}
+
+
+def get_embedding_model(model_name: str = JINA_MODEL_NAME):
+    """Return the process-wide instance of an embedding model, loading it on first use."""
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _load_lock:
+        if model_name not in _models:
+            print(f"🟡 Loading embedding model {model_name}...")
+            start = time.perf_counter()
+            model = AutoModel.from_pretrained(model_name, trust_remote_code=True)
+            load_seconds = time.perf_counter() - start
+            _models[model_name] = model
+            _model_metrics(model_name)["load_seconds"] = load_seconds
+            print(f"🟢 Loaded embedding model {model_name} in {load_seconds:.2f}s")
+    return _models[model_name]
+
+
+async def load_embedding_model(model_name: str = JINA_MODEL_NAME):
+    """Load (or fetch) a model without blocking the event loop."""
+    if model_name in _models:
+        return _models[model_name]
+    return await asyncio.get_running_loop().run_in_executor(_executor, get_embedding_model, model_name)
+
+
+async def encode_texts(texts: List[str], model_name: str = JINA_MODEL_NAME) -> List[List[float]]:
+    """Embed a list of texts on the inference thread pool."""
+    model = await load_embedding_model(model_name)
+    start = time.perf_counter()
+    vectors = await asyncio.get_running_loop().run_in_executor(_executor, model.encode, texts)
+    elapsed = time.perf_counter() - start
+
+    metrics = _model_metrics(model_name)
+    metrics["calls"] += 1
+    metrics["texts"] += len(texts)
+    metrics["total_seconds"] += elapsed
+    metrics["max_seconds"] = max(metrics["max_seconds"], elapsed)
+    return [vector.tolist() for vector in vectors]
+
+
+def get_embedding_metrics() -> Dict[str, Dict[str, float]]:
+    """Load time and per-call latency for every model used by this process."""
+    return {
+        name: {
+            **metrics,
+            "loaded": name in _models,
+            "avg_seconds": metrics["total_seconds"] / metrics["calls"] if metrics["calls"] else 0.0,
+        }
+        for name, metrics in _metrics.items()
+    }
+
+
+def _model_metrics(model_name: str) -> Dict[str, float]:
+    return _metrics.setdefault(model_name, {
+        "load_seconds": 0.0,
+        "calls": 0,
+        "texts": 0,
+        "total_seconds": 0.0,
+        "max_seconds": 0.0,
+    })
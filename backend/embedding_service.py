@@ -0,0 +1,128 @@
+import os
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Embedding batches are flushed when they reach EMBED_BATCH_SIZE texts or
+# when the oldest pending text has waited EMBED_FLUSH_INTERVAL seconds.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_FLUSH_INTERVAL = float(os.getenv("EMBED_FLUSH_INTERVAL", "2.0"))
+PINECONE_UPSERT_BATCH = int(os.getenv("PINECONE_UPSERT_BATCH", "100"))
+
+Encoder = Callable[[List[str]], Awaitable[List[List[float]]]]
+Sink = Callable[[List[List[float]], List[Dict[str, Any]]], Awaitable[None]]
+FailureHandler = Callable[[List[Dict[str, Any]]], None]
+
+
+def chunked(items: List[Any], size: int) -> List[List[Any]]:
+    """Split a list into consecutive chunks of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def concurrent_encoder(embed_one: Callable[[str], Awaitable[List[float]]], concurrency: int) -> Encoder:
+    """Build a batch encoder out of a single-text endpoint, running up to `concurrency` calls at once."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed(text: str) -> List[float]:
+        async with semaphore:
+            return await embed_one(text)
+
+    async def encode(texts: List[str]) -> List[List[float]]:
+        return list(await asyncio.gather(*[embed(text) for text in texts]))
+
+    return encode
+
+
+class EmbeddingBatcher:
+    """Collect texts across frames, embed them in batches and hand the vectors to a sink.
+
+    Up to `max_in_flight` batches are encoded concurrently; `add` waits once
+    that many are pending, which keeps the number of buffered texts bounded.
+    `on_failure` gets the metadata of every batch that could not be embedded
+    or stored.
+    """
+
+    def __init__(
+        self,
+        encode: Encoder,
+        sink: Sink,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_in_flight: int = 1,
+        on_failure: FailureHandler = None
+    ):
+        self.encode = encode
+        self.sink = sink
+        self.on_failure = on_failure
+        self.batch_size = batch_size or EMBED_BATCH_SIZE
+        self.flush_interval = EMBED_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._texts: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight: set = set()
+        self._deadline: Optional[asyncio.Task] = None
+        self.stats = {"vectors": 0, "batches": 0, "failed": 0, "encode_seconds": 0.0, "sink_seconds": 0.0}
+
+    async def add(self, text: str, metadata: Dict[str, Any]) -> None:
+        """Queue a text for embedding, flushing when the batch is full."""
+        self._texts.append(text)
+        self._metadata.append(metadata)
+        if len(self._texts) >= self.batch_size:
+            await self.flush()
+        elif self._deadline is None and self.flush_interval > 0:
+            self._deadline = self._track(self._flush_after_deadline())
+
+    async def flush(self) -> None:
+        """Start embedding everything buffered so far."""
+        if self._deadline is not None:
+            self._deadline.cancel()
+            self._deadline = None
+        if not self._texts:
+            return
+
+        texts, metadata = self._texts, self._metadata
+        self._texts, self._metadata = [], []
+        await self._slots.acquire()
+        self._track(self._process(texts, metadata))
+
+    async def close(self) -> None:
+        """Flush the remaining texts and wait for every batch to be stored."""
+        await self.flush()
+        while self._in_flight:
+            await asyncio.gather(*list(self._in_flight), return_exceptions=True)
+
+    def cancel(self) -> None:
+        """Drop the buffered texts and cancel the batches in flight."""
+        self._texts, self._metadata = [], []
+        for task in list(self._in_flight):
+            task.cancel()
+
+    def _track(self, coroutine) -> asyncio.Task:
+        task = asyncio.ensure_future(coroutine)
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+        return task
+
+    async def _flush_after_deadline(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        # Past this point the flush must not be cancelled, it owns the buffered texts
+        self._deadline = None
+        await self.flush()
+
+    async def _process(self, texts: List[str], metadata: List[Dict[str, Any]]) -> None:
+        try:
+            start = time.perf_counter()
+            vectors = await self.encode(texts)
+            encoded = time.perf_counter()
+            await self.sink(vectors, metadata)
+            self.stats["encode_seconds"] += encoded - start
+            self.stats["sink_seconds"] += time.perf_counter() - encoded
+            self.stats["vectors"] += len(vectors)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["failed"] += len(texts)
+            print(f"🔴 Error embedding batch of {len(texts)} texts: {str(e)}")
+            if self.on_failure:
+                self.on_failure(metadata)
+        finally:
+            self._slots.release()
@@ -0,0 +1,78 @@
+import os
+import asyncio
+import cv2
+import numpy as np
+from typing import Set
+
+# JPEG settings for sampled frames. The same encoded buffer is sent to the
+# vision model and written as the thumbnail, so both shrink together.
+FRAME_JPEG_QUALITY = int(os.getenv("FRAME_JPEG_QUALITY", "85"))
+FRAME_MAX_DIMENSION = int(os.getenv("FRAME_MAX_DIMENSION", "1024"))  # 0 keeps full resolution
+SAVE_FRAMES = os.getenv("SAVE_FRAMES", "true").lower() == "true"
+# Decoding waits once THUMBNAIL_MAX_PENDING thumbnails are queued for a disk
+# slower than it, instead of holding ever more JPEG buffers in memory.
+THUMBNAIL_MAX_PENDING = int(os.getenv("THUMBNAIL_MAX_PENDING", "32"))
+
+
+def encode_frame(frame: np.ndarray, quality: int = None, max_dimension: int = None) -> bytes:
+    """Encode a frame to JPEG in memory, downscaling it to `max_dimension` first.
+
+    Args:
+        frame: BGR frame as returned by OpenCV
+        quality: JPEG quality (0-100), defaults to FRAME_JPEG_QUALITY
+        max_dimension: Longest side in pixels, defaults to FRAME_MAX_DIMENSION (0 = no resize)
+    Returns:
+        The JPEG bytes
+    """
+    quality = FRAME_JPEG_QUALITY if quality is None else quality
+    max_dimension = FRAME_MAX_DIMENSION if max_dimension is None else max_dimension
+
+    height, width = frame.shape[:2]
+    if max_dimension and max(height, width) > max_dimension:
+        scale = max_dimension / max(height, width)
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise Exception("Failed to encode frame as JPEG")
+    return buffer.tobytes()
+
+
+class ThumbnailWriter:
+    """Write already-encoded JPEG buffers to disk off the event loop, at most `max_pending` at a time."""
+
+    def __init__(self, enabled: bool = None, max_pending: int = None):
+        self.enabled = SAVE_FRAMES if enabled is None else enabled
+        self._pending: Set[asyncio.Future] = set()
+        self._slots = asyncio.Semaphore(max(THUMBNAIL_MAX_PENDING if max_pending is None else max_pending, 1))
+
+    async def write(self, path: str, data: bytes) -> str:
+        """Schedule a write and return the path that will be stored in the metadata.
+
+        Waits for a slot while `max_pending` writes are in flight. Returns an
+        empty path when thumbnails are disabled.
+        """
+        if not self.enabled:
+            return ""
+        await self._slots.acquire()
+        future = asyncio.get_running_loop().run_in_executor(None, self._write_file, path, data)
+        self._pending.add(future)
+        future.add_done_callback(self._written)
+        return path
+
+    def _written(self, future: asyncio.Future) -> None:
+        self._pending.discard(future)
+        self._slots.release()
+
+    async def flush(self) -> None:
+        """Wait for all scheduled writes to finish."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+        except Exception as e:
+            print(f"🔴 Error writing thumbnail {path}: {str(e)}")
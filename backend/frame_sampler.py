@@ -0,0 +1,176 @@
+import cv2
+import numpy as np
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+
+def get_video_info(video_path: str, interval_seconds: float = 2.0) -> Dict[str, float]:
+    """Read fps, frame count and sampling interval from the container header."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Failed to open video file: {video_path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+    frame_interval = max(int(fps * interval_seconds), 1)
+    return {
+        "fps": fps,
+        "frame_count": frame_count,
+        "frame_interval": frame_interval,
+        "total_samples": max(-(-frame_count // frame_interval), 1),
+    }
+
+
+def sample_frames(
+    video_path: str,
+    interval_seconds: float = 2.0,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    max_skip: Optional[int] = None
+) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Decode a video in a single forward pass and yield sampled frames.
+
+    Frames between two samples are only grabbed, so they are decoded but never
+    converted to BGR, and the decoder never has to restart from a keyframe as
+    it does with a `CAP_PROP_POS_FRAMES` seek before every sample.
+
+    Args:
+        video_path: Path of the video to decode
+        interval_seconds: Time between two sampled frames
+        start_frame: First frame of the range to sample (snapped to the sampling grid)
+        end_frame: Frame at which to stop (exclusive), defaults to the end of the video
+        max_skip: When more than this many frames separate two samples, seek
+            instead of grabbing through them. Only worth it for sparse sampling
+            of long-GOP files; None always decodes sequentially.
+    Yields:
+        (frame_number, timestamp, frame) for every sampled frame
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Failed to open video file: {video_path}")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_interval = max(int(fps * interval_seconds), 1)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if end_frame is None or (frame_count > 0 and end_frame > frame_count):
+            end_frame = frame_count if frame_count > 0 else float("inf")
+
+        # Snap the first sample onto the same grid as a full-video pass
+        next_sample = -(-start_frame // frame_interval) * frame_interval
+        position = 0
+        if next_sample > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, next_sample)
+            position = next_sample
+
+        while next_sample < end_frame:
+            if max_skip is not None and next_sample - position > max_skip:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, next_sample)
+                position = next_sample
+
+            while position < next_sample:
+                if not cap.grab():
+                    return
+                position += 1
+
+            if not cap.grab():
+                return
+            position += 1
+            ret, frame = cap.retrieve()
+            if not ret:
+                print(f"Failed to read frame at position {next_sample}")
+                return
+
+            yield next_sample, next_sample / fps, frame
+            next_sample += frame_interval
+    finally:
+        cap.release()
+
+
+def frame_signature(frame: np.ndarray, size: Tuple[int, int] = (64, 36)) -> np.ndarray:
+    """Downscaled grayscale thumbnail used for cheap frame comparisons."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute pixel difference between two signatures, from 0 (identical) to 1."""
+    return float(np.mean(np.abs(a - b))) / 255.0
+
+
+def sample_scene_changes(
+    video_path: str,
+    min_interval: float = 1.0,
+    max_interval: float = 10.0,
+    scene_threshold: float = 0.1,
+    analysis_interval: float = 0.25
+) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Sample frames at scene changes instead of at a fixed interval.
+
+    Every `analysis_interval` seconds a frame is downscaled and compared with
+    the last sampled frame. It becomes a sample when the difference exceeds
+    `scene_threshold` and at least `min_interval` has passed, or when nothing
+    was sampled for `max_interval`. All other frames are only grabbed.
+
+    Yields:
+        (frame_number, timestamp, frame) for every sampled frame
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Failed to open video file: {video_path}")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        analysis_step = max(int(fps * analysis_interval), 1)
+        min_gap = max(int(fps * min_interval), 1)
+        max_gap = max(int(fps * max_interval), min_gap)
+
+        position = 0
+        last_sample = None
+        last_signature = None
+        while cap.grab():
+            frame_number = position
+            position += 1
+            since_last = frame_number - last_sample if last_sample is not None else max_gap
+            if frame_number % analysis_step and since_last < max_gap:
+                continue
+
+            ret, frame = cap.retrieve()
+            if not ret:
+                print(f"Failed to read frame at position {frame_number}")
+                return
+
+            signature = frame_signature(frame)
+            if since_last < max_gap:
+                if since_last < min_gap or frame_difference(signature, last_signature) < scene_threshold:
+                    continue
+
+            last_sample = frame_number
+            last_signature = signature
+            yield frame_number, frame_number / fps, frame
+    finally:
+        cap.release()
+
+
+def mark_duplicates(
+    samples: Iterator[Tuple],
+    duplicate_threshold: float = 0.02,
+    signature: Optional[Callable[[Tuple], np.ndarray]] = None
+) -> Iterator[Tuple]:
+    """Flag samples that are near-identical to the last non-duplicate sample.
+
+    A flagged sample can reuse the caption of that earlier frame instead of
+    going through the vision model again. Each sample is yielded with the
+    flag appended; `signature` extracts a precomputed signature from a
+    sample, by default it is computed from the frame of (frame_number,
+    timestamp, frame) samples.
+    """
+    reference = None
+    for sample in samples:
+        current = signature(sample) if signature else frame_signature(sample[2])
+        duplicate = reference is not None and frame_difference(current, reference) < duplicate_threshold
+        if not duplicate:
+            reference = current
+        yield (*sample, duplicate)
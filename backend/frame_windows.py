@@ -0,0 +1,107 @@
+import os
+from typing import Any, Dict, List
+
+from .vector_db import VECTOR_DB_PATH
+
+# Besides single frames, sliding windows of WINDOW_FRAMES consecutive sampled
+# frames, one every WINDOW_STRIDE frames, are embedded from their joined
+# descriptions (at most WINDOW_TEXT_CHARS characters) so that a search can
+# match what happens over a few seconds, and return it as a sequence with a
+# single hit. Windows go to their own local store at WINDOW_DB_PATH, or to
+# the WINDOW_NAMESPACE namespace of the Pinecone index. WINDOW_FRAMES below
+# 2 disables them; WINDOW_SEARCH=false stops searches from querying them.
+WINDOW_FRAMES = int(os.getenv("WINDOW_FRAMES", "4"))
+WINDOW_STRIDE = int(os.getenv("WINDOW_STRIDE", "2"))
+WINDOW_TEXT_CHARS = int(os.getenv("WINDOW_TEXT_CHARS", "2000"))
+WINDOW_DB_PATH = os.getenv("WINDOW_DB_PATH", os.path.join(VECTOR_DB_PATH, "windows"))
+WINDOW_NAMESPACE = os.getenv("WINDOW_NAMESPACE", "windows")
+WINDOW_SEARCH = os.getenv("WINDOW_SEARCH", "true").lower() == "true"
+
+
+def is_window(metadata: Dict[str, Any]) -> bool:
+    """Whether stored metadata describes a window rather than a single frame"""
+    return "frame_end" in metadata
+
+
+def window_text(descriptions: List[str], max_chars: int = None) -> str:
+    """Text embedded for a window: its frame descriptions in order, each cut to an equal share of `max_chars`"""
+    share = (max_chars or WINDOW_TEXT_CHARS) // len(descriptions)
+    return "\n\n".join(description[:share].strip() for description in descriptions)
+
+
+class WindowBuilder:
+    """Assemble sliding windows from the described frames of one video.
+
+    Frames may be added in any order; a window is returned by the `add`
+    call that completes it, once. Windows with a frame that will never be
+    described, because captioning failed or the frame was stored before a
+    resume, are not built: such frames are reported with `skip`, and frames
+    before `first_frame` are never expected, so the frames and windows kept
+    waiting stay bounded by the frames still in flight.
+    """
+
+    def __init__(self, size: int = None, stride: int = None, first_frame: int = 0):
+        self.size = WINDOW_FRAMES if size is None else size
+        self.stride = max(WINDOW_STRIDE if stride is None else stride, 1)
+        self._frames: Dict[int, Dict[str, Any]] = {}
+        self._skipped = set()
+        self._built = set()
+        # Windows starting before it are built or can't be anymore
+        self._next_start = first_frame + -first_frame % self.stride
+
+    @property
+    def enabled(self) -> bool:
+        return self.size >= 2
+
+    def add(self, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Record a described frame and return the windows it completes"""
+        if not self.enabled:
+            return []
+        frame_number = metadata["frame_number"]
+        if frame_number < self._next_start:
+            return []
+        self._frames[frame_number] = metadata
+        first = max(frame_number - self.size + 1, self._next_start)
+        first += -first % self.stride
+        windows = []
+        for start in range(first, frame_number + 1, self.stride):
+            if start not in self._built and all(
+                frame in self._frames for frame in range(start, start + self.size)
+            ):
+                self._built.add(start)
+                windows.append(self._window(start))
+        self._advance()
+        return windows
+
+    def skip(self, frame_number: int) -> None:
+        """Record a frame that will never be added, giving up on the windows that include it"""
+        if self.enabled and frame_number >= self._next_start:
+            self._skipped.add(frame_number)
+            self._advance()
+
+    def _advance(self) -> None:
+        """Forget the frames only needed by windows that are built or can't be anymore"""
+        next_start = self._next_start
+        while self._next_start in self._built or any(
+            frame in self._skipped for frame in range(self._next_start, self._next_start + self.size)
+        ):
+            self._built.discard(self._next_start)
+            self._next_start += self.stride
+        if self._next_start != next_start:
+            for frame in [frame for frame in self._frames if frame < self._next_start]:
+                del self._frames[frame]
+            self._skipped = {frame for frame in self._skipped if frame >= self._next_start}
+
+    def _window(self, start: int) -> Dict[str, Any]:
+        frames = [self._frames[frame] for frame in range(start, start + self.size)]
+        return {
+            "description": window_text([frame["description"] for frame in frames]),
+            "frame_number": start,
+            "frame_end": frames[-1]["frame_number"],
+            "frame_path": frames[0]["frame_path"],
+            "frame_paths": [frame["frame_path"] for frame in frames],
+            "task_id": frames[0]["task_id"],
+            "timestamp": frames[0]["timestamp"],
+            "time_end": frames[-1]["timestamp"],
+            "video_path": frames[0]["video_path"]
+        }
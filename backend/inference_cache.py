@@ -0,0 +1,168 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Captions and embeddings survive restarts in this SQLite file, keyed by
+# what determines them: (image hash, vision model, prompt) for captions and
+# (text hash, embedding model) for vectors. Least recently used entries are
+# evicted once the cached values exceed INFERENCE_CACHE_MAX_BYTES (0
+# disables the cache).
+INFERENCE_CACHE_PATH = os.getenv("INFERENCE_CACHE_PATH", "inference_cache.db")
+INFERENCE_CACHE_MAX_BYTES = int(os.getenv("INFERENCE_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+
+def sha256_hex(data) -> str:
+    """SHA-256 of bytes or text, used as the cache key of an image or caption"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class InferenceCache:
+    """Persistent cache of vision model captions and embedding vectors"""
+
+    def __init__(self, path: str = INFERENCE_CACHE_PATH, max_bytes: int = None):
+        self.max_bytes = INFERENCE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS captions (
+                key TEXT PRIMARY KEY,
+                caption TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS captions_accessed ON captions (accessed);
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed);
+        """)
+        self.size = sum(
+            self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+            for table in ("captions", "embeddings")
+        )
+        self.stats = {"caption_hits": 0, "caption_misses": 0, "embedding_hits": 0, "embedding_misses": 0, "evictions": 0}
+
+    def get_caption(self, image_hash: str, model: str, prompt: str) -> Optional[str]:
+        key = sha256_hex(f"{image_hash}:{model}:{prompt}")
+        with self._lock:
+            row = self._conn.execute("SELECT caption FROM captions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["caption_misses"] += 1
+                return None
+            self._conn.execute("UPDATE captions SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["caption_hits"] += 1
+            return row[0]
+
+    def put_caption(self, image_hash: str, model: str, prompt: str, caption: str) -> None:
+        key = sha256_hex(f"{image_hash}:{model}:{prompt}")
+        self._put("captions", key, caption, len(key) + len(caption.encode("utf-8")))
+
+    def get_embeddings(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Cached vector of each text, None where missing"""
+        keys = [sha256_hex(f"{sha256_hex(text)}:{model}") for text in texts]
+        with self._lock:
+            found: Dict[str, bytes] = {}
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed = ? WHERE key = ?", [(time.time(), key) for key in found]
+                )
+                self._conn.commit()
+            self.stats["embedding_hits"] += sum(key in found for key in keys)
+            self.stats["embedding_misses"] += sum(key not in found for key in keys)
+        return [np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None for key in keys]
+
+    def put_embeddings(self, texts: List[str], model: str, vectors: List[List[float]]) -> None:
+        for text, vector in zip(texts, vectors):
+            key = sha256_hex(f"{sha256_hex(text)}:{model}")
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            self._put("embeddings", key, blob, len(key) + len(blob))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _put(self, table: str, key: str, value, size: int) -> None:
+        with self._lock:
+            previous = self._conn.execute(f"SELECT size FROM {table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?)", (key, value, size, time.time()))
+            self.size += size - (previous[0] if previous else 0)
+            if self.size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries of both tables down to 90% of the budget"""
+        target = self.max_bytes * 0.9
+        while self.size > target:
+            oldest = self._conn.execute("""
+                SELECT 'captions', key, size, accessed FROM (SELECT key, size, accessed FROM captions ORDER BY accessed LIMIT 256)
+                UNION ALL
+                SELECT 'embeddings', key, size, accessed FROM (SELECT key, size, accessed FROM embeddings ORDER BY accessed LIMIT 256)
+                ORDER BY accessed LIMIT 256
+            """).fetchall()
+            if not oldest:
+                self.size = 0
+                return
+            for table, key, size, _ in oldest:
+                self._conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+                self.size -= size
+                self.stats["evictions"] += 1
+                if self.size <= target:
+                    break
+
+
+def cached_encoder(
+    encode: Callable[[List[str]], Awaitable[List[List[float]]]],
+    cache: "InferenceCache",
+    model: str
+) -> Callable[[List[str]], Awaitable[List[List[float]]]]:
+    """Wrap a batch encoder so texts with a cached vector for `model` are not embedded again"""
+    async def encode_with_cache(texts: List[str]) -> List[List[float]]:
+        vectors = cache.get_embeddings(texts, model)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = await encode([texts[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+            cache.put_embeddings([texts[i] for i in missing], model, encoded)
+        return vectors
+
+    return encode_with_cache
+
+
+_inference_cache: Optional[InferenceCache] = None
+_instance_lock = threading.Lock()
+
+
+def get_inference_cache() -> Optional[InferenceCache]:
+    """The process-wide inference cache, None when INFERENCE_CACHE_MAX_BYTES is 0"""
+    global _inference_cache
+    with _instance_lock:
+        if _inference_cache is None and INFERENCE_CACHE_MAX_BYTES > 0:
+            _inference_cache = InferenceCache()
+        return _inference_cache
+
+
+def get_inference_cache_metrics() -> Optional[Dict[str, Any]]:
+    if _inference_cache is None:
+        return None
+    return {**_inference_cache.stats, "bytes": _inference_cache.size, "max_bytes": _inference_cache.max_bytes}
@@ -0,0 +1,246 @@
+"""Batch ingestion of videos already on disk.
+
+    python -m backend.ingest /archive/videos clip.mp4 --manifest backfill.txt --workers 4
+
+Videos in the given directories (recursively), files and manifests (one
+path per line) are hashed, unless unchanged since an earlier run hashed
+them. Those already indexed, or queued by an earlier run, are skipped; the
+rest are queued as jobs (backend/jobs.py) and indexed where they are,
+without a copy in videos/. With Pinecone, each worker is a process claiming
+jobs from the shared queue, like `python -m backend.worker`. Locally, the
+workers are concurrent jobs in this process, which must be the only writer
+of the FAISS store: it refuses to start while the API has it open. Jobs
+checkpoint the frames they store, so running the same command again after
+an interruption resumes every video where it stopped.
+"""
+import os
+os.environ['KMP_DUPLICATE_LIB_OK']='True'
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import asyncio
+import multiprocessing
+import signal
+import socket
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .jobs import get_job_queue
+from .dedup import get_video_registry
+from .frame_windows import WINDOW_DB_PATH
+from .vector_db import VECTOR_DB_PATH, VectorDBLocked, lock_vector_db
+from .worker import IS_LOCAL, JOB_POLL_INTERVAL, JOB_WORKERS, open_pinecone_index, run_job
+
+# Files picked up when walking directories; manifest entries are taken as they are.
+INGEST_VIDEO_EXTENSIONS = tuple(
+    extension.strip().lower() for extension in os.getenv("INGEST_VIDEO_EXTENSIONS", ".mp4,.mov,.mkv,.avi,.webm,.m4v").split(",")
+)
+
+# Batch ingestion embeds and writes descriptions INGEST_EMBED_BATCH_SIZE at a
+# time, or every INGEST_EMBED_FLUSH_INTERVAL seconds: nobody is waiting on
+# the first results, so fewer, larger writes go to FAISS or Pinecone.
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+INGEST_EMBED_FLUSH_INTERVAL = float(os.getenv("INGEST_EMBED_FLUSH_INTERVAL", "30"))
+
+
+def find_videos(paths: List[str], manifests: List[str]) -> List[str]:
+    """Absolute paths of the videos to ingest, each once, in the order given"""
+    found = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            found.extend(sorted(
+                file for file in path.rglob("*") if file.is_file() and file.suffix.lower() in INGEST_VIDEO_EXTENSIONS
+            ))
+        else:
+            found.append(path)
+    for manifest in manifests:
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    # Relative entries are relative to the manifest
+                    found.append(Path(manifest).parent / line)
+    return list(dict.fromkeys(str(path.resolve()) for path in found))
+
+
+def plan_batch(videos: List[str], hash_threads: int) -> Tuple[List[Tuple[str, str]], List[str], List[Tuple[str, str]]]:
+    """Sort videos into new ones, jobs left unfinished by an earlier run and those to skip
+
+    Returns ([(path, sha256)] to queue, [task_id] to wait for, [(path, reason)] skipped).
+    """
+    registry, queue = get_video_registry(), get_job_queue()
+    # Files unchanged since an earlier run keep their recorded hash. hashlib
+    # releases the GIL on large buffers, so threads hash the others in parallel
+    with ThreadPoolExecutor(hash_threads) as pool:
+        hashes = list(pool.map(registry.file_hash, videos))
+
+    new, unfinished, skipped = {}, {}, []
+    for path, sha256 in zip(videos, hashes):
+        existing = registry.find(sha256)
+        if sha256 in new:
+            skipped.append((path, f"same content as {new[sha256]}"))
+        elif existing is None:
+            new[sha256] = path
+        elif existing["status"] == "done":
+            skipped.append((path, f"already indexed by task {existing['task_id']}"))
+        else:
+            job = queue.get(existing["task_id"])
+            if job is not None and job["state"] in ("queued", "running"):
+                unfinished[existing["task_id"]] = path
+            else:
+                skipped.append((path, f"being processed by task {existing['task_id']}"))
+    return [(path, sha256) for sha256, path in new.items()], list(unfinished), skipped
+
+
+async def run_batch(worker_id: str, task_ids: List[str], concurrency: int, pinecone_index=None, **options) -> None:
+    """Run the jobs of `task_ids`, `concurrency` at a time, until none of them is left to run"""
+    queue = get_job_queue()
+    loop = asyncio.get_running_loop()
+
+    async def worker(name: str) -> None:
+        while await loop.run_in_executor(None, queue.unfinished, task_ids):
+            # Jobs queued by uploads or other batches are left to their own workers
+            job = await loop.run_in_executor(None, queue.claim, name, task_ids)
+            if job is None:
+                # Running in other workers, or waiting for a retry
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                continue
+            await run_job(queue, job, pinecone_index, **options)
+
+    await asyncio.gather(*[worker(f"{worker_id}-{i}") for i in range(concurrency)])
+
+
+def ingest_process(worker_id: str, task_ids: List[str], options: Dict[str, Any]) -> None:
+    """Entry point of one Pinecone worker process: run batch jobs until they are all finished"""
+    async def main():
+        pinecone_index = await asyncio.get_running_loop().run_in_executor(None, open_pinecone_index)
+        task = asyncio.ensure_future(run_batch(worker_id, task_ids, 1, pinecone_index, **options))
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            asyncio.get_running_loop().add_signal_handler(signum, task.cancel)
+        try:
+            await task
+        except asyncio.CancelledError:
+            print(f"🟡 Worker {worker_id} stopped")
+
+    asyncio.run(main())
+
+
+def report(task_ids: List[str], elapsed: float) -> Dict[str, Any]:
+    """Aggregate the stats of the batch's jobs: frames, throughput and time spent per stage"""
+    queue = get_job_queue()
+    totals = {
+        "videos": 0, "failed_videos": 0, "frames": 0, "llm_calls": 0, "windows": 0,
+        "decode_seconds": 0.0, "caption_seconds": 0.0, "embed_seconds": 0.0, "store_seconds": 0.0
+    }
+    for task_id in task_ids:
+        job = queue.get(task_id)
+        if job["state"] != "done":
+            totals["failed_videos"] += 1
+            continue
+        stats = job["stats"] or {}
+        totals["videos"] += 1
+        # Frames stored before a resume were counted by the run that processed them
+        totals["frames"] += stats.get("sampled_frames", 0) - stats.get("resumed_frames", 0)
+        totals["llm_calls"] += stats.get("llm_calls", 0)
+        totals["windows"] += stats.get("windows", 0)
+        totals["decode_seconds"] += stats.get("decode_seconds", 0.0)
+        totals["caption_seconds"] += stats.get("caption_seconds", 0.0)
+        totals["embed_seconds"] += stats.get("embedding", {}).get("encode_seconds", 0.0)
+        totals["store_seconds"] += stats.get("embedding", {}).get("sink_seconds", 0.0)
+    totals["seconds"] = elapsed
+    totals["frames_per_second"] = totals["frames"] / elapsed if elapsed else 0.0
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index directories of videos in bulk, resuming where an earlier run stopped")
+    parser.add_argument("paths", nargs="*", help="Video files, or directories searched recursively")
+    parser.add_argument("--manifest", action="append", default=[], help="File listing one video path per line (repeatable)")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS,
+                        help="Worker processes with Pinecone, concurrent videos in local mode")
+    parser.add_argument("--embed-batch-size", type=int, default=INGEST_EMBED_BATCH_SIZE)
+    parser.add_argument("--embed-flush-interval", type=float, default=INGEST_EMBED_FLUSH_INTERVAL)
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be queued and skipped")
+    args = parser.parse_args()
+    if not args.paths and not args.manifest:
+        parser.error("give at least one path or --manifest")
+
+    start = time.perf_counter()
+    videos = find_videos(args.paths, args.manifest)
+    new, unfinished, skipped = plan_batch(videos, max(args.workers, 4))
+    print(f"🟢 {len(videos)} videos hashed in {time.perf_counter() - start:.1f}s: {len(new)} new, "
+          f"{len(unfinished)} resumed from an earlier run, {len(skipped)} skipped")
+    for path, reason in skipped:
+        print(f"🟡 Skipping {path}: {reason}")
+    if args.dry_run:
+        for path, _ in new:
+            print(f"🔵 Would queue {path}")
+        return
+
+    if IS_LOCAL:
+        # This process becomes the only writer of the FAISS stores, before any job is queued
+        try:
+            lock_vector_db(VECTOR_DB_PATH)
+            lock_vector_db(WINDOW_DB_PATH)
+        except VectorDBLocked as e:
+            print(f"🔴 {e}. Stop the API before ingesting locally.")
+            sys.exit(1)
+
+    registry, queue = get_video_registry(), get_job_queue()
+    task_ids = unfinished
+    for path, sha256 in new:
+        task_id = str(uuid.uuid4())
+        registry.register(sha256, task_id, path)
+        queue.enqueue(task_id, path, content_hash=sha256, is_local=IS_LOCAL)
+        task_ids.append(task_id)
+    if not task_ids:
+        print("🟢 Nothing to ingest")
+        return
+
+    os.makedirs("frames", exist_ok=True)
+    options = {"embed_batch_size": args.embed_batch_size, "embed_flush_interval": args.embed_flush_interval}
+    worker_id = f"ingest-{socket.gethostname()}-{os.getpid()}"
+    start = time.perf_counter()
+    if IS_LOCAL:
+        try:
+            asyncio.run(run_batch(worker_id, task_ids, args.workers, **options))
+        except KeyboardInterrupt:
+            pass
+    else:
+        # Spawned rather than forked: each process opens its own SQLite connections
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=ingest_process, args=(f"{worker_id}-{i}", task_ids, options))
+            for i in range(min(args.workers, len(task_ids)))
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            # Workers got the SIGINT too and give their running jobs back to the queue
+            for process in processes:
+                process.join()
+    if get_job_queue().unfinished(task_ids):
+        print("🟡 Interrupted, run the same command again to resume")
+        return
+
+    totals = report(task_ids, time.perf_counter() - start)
+    print(f"🟢 Ingested {totals['videos']} videos ({totals['failed_videos']} failed): {totals['frames']} frames "
+          f"in {totals['seconds']:.1f}s, {totals['frames_per_second']:.2f} frames/sec, "
+          f"{totals['llm_calls']} vision model calls, {totals['windows']} windows")
+    print(f"🟢 Time per stage, summed over workers: decode {totals['decode_seconds']:.1f}s, "
+          f"caption {totals['caption_seconds']:.1f}s, embed {totals['embed_seconds']:.1f}s, "
+          f"store {totals['store_seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+# Video processing jobs are queued in this SQLite file, shared by the API
+# (which enqueues and reports status) and every worker process. A failed
+# job is retried up to JOB_MAX_ATTEMPTS times, JOB_RETRY_BACKOFF seconds
+# later, doubling on each attempt. A running job whose worker hasn't sent a
+# heartbeat for JOB_LEASE_SECONDS is considered abandoned and picked up
+# again, from its last checkpoint.
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.db")
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+_COLUMNS = (
+    "task_id", "video_path", "content_hash", "is_local", "state", "attempts", "max_attempts",
+    "progress", "error", "checkpoint", "stats", "worker", "run_after", "heartbeat", "created", "updated"
+)
+
+
+class JobQueue:
+    """Durable queue of video processing jobs.
+
+    Jobs move from queued to running (claimed by one worker) to done, or
+    back to queued with a delay after a failure until their attempts run
+    out and they are failed. Every transition is a single SQLite
+    transaction, so any number of processes can share the queue.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH):
+        self._lock = threading.Lock()
+        # Autocommit mode: claims open their own BEGIN IMMEDIATE transaction
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                task_id TEXT PRIMARY KEY,
+                video_path TEXT NOT NULL,
+                content_hash TEXT,
+                is_local INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                checkpoint TEXT,
+                stats TEXT,
+                worker TEXT,
+                run_after REAL NOT NULL,
+                heartbeat REAL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, run_after)")
+        # Bumped by workers as they store vectors, see `version`
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS index_version (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO index_version VALUES (0, 0)")
+
+    def enqueue(self, task_id: str, video_path: str, content_hash: str = None, is_local: bool = False) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (task_id, video_path, content_hash, is_local, state, max_attempts, run_after, created, updated)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (task_id, video_path, content_hash, int(is_local), JOB_MAX_ATTEMPTS, now, now, now)
+            )
+        return self.get(task_id)
+
+    def claim(self, worker: str, task_ids: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Take the oldest runnable job (due, or abandoned by a dead worker) and mark it running
+
+        With `task_ids`, only one of those jobs is taken.
+        """
+        now = time.time()
+        query = (
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+            " WHERE ((state = 'queued' AND run_after <= ?) OR (state = 'running' AND heartbeat < ?))"
+        )
+        params = [now, now - JOB_LEASE_SECONDS]
+        if task_ids is not None:
+            query += " AND task_id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(task_ids)))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(query + " ORDER BY created LIMIT 1", params).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'running', attempts = attempts + 1, worker = ?, heartbeat = ?, updated = ?"
+                    " WHERE task_id = ?",
+                    (worker, now, now, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        job.update(state="running", attempts=job["attempts"] + 1, worker=worker)
+        return job
+
+    def heartbeat(self, task_id: str, worker: str, progress: int = None, checkpoint: Dict[str, Any] = None) -> bool:
+        """Extend `worker`'s lease on a running job, recording its progress and resume point
+
+        Returns False once the job is no longer leased to `worker`, such as
+        after its lease expired and another worker claimed the job.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET heartbeat = ?, updated = ?, progress = COALESCE(?, progress),"
+                " checkpoint = COALESCE(?, checkpoint) WHERE task_id = ? AND state = 'running' AND worker = ?",
+                (now, now, progress, json.dumps(checkpoint) if checkpoint is not None else None, task_id, worker)
+            )
+        return cursor.rowcount > 0
+
+    def complete(self, task_id: str, worker: str, stats: Dict[str, Any] = None) -> bool:
+        """Mark a job leased to `worker` done, returns False if the lease was lost"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = 'done', progress = 100, error = NULL, stats = ?, updated = ?"
+                " WHERE task_id = ? AND state = 'running' AND worker = ?",
+                (json.dumps(stats, default=str), time.time(), task_id, worker)
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, task_id: str, worker: str, error: str) -> Optional[str]:
+        """Record a failed attempt: requeue with backoff, or fail for good once out of attempts
+
+        Returns the job's new state, or None if the job was no longer leased to `worker`.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE task_id = ? AND state = 'running' AND worker = ?",
+                (task_id, worker)
+            ).fetchone()
+            if row is None:
+                return None
+            attempts, max_attempts = row
+            if attempts < max_attempts:
+                # Exponential backoff with jitter, so failed jobs don't all come back at once
+                delay = JOB_RETRY_BACKOFF * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+                state, run_after = "queued", now + delay
+            else:
+                state, run_after = "failed", now
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, run_after = ?, worker = NULL, updated = ?"
+                " WHERE task_id = ? AND worker = ?",
+                (state, error, run_after, now, task_id, worker)
+            )
+        return state
+
+    def release(self, task_id: str, worker: str) -> None:
+        """Give a running job leased to `worker` back to the queue without counting the attempt (worker shutdown)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'queued', attempts = MAX(attempts - 1, 0), worker = NULL, updated = ?"
+                " WHERE task_id = ? AND state = 'running' AND worker = ?",
+                (time.time(), task_id, worker)
+            )
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list(self, state: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently updated jobs, optionally in one state"""
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params: List[Any] = []
+        if state:
+            query += " WHERE state = ?"
+            params.append(state)
+        query += " ORDER BY updated DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def unfinished(self, task_ids: List[str]) -> List[str]:
+        """The jobs among `task_ids` that are still queued or running"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id FROM jobs WHERE task_id IN (SELECT value FROM json_each(?))"
+                " AND state IN ('queued', 'running')",
+                (json.dumps(list(task_ids)),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each state"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: 0 for state in JOB_STATES} | dict(rows)
+
+    def bump_version(self) -> None:
+        """Record that vectors were stored in the remote index"""
+        with self._lock:
+            self._conn.execute("UPDATE index_version SET version = version + 1 WHERE id = 0")
+
+    def version(self) -> int:
+        """Counter bumped by every worker storing vectors in the remote index, and by nothing else"""
+        with self._lock:
+            return self._conn.execute("SELECT version FROM index_version WHERE id = 0").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        job["is_local"] = bool(job["is_local"])
+        for field in ("checkpoint", "stats"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+
+_job_queue: Optional[JobQueue] = None
+_instance_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """The process-wide job queue"""
+    global _job_queue
+    with _instance_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
@@ -5,24 +5,45 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import uuid
-from fastapi import FastAPI, File, UploadFile, BackgroundTasks, WebSocket, WebSocketDisconnect, HTTPException, Request, Body, Form, Depends, status, Query
+import asyncio
+from fastapi import FastAPI, File, UploadFile, WebSocket, WebSocketDisconnect, HTTPException, Request, Body, Form, Depends, status, Query
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Body
-from pinecone import Pinecone
-import pinecone
-from typing import Dict
+from typing import Dict, List, Optional
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 import urllib.parse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from .video_processing import process_video
-from .sequence_finder import extract_video_sequence
+from .sequence_finder import extract_video_sequence, SEARCH_MAX_K
+from .embedding_models import load_embedding_model, get_embedding_metrics
+from .vector_db import close_vector_dbs, lock_vector_db, VECTOR_DB_PATH
+from .frame_windows import WINDOW_DB_PATH
+from .clip_cache import get_clip_cache
+from .media import MediaFiles
+from .uploads import UploadSessions, save_upload
+from .dedup import get_video_registry, get_dedup_metrics
+from .inference_cache import get_inference_cache_metrics
+from .jobs import JOB_STATES, get_job_queue
+from .worker import open_pinecone_index, run_worker
+from .decode_pool import close_decode_pools
+from .clients import close_clients, get_client_metrics
+from .search_cache import get_search_cache_metrics
 
 # Get LOCAL from environment variables
 IS_LOCAL = os.getenv("LOCAL", "false").lower() == "true"
 
+# Load the Jina embedding model at startup instead of on the first request
+PRELOAD_EMBEDDING_MODEL = os.getenv("PRELOAD_EMBEDDING_MODEL", "true").lower() == "true"
+
+# Uploaded videos are queued as jobs. The API process runs API_JOB_WORKERS
+# of them at a time itself (always needed in local mode, where it owns the
+# FAISS store); set it to 0 when `python -m backend.worker` runs them.
+# Progress is relayed to WebSockets every JOB_PROGRESS_INTERVAL seconds.
+API_JOB_WORKERS = int(os.getenv("API_JOB_WORKERS", "1"))
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "0.5"))
+
 # Initialize FastAPI app
 app = FastAPI()
 
@@ -45,25 +66,7 @@ app.add_middleware(
 )
 
 # Initialize Pinecone only if not local
-if not IS_LOCAL:
-    PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    INDEX_NAME = "groq-video-analyzer"
-
-    if INDEX_NAME not in pc.list_indexes().names():
-        pc.create_index(
-            name=INDEX_NAME,
-            spec=pinecone.IndexSpec(
-                dimension=768,
-                metric='cosine'
-            )
-        )
-    pinecone_index = pc.Index(INDEX_NAME)
-else:
-    pinecone_index = None
-
-# Dictionary to hold WebSocket connections
-connections: Dict[str, WebSocket] = {}
+pinecone_index = open_pinecone_index() if not IS_LOCAL else None
 
 # WebSocket endpoint for progress updates
 @app.websocket("/api/ws/{task_id}")
@@ -80,14 +83,28 @@ async def websocket_endpoint(
         return
 
     await websocket.accept()
-    connections[task_id] = websocket
+    # The job may run in a worker process: relay its progress from the queue
+    job_queue = get_job_queue()
+    last_progress = None
     try:
         while True:
-            await websocket.receive_text()
-            # Can handle incoming messages if needed
-            pass
+            job = job_queue.get(task_id)
+            if job is None:
+                await websocket.send_json({"progress": -1, "error": f"Unknown task {task_id}"})
+                break
+            if job["state"] == "done":
+                await websocket.send_json({"progress": 100, "error": "", "stats": job["stats"]})
+                break
+            if job["state"] == "failed":
+                await websocket.send_json({"progress": -1, "error": job["error"]})
+                break
+            if job["progress"] != last_progress:
+                last_progress = job["progress"]
+                await websocket.send_json({"progress": last_progress, "error": ""})
+            await asyncio.sleep(JOB_PROGRESS_INTERVAL)
+        await websocket.close()
     except WebSocketDisconnect:
-        del connections[task_id]
+        pass
 
 security = HTTPBearer()
 
@@ -113,39 +130,128 @@ async def authenticate(password: str):
         return {"authenticated": True}
     raise HTTPException(status_code=401, detail="Invalid password")
 
+def new_video_path(filename: str):
+    """Allocate a task id and the path its uploaded video is stored at"""
+    task_id = str(uuid.uuid4())
+    video_dir = "videos"
+    os.makedirs(video_dir, exist_ok=True)
+    return task_id, os.path.join(video_dir, f"{task_id}_{os.path.basename(filename)}")
+
+def schedule_processing(task_id: str, video_path: str, upload: Dict):
+    """Process a stored upload, unless a video with the same content is already known
+
+    Returns the response for the upload: the existing task for known
+    content, whose new copy is deleted, or the new task otherwise.
+    """
+    video_registry = get_video_registry()
+    existing = video_registry.find(upload["sha256"])
+    if existing is not None:
+        print(f"🟢 Upload matches task {existing['task_id']} ({existing['status']}), skipping processing")
+        os.remove(video_path)
+        return {"task_id": existing["task_id"], "duplicate": True, "status": existing["status"], **upload}
+
+    video_registry.register(upload["sha256"], task_id, video_path)
+    job = get_job_queue().enqueue(task_id, video_path, content_hash=upload["sha256"], is_local=IS_LOCAL)
+    return {"task_id": task_id, "duplicate": False, "status": "processing", "job_state": job["state"], **upload}
+
 # Upload endpoint
 @app.post("/api/upload")
 async def upload_video(
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None,
     _: bool = Depends(verify_token)
 ):
-    task_id = str(uuid.uuid4())
-    video_dir = "videos"
-    os.makedirs(video_dir, exist_ok=True)
-    video_path = os.path.join(video_dir, f"{task_id}_{file.filename}")
-    with open(video_path, "wb") as f:
-        f.write(await file.read())
-
-    # Start background task with local flag
-    background_tasks.add_task(
-        process_video, 
-        task_id, 
-        video_path, 
-        pinecone_index, 
-        connections,
-        is_local=IS_LOCAL
-    )
+    task_id, video_path = new_video_path(file.filename)
+    upload = await save_upload(file, video_path)
+    return schedule_processing(task_id, video_path, upload)
 
-    return {"task_id": task_id}
+upload_sessions = UploadSessions()
+
+# Resumable uploads: init, PUT every part (in any order, retrying as needed), complete
+@app.post("/api/uploads")
+async def init_upload(
+    filename: str = Body(...),
+    size: int = Body(...),
+    _: bool = Depends(verify_token)
+):
+    try:
+        return upload_sessions.create(filename, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/uploads/{upload_id}")
+async def upload_status(upload_id: str, _: bool = Depends(verify_token)):
+    try:
+        return upload_sessions.status(upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown upload {upload_id}")
+
+@app.put("/api/uploads/{upload_id}/parts/{index}")
+async def upload_part(upload_id: str, index: int, request: Request, _: bool = Depends(verify_token)):
+    try:
+        return await upload_sessions.write_part(upload_id, index, request.stream())
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown upload {upload_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    sha256: Optional[str] = Body(None, embed=True),
+    _: bool = Depends(verify_token)
+):
+    try:
+        filename = upload_sessions.status(upload_id)["filename"]
+        task_id, video_path = new_video_path(filename)
+        upload = await upload_sessions.complete(upload_id, video_path, sha256)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown upload {upload_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return schedule_processing(task_id, video_path, upload)
+
+@app.get("/api/jobs")
+async def list_jobs(state: Optional[str] = None, limit: int = 50, _: bool = Depends(verify_token)):
+    """Most recently updated processing jobs, optionally only those in `state`"""
+    if state is not None and state not in JOB_STATES:
+        raise HTTPException(status_code=400, detail=f"Unknown job state {state}, expected one of {JOB_STATES}")
+    job_queue = get_job_queue()
+    return {"counts": job_queue.counts(), "jobs": job_queue.list(state, min(max(limit, 1), 500))}
+
+@app.get("/api/jobs/{task_id}")
+async def job_status(task_id: str, _: bool = Depends(verify_token)):
+    job = get_job_queue().get(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {task_id}")
+    return job
 
 # Upload endpoint
 @app.get("/api/search_video_sequences/{user_query}")
 async def search_video_sequences_endpoint(
     user_query: str,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    hybrid: Optional[bool] = None,
+    windows: Optional[bool] = None,
+    k: int = 5,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    video_path: Optional[List[str]] = Query(None),
+    task_id: Optional[List[str]] = Query(None),
+    time_start: Optional[float] = None,
+    time_end: Optional[float] = None,
     _: bool = Depends(verify_token)
 ):
-    """REST endpoint for searching video sequences"""
+    """REST endpoint for searching video sequences
+
+    `k` frames are retrieved, only from the given videos/tasks (repeat the
+    parameter for several) and time range when set, and their sequences
+    returned `limit` at a time from `offset`.
+    """
+    if not 1 <= k <= SEARCH_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {SEARCH_MAX_K}")
+    if offset < 0 or (limit is not None and limit < 1):
+        raise HTTPException(status_code=400, detail="offset can't be negative and limit must be at least 1")
     try:
         print("🔵 Starting search for query:", user_query)
         
@@ -155,7 +261,19 @@ async def search_video_sequences_endpoint(
             user_query=user_query,
             pinecone_index=pinecone_index,
             is_local=IS_LOCAL,
-            k=5
+            k=k,
+            nprobe=nprobe,
+            ef_search=ef_search,
+            hybrid=hybrid,
+            windows=windows,
+            filters={
+                "video_paths": video_path,
+                "task_ids": task_id,
+                "time_start": time_start,
+                "time_end": time_end
+            },
+            offset=offset,
+            limit=limit
         )
         
         if result["status"] == "error":
@@ -167,18 +285,33 @@ async def search_video_sequences_endpoint(
         print(f"🔴 Error in search_video_sequences_endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/metrics")
+async def metrics_endpoint(_: bool = Depends(verify_token)):
+    """Runtime metrics for the shared services of this process"""
+    clip_cache = get_clip_cache()
+    return {
+        "embedding_models": get_embedding_metrics(),
+        "clip_cache": clip_cache.stats if clip_cache else None,
+        "dedup": get_dedup_metrics(),
+        "inference_cache": get_inference_cache_metrics(),
+        "jobs": get_job_queue().counts(),
+        "clients": get_client_metrics(),
+        "search_cache": get_search_cache_metrics()
+    }
+
 @app.get("/api/extract_sequence")
 async def extract_sequence(
     video_path: str,
     time_start: float,
     time_end: float,
+    mode: Optional[str] = None,
     _: bool = Depends(verify_token)
 ):
     print("🟢 Extract sequence endpoint called")
     try:
         video_path = urllib.parse.unquote(video_path)
         video_path = os.path.normpath(video_path).replace('\\', '/')
-        return await extract_video_sequence(video_path, time_start, time_end)
+        return await extract_video_sequence(video_path, time_start, time_end, mode)
     except Exception as e:
         print(f"🔴 Error in extract_sequence: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -187,10 +320,10 @@ async def extract_sequence(
 os.makedirs("frames", exist_ok=True)
 os.makedirs("videos", exist_ok=True)
 
-# Mount both directories as static file directories
-app.mount("/frames", StaticFiles(directory="frames"), name="frames")
-app.mount("/videos", StaticFiles(directory="videos"), name="videos")
-app.mount("/video_sample_to_test", StaticFiles(directory="video_sample_to_test"), name="video_sample_to_test")
+# Serve media directories with Range support so the player can seek
+app.mount("/frames", MediaFiles(directory="frames"), name="frames")
+app.mount("/videos", MediaFiles(directory="videos"), name="videos")
+app.mount("/video_sample_to_test", MediaFiles(directory="video_sample_to_test"), name="video_sample_to_test")
 app.mount("/", StaticFiles(directory="./frontend/build", html=True), name="frontend")
 
 @app.exception_handler(RequestValidationError)
@@ -201,6 +334,8 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors()}
     )
 
+job_workers = []
+
 # Add this right after your app definition to see all registered routes
 @app.on_event("startup")
 async def startup_event():
@@ -210,3 +345,25 @@ async def startup_event():
             print(f"🟢 {route.methods} {route.path}")
         else:
             print(f"🟢 WebSocket {route.path}")
+
+    if not IS_LOCAL and PRELOAD_EMBEDDING_MODEL:
+        await load_embedding_model()
+    if IS_LOCAL:
+        # Fail now, rather than on every job and search, while `python -m backend.ingest` owns the stores
+        lock_vector_db(VECTOR_DB_PATH)
+        lock_vector_db(WINDOW_DB_PATH)
+
+    for i in range(API_JOB_WORKERS):
+        job_workers.append(asyncio.ensure_future(run_worker(f"api-{os.getpid()}-{i}", pinecone_index)))
+    print(f"🟢 Running {API_JOB_WORKERS} job workers in the API process")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Running jobs go back to the queue and resume from their checkpoint on the next start
+    for task in job_workers:
+        task.cancel()
+    await asyncio.gather(*job_workers, return_exceptions=True)
+    # Checkpoint the local vector store so the next start has no log to replay
+    close_vector_dbs()
+    close_decode_pools()
+    await close_clients()
@@ -0,0 +1,196 @@
+import os
+import asyncio
+import mimetypes
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# Bytes read per send when the server can't hand the file to the kernel.
+# Larger chunks mean fewer thread hops per file, smaller ones a lower
+# time to first byte for each range request.
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", str(256 * 1024)))
+MEDIA_CACHE_CONTROL = os.getenv("MEDIA_CACHE_CONTROL", "public, max-age=3600")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end)
+
+    Returns None when the header should be ignored (other units or several
+    ranges, which are answered with the whole file), raises ValueError when
+    it can't be satisfied.
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end or start < 0:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+
+class MediaFileResponse(Response):
+    """Serve one file with Range, ETag and Last-Modified support.
+
+    The body goes through the ASGI `http.response.zerocopysend` extension
+    (sendfile) when the server offers it, and is read in MEDIA_CHUNK_SIZE
+    chunks off the event loop otherwise.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        media_type: Optional[str] = None,
+        filename: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        background: Optional[BackgroundTask] = None
+    ):
+        # Most headers depend on the request, so they are built in __call__;
+        # raw_headers only holds extra ones set by the framework
+        self.status_code = 200
+        self.background = background
+        self.raw_headers = []
+        self.path = Path(path)
+        self.media_type = media_type or mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+        self.filename = filename
+        self.chunk_size = chunk_size or MEDIA_CHUNK_SIZE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self._send_file(scope, send)
+        if self.background is not None:
+            await self.background()
+
+    async def _send_file(self, scope: Scope, send: Send) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            file_stat = await loop.run_in_executor(None, os.stat, self.path)
+        except FileNotFoundError:
+            return await self._send_status(send, 404)
+        if not stat.S_ISREG(file_stat.st_mode):
+            return await self._send_status(send, 404)
+
+        size = file_stat.st_size
+        etag = f'"{file_stat.st_mtime_ns:x}-{size:x}"'
+        last_modified = formatdate(file_stat.st_mtime, usegmt=True)
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": last_modified,
+            "cache-control": MEDIA_CACHE_CONTROL,
+        }
+
+        request_headers = Headers(scope=scope)
+        if self._not_modified(request_headers, etag, file_stat.st_mtime):
+            return await self._send_status(send, 304, headers)
+
+        status, start, end = 200, 0, size - 1
+        range_header = request_headers.get("range")
+        if range_header and self._range_applies(request_headers.get("if-range"), etag, last_modified):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                return await self._send_status(send, 416, {**headers, "content-range": f"bytes */{size}"})
+            if byte_range is not None:
+                status, (start, end) = 206, byte_range
+                headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        length = max(end - start + 1, 0)
+        headers["content-type"] = self.media_type
+        headers["content-length"] = str(length)
+        if self.filename:
+            headers["content-disposition"] = f"attachment; filename*=utf-8''{quote(self.filename)}"
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()] + self.raw_headers,
+        })
+        if scope["method"] == "HEAD" or length == 0:
+            return await send({"type": "http.response.body", "body": b""})
+
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                return await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": start,
+                    "count": length,
+                })
+
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = await loop.run_in_executor(None, f.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # The file shrank while being sent, end the body anyway
+                await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    def _not_modified(headers: Headers, etag: str, mtime: float) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            return if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _range_applies(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+        # A stale If-Range means the client's partial copy is outdated: send everything
+        return if_range is None or if_range.strip() in (etag, last_modified)
+
+    @staticmethod
+    async def _send_status(send: Send, status: int, headers: Optional[Dict[str, str]] = None) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+class MediaFiles:
+    """ASGI app serving a directory through MediaFileResponse, a drop-in for StaticFiles mounts"""
+
+    def __init__(self, directory: str, chunk_size: Optional[int] = None):
+        self.directory = Path(directory).resolve()
+        self.chunk_size = chunk_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            return await MediaFileResponse._send_status(send, 405, {"allow": "GET, HEAD"})
+
+        # Path below the mount point
+        path, root_path = scope["path"], scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        file_path = (self.directory / path.lstrip("/")).resolve()
+        if not file_path.is_relative_to(self.directory):
+            return await MediaFileResponse._send_status(send, 404)
+
+        await MediaFileResponse(file_path, chunk_size=self.chunk_size)(scope, receive, send)
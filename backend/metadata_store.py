@@ -0,0 +1,312 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import unicodedata
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Columns every frame has; anything else in a metadata dict goes to `extra`
+FRAME_FIELDS = ("description", "frame_number", "frame_path", "task_id", "timestamp", "video_path")
+
+# Descriptions are indexed for full-text search word for word (case and
+# diacritics folded, no stemming: the text search is there for names and
+# on-screen text, the embeddings already match related words). Terms found in
+# more than TEXT_SEARCH_MAX_POSTINGS frames are left out of text queries: they
+# say little about which frame is meant, and scoring all of their postings
+# would take most of a query's time.
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+TEXT_SEARCH_MAX_POSTINGS = int(os.getenv("TEXT_SEARCH_MAX_POSTINGS", "10000"))
+
+# Keys of the `filters` accepted by `select` and `search_text`
+SEARCH_FILTERS = ("video_paths", "task_ids", "time_start", "time_end")
+
+# Letters and digits, like the unicode61 tokenizer
+_TERM = re.compile(r"[^\W_]+")
+
+
+def text_terms(text: str) -> List[str]:
+    """Distinct terms of `text` as the full-text index stores them"""
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    return list(dict.fromkeys(_TERM.findall(folded)))
+
+
+class MetadataStore:
+    """SQLite-backed metadata for the frames of a LocalVectorDB.
+
+    Row ids match FAISS ids. Only the columns needed to filter and group
+    results are kept in memory, as numpy arrays (video id, frame number,
+    timestamp); descriptions and paths stay on disk and are read for the
+    returned hits only. Video paths and task ids are interned in a `videos`
+    table, so each one is stored once however many frames it has.
+    Descriptions are also indexed in an FTS5 table, which ranks them by BM25.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS videos (
+                id INTEGER PRIMARY KEY,
+                video_path TEXT NOT NULL,
+                task_id TEXT,
+                UNIQUE (video_path, task_id)
+            );
+            CREATE TABLE IF NOT EXISTS frames (
+                id INTEGER PRIMARY KEY,
+                video_id INTEGER NOT NULL REFERENCES videos(id),
+                frame_number INTEGER,
+                timestamp REAL,
+                frame_path TEXT,
+                description TEXT,
+                extra TEXT
+            );
+        """)
+        has_text_index = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'frames_fts'"
+        ).fetchone() is not None
+        # External content table: the index points at frames rows instead of copying descriptions
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS frames_fts USING fts5("
+            f"description, content='frames', content_rowid='id', tokenize='{FTS_TOKENIZER}')"
+        )
+        self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS frames_vocab USING fts5vocab(frames_fts, 'row')")
+        if not has_text_index and self._conn.execute("SELECT 1 FROM frames LIMIT 1").fetchone():
+            print("🟡 Indexing frame descriptions for text search...")
+            self._conn.execute("INSERT INTO frames_fts (frames_fts) VALUES ('rebuild')")
+        self._conn.commit()
+
+        # Frames are never deleted, so a term over TEXT_SEARCH_MAX_POSTINGS stays over it
+        self._common_terms = set()
+
+        self.videos: Dict[int, Tuple[str, Optional[str]]] = {}
+        self._video_ids: Dict[Tuple[str, Optional[str]], int] = {}
+        for video_id, video_path, task_id in self._conn.execute("SELECT id, video_path, task_id FROM videos"):
+            self.videos[video_id] = (video_path, task_id)
+            self._video_ids[(video_path, task_id)] = video_id
+
+        self._size = self._conn.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+        capacity = max(self._size, 1024)
+        self._video_column = np.zeros(capacity, dtype=np.int32)
+        self._frame_column = np.zeros(capacity, dtype=np.int32)
+        self._timestamp_column = np.zeros(capacity, dtype=np.float64)
+
+        # Load the in-memory columns in chunks to avoid materialising every row at once
+        cursor = self._conn.execute("SELECT id, video_id, frame_number, timestamp FROM frames ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(100000)
+            if not rows:
+                break
+            columns = np.array(rows, dtype=np.float64)
+            ids = columns[:, 0].astype(np.int64)
+            self._video_column[ids] = columns[:, 1]
+            self._frame_column[ids] = np.nan_to_num(columns[:, 2], nan=-1)
+            self._timestamp_column[ids] = np.nan_to_num(columns[:, 3])
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def video_ids(self) -> np.ndarray:
+        """Video id of every frame, indexed by FAISS id"""
+        return self._video_column[:self._size]
+
+    @property
+    def frame_numbers(self) -> np.ndarray:
+        """Frame number of every frame, indexed by FAISS id"""
+        return self._frame_column[:self._size]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Timestamp in seconds of every frame, indexed by FAISS id"""
+        return self._timestamp_column[:self._size]
+
+    def append(self, metadata_list: Iterable[Dict[str, Any]]) -> None:
+        """Store metadata for the next ids, committed before returning"""
+        with self._lock:
+            rows = []
+            for offset, metadata in enumerate(metadata_list):
+                video_id = self._intern_video(metadata.get("video_path", ""), metadata.get("task_id"))
+                extra = {key: value for key, value in metadata.items() if key not in FRAME_FIELDS}
+                rows.append((
+                    self._size + offset,
+                    video_id,
+                    metadata.get("frame_number"),
+                    metadata.get("timestamp"),
+                    metadata.get("frame_path"),
+                    metadata.get("description"),
+                    json.dumps(extra) if extra else None,
+                ))
+            self._conn.executemany("INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            # Same transaction, so the text index never misses a committed frame
+            self._conn.executemany(
+                "INSERT INTO frames_fts (rowid, description) VALUES (?, ?)",
+                [(row[0], row[5]) for row in rows if row[5]]
+            )
+            self._conn.commit()
+
+            self._grow(self._size + len(rows))
+            for row in rows:
+                frame_id = row[0]
+                self._video_column[frame_id] = row[1]
+                self._frame_column[frame_id] = row[2] if row[2] is not None else -1
+                self._timestamp_column[frame_id] = row[3] or 0.0
+            self._size += len(rows)
+
+    def select(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean mask over ids of the frames matching `filters`, None when nothing is filtered
+
+        `filters` may hold "video_paths" and "task_ids" (frames of any of
+        them) and "time_start"/"time_end" (timestamps in seconds, inclusive).
+        Missing or None entries don't restrict the selection.
+        """
+        if not filters or all(filters.get(key) is None for key in SEARCH_FILTERS):
+            return None
+        with self._lock:
+            size = self._size
+            video_ids = self._matching_videos(filters)
+            mask = np.ones(size, dtype=bool)
+            if video_ids is not None:
+                mask &= np.isin(self._video_column[:size], video_ids)
+            if filters.get("time_start") is not None:
+                mask &= self._timestamp_column[:size] >= filters["time_start"]
+            if filters.get("time_end") is not None:
+                mask &= self._timestamp_column[:size] <= filters["time_end"]
+        return mask
+
+    def get(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """Full metadata dicts for `ids`, in the same order"""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        with self._lock:
+            placeholders = ",".join("?" * len(ids))
+            rows = self._conn.execute(
+                f"SELECT id, video_id, frame_number, timestamp, frame_path, description, extra "
+                f"FROM frames WHERE id IN ({placeholders})",
+                ids
+            ).fetchall()
+
+        by_id = {}
+        for frame_id, video_id, frame_number, timestamp, frame_path, description, extra in rows:
+            video_path, task_id = self.videos[video_id]
+            metadata = json.loads(extra) if extra else {}
+            metadata.update({
+                "description": description,
+                "frame_number": frame_number,
+                "frame_path": frame_path,
+                "task_id": task_id,
+                "timestamp": timestamp,
+                "video_path": video_path,
+            })
+            by_id[frame_id] = metadata
+        return [by_id[i] for i in ids if i in by_id]
+
+    def search_text(
+        self,
+        query: str,
+        limit: int,
+        timeout: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Optional[List[Tuple[int, float]]]:
+        """Ids of the frames whose description best matches any term of `query`, by BM25
+
+        Only frames matching `filters` (see `select`) are returned. Returns
+        (id, BM25 score) pairs, best first, or None when the search was cut
+        off after `timeout` seconds.
+        """
+        terms = text_terms(query)
+        with self._lock:
+            terms = [term for term in terms if term not in self._common_terms]
+            if not terms:
+                return []
+            if timeout is not None:
+                deadline = time.perf_counter() + timeout
+                self._conn.set_progress_handler(lambda: time.perf_counter() > deadline, 1000)
+            try:
+                placeholders = ",".join("?" * len(terms))
+                postings = dict(self._conn.execute(
+                    f"SELECT term, doc FROM frames_vocab WHERE term IN ({placeholders})", terms
+                ).fetchall())
+                self._common_terms.update(term for term, count in postings.items() if count > TEXT_SEARCH_MAX_POSTINGS)
+                terms = [term for term in terms if 0 < postings.get(term, 0) <= TEXT_SEARCH_MAX_POSTINGS]
+                if not terms:
+                    return []
+                # Quoted terms can't be mistaken for FTS5 operators or column filters
+                conditions, params = self._filter_conditions(filters)
+                rows = self._conn.execute(
+                    "SELECT frames_fts.rowid, bm25(frames_fts) FROM frames_fts"
+                    + (" JOIN frames ON frames.id = frames_fts.rowid" if conditions else "")
+                    + " WHERE frames_fts MATCH ?" + "".join(f" AND {condition}" for condition in conditions)
+                    + " ORDER BY rank LIMIT ?",
+                    (" OR ".join(f'"{term}"' for term in terms), *params, limit)
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                if "interrupted" in str(e):
+                    return None
+                raise
+            finally:
+                if timeout is not None:
+                    self._conn.set_progress_handler(None, 0)
+        # SQLite's bm25() is negated so that ascending order ranks best first
+        return [(frame_id, -score) for frame_id, score in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _matching_videos(self, filters: Dict[str, Any]) -> Optional[List[int]]:
+        """Ids of the videos allowed by the video path and task id filters, None when neither is set"""
+        video_paths, task_ids = filters.get("video_paths"), filters.get("task_ids")
+        if video_paths is None and task_ids is None:
+            return None
+        return [
+            video_id for video_id, (video_path, task_id) in self.videos.items()
+            if (video_paths is None or video_path in video_paths) and (task_ids is None or task_id in task_ids)
+        ]
+
+    def _filter_conditions(self, filters: Optional[Dict[str, Any]]) -> Tuple[List[str], List[Any]]:
+        """SQL conditions on the frames table equivalent to `select(filters)`"""
+        conditions, params = [], []
+        if not filters:
+            return conditions, params
+        video_ids = self._matching_videos(filters)
+        if video_ids is not None:
+            conditions.append(f"frames.video_id IN ({','.join('?' * len(video_ids))})" if video_ids else "0")
+            params.extend(video_ids)
+        if filters.get("time_start") is not None:
+            conditions.append("frames.timestamp >= ?")
+            params.append(filters["time_start"])
+        if filters.get("time_end") is not None:
+            conditions.append("frames.timestamp <= ?")
+            params.append(filters["time_end"])
+        return conditions, params
+
+    def _intern_video(self, video_path: str, task_id: Optional[str]) -> int:
+        key = (video_path, task_id)
+        video_id = self._video_ids.get(key)
+        if video_id is None:
+            cursor = self._conn.execute("INSERT INTO videos (video_path, task_id) VALUES (?, ?)", key)
+            video_id = cursor.lastrowid
+            self._video_ids[key] = video_id
+            self.videos[video_id] = key
+        return video_id
+
+    def _grow(self, size: int) -> None:
+        capacity = len(self._video_column)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in ("_video_column", "_frame_column", "_timestamp_column"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from .jobs import get_job_queue
+
+# Searches are cached at two levels: normalised query text -> embedding
+# (QUERY_EMBEDDING_TTL seconds, embeddings only change with the model) and
+# (query, k, search parameters, index version) -> response (SEARCH_CACHE_TTL
+# seconds). Each level keeps up to SEARCH_CACHE_SIZE entries, least recently
+# used first out (0 disables the cache). The index version changes as
+# vectors are stored, which makes cached responses unreachable at once.
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+QUERY_EMBEDDING_TTL = float(os.getenv("QUERY_EMBEDDING_TTL", "86400"))
+
+# Pinecone is written by worker processes: its version is a counter in the
+# job queue that they bump after every upsert, read at most every
+# SEARCH_VERSION_INTERVAL seconds.
+SEARCH_VERSION_INTERVAL = float(os.getenv("SEARCH_VERSION_INTERVAL", "1.0"))
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, Unicode forms and whitespace, so trivially different queries share cache entries"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+class TTLCache:
+    """Least recently used mapping whose entries also expire `ttl` seconds after being stored"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+class SearchCache:
+    """The two cache levels of `search_video_sequences`"""
+
+    def __init__(self, max_entries: int = None, ttl: float = None, embedding_ttl: float = None):
+        max_entries = SEARCH_CACHE_SIZE if max_entries is None else max_entries
+        self.embeddings = TTLCache(max_entries, QUERY_EMBEDDING_TTL if embedding_ttl is None else embedding_ttl)
+        self.results = TTLCache(max_entries, SEARCH_CACHE_TTL if ttl is None else ttl)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"embeddings": self.embeddings.metrics(), "results": self.results.metrics()}
+
+
+_remote_version = {"checked": float("-inf"), "version": None}
+
+
+def remote_index_version() -> int:
+    """Version of the Pinecone index as seen from this process (see SEARCH_VERSION_INTERVAL)"""
+    now = time.monotonic()
+    if now - _remote_version["checked"] >= SEARCH_VERSION_INTERVAL:
+        _remote_version["version"] = get_job_queue().version()
+        _remote_version["checked"] = now
+    return _remote_version["version"]
+
+
+_search_cache: Optional[SearchCache] = None
+_instance_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """The process-wide search cache, None when SEARCH_CACHE_SIZE is 0"""
+    global _search_cache
+    with _instance_lock:
+        if _search_cache is None and SEARCH_CACHE_SIZE > 0:
+            _search_cache = SearchCache()
+        return _search_cache
+
+
+def get_search_cache_metrics() -> Optional[Dict[str, Any]]:
+    return _search_cache.metrics() if _search_cache is not None else None
@@ -1,45 +1,85 @@
 import os
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import pinecone
 from groq import Groq
-from transformers import AutoModel
-import aiohttp
-from collections import defaultdict
-from .vector_db import LocalVectorDB
-import tempfile
-from moviepy.editor import VideoFileClip
+import numpy as np
+from pathlib import Path
+from .vector_db import get_vector_db, HYBRID_SEARCH, VECTOR_DB_PATH
+from .video_processing import get_ollama_embedding, OLLAMA_EMBED_MODEL
+from .embedding_models import encode_texts, JINA_MODEL_NAME
+from .search_cache import get_search_cache, normalize_query, remote_index_version
+from .sequence_grouping import find_sequences, run_maximum, SEQUENCE_MIN_SECONDS
+from .frame_windows import WINDOW_DB_PATH, WINDOW_NAMESPACE, WINDOW_SEARCH
+from .clip_extractor import stream_clip, CLIP_MODE
+from .clip_cache import get_clip_cache
 from fastapi.responses import StreamingResponse
+from .media import MediaFileResponse
 
-async def get_remote_embedding(query: str, embedding_model) -> List[float]:
-    """Get embedding using Hugging Face model."""
-    return embedding_model.encode(query).tolist()
+# Largest number of frames a search may retrieve (Pinecone's top_k limit when metadata is included)
+SEARCH_MAX_K = int(os.getenv("SEARCH_MAX_K", "1000"))
+
+async def get_remote_embedding(query: str) -> List[float]:
+    """Get embedding using the shared Hugging Face model."""
+    return (await encode_texts([query]))[0]
 
 async def get_local_embedding(query: str) -> List[float]:
     """Get embedding using Ollama."""
-    async with aiohttp.ClientSession() as session:
-        async with session.post('http://localhost:11434/api/embeddings', json={
-            "model": "mxbai-embed-large",
-            "prompt": query
-        }) as response:
-            result = await response.json()
-            return result['embedding']
-
-async def search_remote_database(query_embedding: List[float], pinecone_index: pinecone.Index, k: int = 5) -> List[Dict]:
-    """Search Pinecone database."""
+    return await get_ollama_embedding(query)
+
+def pinecone_filter(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Pinecone metadata filter selecting the same frames as `filters` (see MetadataStore.select)"""
+    if not filters:
+        return None
+    conditions = {}
+    if filters.get("video_paths") is not None:
+        conditions["video_path"] = {"$in": list(filters["video_paths"])}
+    if filters.get("task_ids") is not None:
+        conditions["task_id"] = {"$in": list(filters["task_ids"])}
+    timestamp = {}
+    if filters.get("time_start") is not None:
+        timestamp["$gte"] = filters["time_start"]
+    if filters.get("time_end") is not None:
+        timestamp["$lte"] = filters["time_end"]
+    if timestamp:
+        conditions["timestamp"] = timestamp
+    return conditions or None
+
+async def search_remote_database(
+    query_embedding: List[float],
+    pinecone_index: pinecone.Index,
+    k: int = 5,
+    filters: Optional[Dict[str, Any]] = None,
+    namespace: Optional[str] = None
+) -> List[Dict]:
+    """Search Pinecone database, filtered on metadata by the index itself."""
     result = pinecone_index.query(
         vector=query_embedding,
         top_k=k,
         include_values=False,
-        include_metadata=True
+        include_metadata=True,
+        filter=pinecone_filter(filters),
+        namespace=namespace
     )
     return result.matches
 
-async def search_local_database(query_embedding: List[float], k: int = 5) -> List[Dict]:
-    """Search local FAISS database."""
-    vector_db = LocalVectorDB()
-    return vector_db.search(query_embedding, k)
+async def search_local_database(
+    query_embedding: List[float],
+    k: int = 5,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    query_text: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    index_path: str = VECTOR_DB_PATH
+) -> List[Dict]:
+    """Search local FAISS database, fused with a text search of the descriptions when `query_text` is given."""
+    vector_db = get_vector_db(dimension=len(query_embedding), index_path=index_path)
+    if query_text:
+        return vector_db.hybrid_search(
+            query_embedding, query_text, k, nprobe=nprobe, ef_search=ef_search, filters=filters
+        )
+    return vector_db.search(query_embedding, k, nprobe=nprobe, ef_search=ef_search, filters=filters)
 
 def format_timestamp(seconds: float) -> str:
     """Format seconds into HH:MM:SS string."""
@@ -48,76 +88,81 @@ def format_timestamp(seconds: float) -> str:
     seconds = int(seconds % 60)
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
-def group_frames_into_sequences(matches: List[Dict]) -> List[Dict]:
-    """Group consecutive frames into sequences."""
-    # Group frames by video path
-    video_groups = defaultdict(list)
-    
-    for match in matches:
-        # Handle both Pinecone and FAISS result formats
-        if hasattr(match, 'metadata'):  # Pinecone format
-            metadata = match.metadata
-            score = float(match.score)
-            id = match.id
-        else:  # FAISS format
-            metadata = match
-            score = 1.0 - float(match.get('distance', 0))  # Convert distance to similarity score
-            id = str(metadata.get('frame_number', ''))  # Use frame number as ID
-            
-        video_groups[metadata['video_path']].append({
-            'frame': metadata['frame_number'],
-            'frame_path': metadata['frame_path'],
-            'timestamp': metadata['timestamp'],
-            'metadata': metadata,
+def group_frames_into_sequences(
+    matches: List[Dict],
+    max_gap: Optional[int] = None,
+    min_frames: Optional[int] = None,
+    top_n: Optional[int] = None
+) -> List[Dict]:
+    """Group nearby frames of the same video into sequences, best first (see find_sequences)."""
+    # Handle both Pinecone and FAISS result formats
+    if matches and hasattr(matches[0], 'metadata'):  # Pinecone format
+        hits = [match.metadata for match in matches]
+        scores = [float(match.score) for match in matches]
+    else:  # FAISS format
+        hits = matches
+        scores = [
+            float(match['score']) if 'score' in match  # Cosine similarity, same scale as Pinecone
+            else 1.0 - float(match.get('distance', 0))  # Legacy L2 index, see `python -m backend.vector_db --migrate-cosine`
+            for match in matches
+        ]
+
+    video_paths = {}
+    video_ids = np.fromiter(
+        (video_paths.setdefault(metadata['video_path'], len(video_paths)) for metadata in hits),
+        dtype=np.int64, count=len(hits)
+    )
+    # Window hits cover frame_number to frame_end, frame hits a single frame
+    frame_starts = np.fromiter((metadata['frame_number'] for metadata in hits), dtype=np.int64, count=len(hits))
+    frame_ends = np.fromiter(
+        (metadata.get('frame_end', metadata['frame_number']) for metadata in hits), dtype=np.int64, count=len(hits)
+    )
+    timestamps = np.fromiter(
+        (metadata.get('time_end', metadata['timestamp']) for metadata in hits), dtype=np.float64, count=len(hits)
+    )
+    order, run_starts, run_ends, run_scores = find_sequences(
+        video_ids, frame_starts, frame_ends, np.array(scores), max_gap, min_frames, top_n
+    )
+    sequence_ends = run_maximum(frame_ends, order, run_starts, run_ends).tolist()
+    time_ends = run_maximum(timestamps, order, run_starts, run_ends).tolist()
+
+    # Only the frames of the returned sequences are gathered one by one
+    has_windows = bool((frame_ends > frame_starts).any())
+    sorted_frames = frame_starts[order].tolist()
+    order = order.tolist()
+    sequences = []
+    for run_start, run_end, score, frame_end, end_time in zip(
+        run_starts.tolist(), run_ends.tolist(), run_scores.tolist(), sequence_ends, time_ends
+    ):
+        if has_windows:
+            # Every frame of every window once, in order
+            covered = {}
+            for i in order[run_start:run_end]:
+                for frame, frame_path in enumerate(hits[i].get('frame_paths', [hits[i]['frame_path']]), int(hits[i]['frame_number'])):
+                    covered.setdefault(frame, frame_path)
+            frames = sorted(covered)
+            frame_paths = [covered[frame] for frame in frames]
+        else:
+            frames = sorted_frames[run_start:run_end]
+            frame_paths = [hits[i]['frame_path'] for i in order[run_start:run_end]]
+        metadata = hits[order[run_start]]
+        start_time = float(metadata['timestamp'])
+        # A single frame stands for the interval up to the next sample
+        end_time = max(end_time, start_time + SEQUENCE_MIN_SECONDS)
+        sequences.append({
+            'video_path': metadata['video_path'],
+            'frame_start': frames[0],
+            'frame_end': frame_end,
+            'time_start': start_time,
+            'time_end': end_time,
+            'duration': end_time - start_time,
+            'frames': frames,
+            'frame_paths': frame_paths,
             'score': score,
-            'id': id
+            'description': metadata['description']
         })
-    
-    sequences = []
-    for video_path, frames in video_groups.items():
-        # Sort frames by frame number
-        frames.sort(key=lambda x: x['frame'])
-        current_sequence = [frames[0]]
-        
-        for i in range(1, len(frames)):
-            # Allow for one frame gap (frame difference of 2 or less)
-            if frames[i]['frame'] <= current_sequence[-1]['frame'] + 2:
-                current_sequence.append(frames[i])
-            else:
-                sequences.extend(create_sequence(current_sequence, video_path))
-                current_sequence = [frames[i]]
-        
-        # Add the last sequence
-        if len(current_sequence) > 1:
-            sequences.extend(create_sequence(current_sequence, video_path))
-    
-    # Sort sequences by score
-    sequences.sort(key=lambda x: x['score'], reverse=True)
     return sequences
 
-def create_sequence(frames: List[Dict], video_path: str) -> List[Dict]:
-    """Create a sequence from a list of consecutive frames."""
-    if len(frames) <= 1:
-        return []
-        
-    start_time = frames[0]['timestamp']
-    end_time = frames[-1]['timestamp']
-    
-    return [{
-        'video_path': video_path,
-        'frame_start': frames[0]['frame'],
-        'frame_end': frames[-1]['frame'],
-        'time_start': start_time,
-        'time_end': end_time,
-        'time_start_formatted': format_timestamp(start_time),
-        'time_end_formatted': format_timestamp(end_time),
-        'duration': end_time - start_time,
-        'frames': frames,
-        'frame_paths': [f['frame_path'] for f in frames],
-        'score': sum(f['score'] for f in frames) / len(frames),
-        'description': frames[0]['metadata']['description']
-    }]
-
 def format_sequences_for_response(sequences: List[Dict]) -> List[Dict]:
     """Format sequences for API response."""
     return [{
@@ -132,53 +177,127 @@ def format_sequences_for_response(sequences: List[Dict]) -> List[Dict]:
         'description': seq['description'],
         'frame_paths': seq['frame_paths'],
         'metadata': {
-            'frames': [f['frame'] for f in seq['frames']],
+            'frames': seq['frames'],
             'video_path': seq['video_path']
         }
     } for idx, seq in enumerate(sequences)]
 
+def paginate(response: Dict, offset: int = 0, limit: Optional[int] = None) -> Dict:
+    """One page of a search response; sequence ids stay their rank in the full response"""
+    end = None if limit is None else offset + limit
+    results = response["results"][offset:end]
+    return {
+        **response,
+        "results": results,
+        "count": len(results),
+        "total": response["count"],
+        "offset": offset
+    }
+
 async def search_video_sequences(
     user_query: str,
     pinecone_index: pinecone.Index = None,
     is_local: bool = False,
-    k: int = 5
+    k: int = 5,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    hybrid: Optional[bool] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    windows: Optional[bool] = None
 ) -> Dict:
-    """Search for video sequences and return formatted results."""
+    """Search for video sequences and return formatted results.
+
+    The k best frames matching `filters` ("video_paths", "task_ids",
+    "time_start", "time_end") are grouped into sequences, of which `limit`
+    are returned from `offset` on (all by default), with their `total`.
+    Local searches also match the query text against frame descriptions
+    (BM25) unless `hybrid` is False (defaults to HYBRID_SEARCH).
+
+    Unless `windows` is False (defaults to WINDOW_SEARCH), the k best
+    windows of consecutive frames are retrieved too: each is a sequence on
+    its own, or extends the sequence of the frames it overlaps.
+    """
     print(f"🟢 Starting search for query: {user_query}")
     try:
+        if not is_local and not pinecone_index:
+            raise ValueError("Pinecone index required for remote search")
+        cache = get_search_cache()
+        query = normalize_query(user_query)
+        embedding_key = (OLLAMA_EMBED_MODEL if is_local else JINA_MODEL_NAME, query)
+
         # Get query embedding
-        print("🟢 Generating query embedding")
+        query_embedding = cache.embeddings.get(embedding_key) if cache else None
+        if query_embedding is None:
+            print("🟢 Generating query embedding")
+            if is_local:
+                query_embedding = await get_local_embedding(query)
+            else:
+                query_embedding = await get_remote_embedding(query)
+            if cache:
+                cache.embeddings.put(embedding_key, query_embedding)
+
+        # Local windows are only searched once some were stored
+        windows = (WINDOW_SEARCH if windows is None else windows) and (not is_local or Path(WINDOW_DB_PATH).is_dir())
+
+        # Responses are only reused while the indexes hold the same vectors
         if is_local:
-            query_embedding = await get_local_embedding(user_query)
+            index_version = get_vector_db(dimension=len(query_embedding)).version
+            if windows:
+                window_db = get_vector_db(dimension=len(query_embedding), index_path=WINDOW_DB_PATH)
+                index_version = (index_version, window_db.version)
         else:
-            if not pinecone_index:
-                raise ValueError("Pinecone index required for remote search")
-            embedding_model = AutoModel.from_pretrained('jinaai/jina-embeddings-v2-base-en', trust_remote_code=True)
-            query_embedding = await get_remote_embedding(user_query, embedding_model)
+            index_version = remote_index_version()
+        hybrid = is_local and (HYBRID_SEARCH if hybrid is None else hybrid)
+        filter_key = tuple(
+            (key, tuple(sorted(value)) if isinstance(value, (list, tuple, set)) else value)
+            for key, value in sorted((filters or {}).items()) if value is not None
+        )
+        result_key = (embedding_key, k, nprobe, ef_search, hybrid, windows, filter_key, index_version)
+        response = cache.results.get(result_key) if cache else None
+        if response is not None:
+            print(f"🟢 Search served from cache ({response['count']} sequences)")
+            return paginate(response, offset, limit)
 
         # Search database
         print("🟢 Searching database")
         if is_local:
-            results = await search_local_database(query_embedding, k)
+            results = await search_local_database(
+                query_embedding, k, nprobe=nprobe, ef_search=ef_search,
+                query_text=query if hybrid else None, filters=filters
+            )
+            if windows:
+                results += await search_local_database(
+                    query_embedding, k, nprobe=nprobe, ef_search=ef_search,
+                    query_text=query if hybrid else None, filters=filters, index_path=WINDOW_DB_PATH
+                )
         else:
-            results = await search_remote_database(query_embedding, pinecone_index, k)
+            results = await search_remote_database(query_embedding, pinecone_index, k, filters=filters)
+            if windows:
+                results += await search_remote_database(
+                    query_embedding, pinecone_index, k, filters=filters, namespace=WINDOW_NAMESPACE
+                )
         print(f"🟢 Search completed. Found {len(results)} matches")
 
         # Process results
         if len(results) > 0:
             sequences = group_frames_into_sequences(results)
             formatted_sequences = format_sequences_for_response(sequences)
-            return {
+            response = {
                 "status": "success",
                 "results": formatted_sequences,
                 "count": len(formatted_sequences)
             }
         else:
-            return {
+            response = {
                 "status": "success",
                 "results": [],
                 "count": 0
             }
+        if cache:
+            cache.results.put(result_key, response)
+        return paginate(response, offset, limit)
 
     except Exception as e:
         error_message = f"Error in search: {str(e)}"
@@ -193,56 +312,31 @@ async def search_video_sequences(
 async def extract_video_sequence(
     video_path: str,
     time_start: float,
-    time_end: float
-) -> StreamingResponse:
-    """Extract a video sequence between two timestamps."""
-    print("🟢 Extracting video sequence")
+    time_end: float,
+    mode: Optional[str] = None
+):
+    """Extract a video sequence between two timestamps.
+
+    Clips are served from the clip cache, with Range support, or streamed
+    to the client while they are being cut when the cache is disabled. See
+    CLIP_MODE for the available extraction modes.
+    """
+    print(f"🟢 Extracting video sequence from {time_start} to {time_end} ({mode or CLIP_MODE})")
+    filename = f"sequence_{time_start:.2f}-{time_end:.2f}.mp4"
     try:
-        # Load video with moviepy
-        print("🟢 Loading video with moviepy")
-        video = VideoFileClip(video_path)
-        
-        # Extract the subclip with both video and audio
-        print(f"🟢 Extracting subclip from {time_start} to {time_end}")
-        clip = video.subclip(time_start, time_end)
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
-            output_path = temp_file.name
-            
-            # Write video with audio
-            print("🟢 Writing video with audio")
-            clip.write_videofile(
-                output_path,
-                codec='libx264',
-                audio_codec='aac',
-                temp_audiofile=None,
-                remove_temp=True,
-                logger=None
-            )
-            
-            # Clean up moviepy clips
-            clip.close()
-            video.close()
-            
-            def iterfile():
-                try:
-                    with open(output_path, 'rb') as f:
-                        yield from f
-                finally:
-                    try:
-                        os.unlink(output_path)
-                    except Exception as cleanup_error:
-                        print(f"🔴 Error during cleanup: {str(cleanup_error)}")
-
-            return StreamingResponse(
-                iterfile(),
-                media_type='video/mp4',
-                headers={
-                    'Content-Disposition': f'attachment; filename="sequence_{time_start:.2f}-{time_end:.2f}.mp4"'
-                }
-            )
-            
+        clip_cache = get_clip_cache()
+        if clip_cache is not None:
+            clip_path = await clip_cache.get(video_path, time_start, time_end, mode)
+            return MediaFileResponse(clip_path, media_type='video/mp4', filename=filename)
+
+        chunks = await stream_clip(video_path, time_start, time_end, mode)
+        return StreamingResponse(
+            chunks,
+            media_type='video/mp4',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"'
+            }
+        )
     except Exception as e:
         print(f"🔴 Error processing video: {str(e)}")
         raise e
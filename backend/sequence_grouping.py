@@ -0,0 +1,91 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Search hits of the same video are grouped into one sequence as long as each
+# starts at most SEQUENCE_MAX_GAP sampled frames after the end of the hits
+# before it (2 tolerates one missed frame). Sequences covering fewer than
+# SEQUENCE_MIN_FRAMES frames are dropped (the default of 1 keeps single-frame
+# hits, 2 only returns runs). Sequences last at least SEQUENCE_MIN_SECONDS,
+# one sample interval by default, so a single frame is a playable clip.
+SEQUENCE_MAX_GAP = int(os.getenv("SEQUENCE_MAX_GAP", "2"))
+SEQUENCE_MIN_FRAMES = int(os.getenv("SEQUENCE_MIN_FRAMES", "1"))
+SEQUENCE_MIN_SECONDS = float(os.getenv("SEQUENCE_MIN_SECONDS", os.getenv("SAMPLE_INTERVAL", "2.0")))
+
+
+def find_sequences(
+    video_ids: np.ndarray,
+    frame_starts: np.ndarray,
+    frame_ends: np.ndarray,
+    scores: np.ndarray,
+    max_gap: Optional[int] = None,
+    min_frames: Optional[int] = None,
+    top_n: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Group hits into runs of nearby frames of the same video, best scoring first
+
+    Overlapping hits, such as the same frame found twice or a window and the
+    frames in it, end up in the same run. A run scores the mean score of its
+    hits and must cover at least `min_frames` distinct frames.
+    Args:
+        video_ids: Integer id of the video of each hit
+        frame_starts, frame_ends: First and last frame covered by each hit (equal for single frames)
+        scores: Score of each hit, higher is better
+        max_gap: See SEQUENCE_MAX_GAP
+        min_frames: See SEQUENCE_MIN_FRAMES
+        top_n: Only return the best `top_n` runs
+    Returns:
+        (order, run_starts, run_ends, run_scores): `order` sorts the hits by
+        video and frame, and run i is made of hits order[run_starts[i]:run_ends[i]]
+    """
+    max_gap = SEQUENCE_MAX_GAP if max_gap is None else max_gap
+    min_frames = SEQUENCE_MIN_FRAMES if min_frames is None else min_frames
+    video_ids = np.asarray(video_ids, dtype=np.int64)
+    frame_starts = np.asarray(frame_starts, dtype=np.int64)
+    frame_ends = np.asarray(frame_ends, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    if not len(scores):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0, dtype=np.float64)
+
+    order = np.lexsort((frame_starts, video_ids))
+    videos, starts, ends = video_ids[order], frame_starts[order] - frame_starts.min(), frame_ends[order] - frame_starts.min()
+
+    # Shift each video past the frames of the previous one, so that a running
+    # maximum of the hit ends restarts at every video and never bridges two
+    video_rank = np.concatenate(([0], np.cumsum(videos[1:] != videos[:-1])))
+    shift = video_rank * (int(ends.max()) + max_gap + 2)
+    covered = np.maximum.accumulate(ends + shift)
+    new_run = np.empty(len(order), dtype=bool)
+    new_run[0] = True
+    new_run[1:] = starts[1:] + shift[1:] > covered[:-1] + max_gap
+
+    run_starts = np.flatnonzero(new_run)
+    run_ends = np.append(run_starts[1:], len(order))
+    counts = run_ends - run_starts
+    run_scores = np.add.reduceat(scores[order], run_starts) / counts
+    # Frames each hit adds past those covered by the hits before it in its run
+    previous = np.empty(len(order), dtype=np.int64)
+    previous[0] = starts[0] - 1
+    previous[1:] = np.where(new_run[1:], starts[1:] - 1, covered[:-1] - shift[1:])
+    run_frames = np.add.reduceat(np.maximum(ends - np.maximum(starts - 1, previous), 0), run_starts)
+
+    keep = np.flatnonzero(run_frames >= min_frames)
+    if top_n is not None and top_n < len(keep):
+        # Only the best top_n are sorted
+        keep = keep[np.argpartition(-run_scores[keep], top_n - 1)[:top_n]]
+        keep.sort()
+    ranked = keep[np.argsort(-run_scores[keep], kind="stable")]
+    return order, run_starts[ranked], run_ends[ranked], run_scores[ranked]
+
+
+def run_maximum(values: np.ndarray, order: np.ndarray, run_starts: np.ndarray, run_ends: np.ndarray) -> np.ndarray:
+    """Maximum of `values` (one per hit) over each run returned by `find_sequences`"""
+    values = np.asarray(values)
+    if not len(run_starts):
+        return np.empty(0, dtype=values.dtype)
+    # reduceat over (start, end) pairs reduces each run at even positions;
+    # the padding makes the end of a run closing the array a valid index
+    padded = np.append(values[order], values[:1])
+    return np.maximum.reduceat(padded, np.column_stack((run_starts, run_ends)).ravel())[::2]
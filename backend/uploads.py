@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import shutil
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import UploadFile
+
+from .dedup import hash_file
+
+# Uploads are copied to disk UPLOAD_CHUNK_SIZE bytes at a time, so memory
+# use doesn't grow with the file. Resumable uploads are split into parts of
+# UPLOAD_PART_SIZE bytes and kept in UPLOAD_DIR until completed, or until
+# they have been idle for UPLOAD_SESSION_TTL seconds.
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_SESSION_TTL = float(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+
+
+async def write_chunks(
+    chunks: AsyncIterator[bytes],
+    path: Path,
+    offset: Optional[int] = None,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """Write a stream of chunks to `path` (at `offset` in an existing file), hashing them on the way
+
+    Raises ValueError, without writing past it, once more than `limit` bytes
+    arrive. Returns the number of bytes written and their SHA-256.
+    """
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    size = 0
+
+    def write(f, chunk: bytes) -> None:
+        f.write(chunk)
+        digest.update(chunk)
+
+    with open(path, "wb" if offset is None else "r+b") as f:
+        if offset:
+            f.seek(offset)
+        async for chunk in chunks:
+            if limit is not None and size + len(chunk) > limit:
+                raise ValueError(f"Received more than the expected {limit} bytes")
+            if chunk:
+                # File writes and hashing both stay off the event loop
+                await loop.run_in_executor(None, write, f, chunk)
+                size += len(chunk)
+    return {"size": size, "sha256": digest.hexdigest()}
+
+
+async def read_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    """Iterate over an UploadFile in UPLOAD_CHUNK_SIZE chunks"""
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def save_upload(file: UploadFile, path: str) -> Dict[str, Any]:
+    """Copy a multipart upload to `path` in bounded chunks, returns its size and SHA-256"""
+    tmp_path = Path(f"{path}.part")
+    try:
+        result = await write_chunks(read_upload(file), tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return result
+
+
+class UploadSessions:
+    """Resumable uploads: init, then any number of (retried, parallel) parts, then complete.
+
+    Every session is a directory holding `meta.json`, the preallocated
+    `data` file that parts are written into at their offset, and one marker
+    per received part, so the received parts can be listed after a restart
+    and a client only resends what is missing.
+    """
+
+    def __init__(self, directory: str = UPLOAD_DIR, part_size: int = UPLOAD_PART_SIZE):
+        self.directory = Path(directory)
+        self.part_size = part_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def create(self, filename: str, size: int) -> Dict[str, Any]:
+        """Start an upload of `size` bytes and return its id and part layout"""
+        if size <= 0:
+            raise ValueError("Upload size must be positive")
+        self.cleanup()
+
+        upload_id = uuid.uuid4().hex
+        session = self.directory / upload_id
+        (session / "parts").mkdir(parents=True)
+        meta = {
+            "filename": os.path.basename(filename),
+            "size": size,
+            "part_size": self.part_size,
+            "parts": -(-size // self.part_size),
+        }
+        with open(session / "data", "wb") as f:
+            f.truncate(size)
+        with open(session / "meta.json", "w") as f:
+            json.dump(meta, f)
+        return {"upload_id": upload_id, **meta}
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        """Parts received so far"""
+        session, meta = self._session(upload_id)
+        received = sorted(int(marker.name) for marker in (session / "parts").iterdir())
+        return {"upload_id": upload_id, **meta, "received": received}
+
+    async def write_part(self, upload_id: str, index: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Store part `index` from a stream of chunks; resending a part overwrites it"""
+        session, meta = self._session(upload_id)
+        if not 0 <= index < meta["parts"]:
+            raise ValueError(f"Part {index} out of range, the upload has {meta['parts']} parts")
+        offset = index * meta["part_size"]
+        expected = min(meta["part_size"], meta["size"] - offset)
+
+        marker = session / "parts" / str(index)
+        marker.unlink(missing_ok=True)
+        result = await write_chunks(chunks, session / "data", offset, limit=expected)
+        if result["size"] != expected:
+            raise ValueError(f"Part {index} should be {expected} bytes, received {result['size']}")
+        with open(marker, "w") as f:
+            f.write(result["sha256"])
+        os.utime(session)
+        return {"index": index, **result}
+
+    async def complete(self, upload_id: str, path: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Move the assembled file to `path` once every part is in, returns its size and SHA-256"""
+        status = self.status(upload_id)
+        missing = sorted(set(range(status["parts"])) - set(status["received"]))
+        if missing:
+            raise ValueError(f"Upload {upload_id} is missing parts {missing[:20]}")
+
+        session = self.directory / upload_id
+        content_hash = await asyncio.get_running_loop().run_in_executor(None, hash_file, session / "data")
+        if sha256 and sha256.lower() != content_hash:
+            raise ValueError(f"Upload {upload_id} has SHA-256 {content_hash}, expected {sha256}")
+
+        os.replace(session / "data", path)
+        shutil.rmtree(session, ignore_errors=True)
+        return {"size": status["size"], "sha256": content_hash}
+
+    def cleanup(self) -> None:
+        """Drop sessions idle for longer than UPLOAD_SESSION_TTL"""
+        cutoff = time.time() - UPLOAD_SESSION_TTL
+        for session in self.directory.iterdir():
+            if session.is_dir() and session.stat().st_mtime < cutoff:
+                shutil.rmtree(session, ignore_errors=True)
+
+    def _session(self, upload_id: str):
+        # Ids are uuid hex, anything else could point outside the upload directory
+        if len(upload_id) != 32 or any(c not in "0123456789abcdef" for c in upload_id):
+            raise KeyError(upload_id)
+        session = self.directory / upload_id
+        try:
+            with open(session / "meta.json") as f:
+                return session, json.load(f)
+        except FileNotFoundError:
+            raise KeyError(upload_id)
@@ -1,37 +1,207 @@
 import os
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
 
+import atexit
+import itertools
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, keep to one process per store
+    fcntl = None
 import faiss
 import numpy as np
 import json
+import threading
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+
+from .metadata_store import MetadataStore
+
+# New vectors are appended to a write-ahead log and folded into the index
+# files by a background checkpoint every VECTOR_DB_CHECKPOINT_INTERVAL
+# seconds, or sooner once VECTOR_DB_CHECKPOINT_VECTORS are pending.
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "vector_db")
+VECTOR_DB_CHECKPOINT_INTERVAL = float(os.getenv("VECTOR_DB_CHECKPOINT_INTERVAL", "30"))
+VECTOR_DB_CHECKPOINT_VECTORS = int(os.getenv("VECTOR_DB_CHECKPOINT_VECTORS", "10000"))
+
+# Index type: "flat" (exact), "hnsw", "ivf_flat" or "ivf_pq". Approximate
+# indexes are built from the flat index once it holds VECTOR_INDEX_THRESHOLD
+# vectors, since they need enough data to train on and only pay off at scale.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+VECTOR_INDEX_THRESHOLD = int(os.getenv("VECTOR_INDEX_THRESHOLD", "50000"))
+VECTOR_NPROBE = int(os.getenv("VECTOR_NPROBE", "16"))
+VECTOR_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "64"))
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+# Metric for new stores. With "cosine" vectors are L2-normalised on insert and
+# query and searched by inner product, so scores are cosine similarities like
+# Pinecone's. Existing stores keep the metric they were built with until
+# migrated with `python -m backend.vector_db --migrate-cosine`.
+VECTOR_METRIC = os.getenv("VECTOR_METRIC", "cosine")
+METRICS = {"l2": faiss.METRIC_L2, "cosine": faiss.METRIC_INNER_PRODUCT}
+
+# Filtered searches that select at most FILTER_EXACT_MAX_VECTORS frames score
+# them exactly from their stored vectors, which is cheaper than searching the
+# whole index and can't come back short the way an approximate index does
+# when most of it is filtered out. Larger selections are searched in the
+# index, restricted to the selected ids by a FAISS ID selector.
+FILTER_EXACT_MAX_VECTORS = int(os.getenv("FILTER_EXACT_MAX_VECTORS", "2000"))
+
+# Hybrid search adds BM25 matches of the query text against frame
+# descriptions to the vector results, fused by reciprocal rank with constant
+# HYBRID_RRF_K. The text search gets HYBRID_LEXICAL_BUDGET_MS milliseconds,
+# past which the query is answered from the vector results alone.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_LEXICAL_BUDGET_MS = float(os.getenv("HYBRID_LEXICAL_BUDGET_MS", "50"))
+
+
+def build_index(index_type: str, vectors: np.ndarray, dimension: int, metric: str = "l2") -> faiss.Index:
+    """Create a FAISS index of the given type, train it if needed and add `vectors`
+    Args:
+        index_type: One of INDEX_TYPES
+        vectors: float32 array of shape (n, dimension), also used as training data
+        dimension: Size of embedding vectors
+        metric: "l2" or "cosine" (vectors must already be normalised)
+    Returns:
+        The populated index
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type}, expected one of {INDEX_TYPES}")
+    faiss_metric = METRICS[metric]
+
+    if index_type == "flat":
+        index = faiss.IndexFlat(dimension, faiss_metric)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, 32, faiss_metric)
+        index.hnsw.efConstruction = 200
+    else:
+        # ~4*sqrt(n) lists, each with enough points to train its centroid
+        nlist = int(min(max(4 * np.sqrt(len(vectors)), 1), max(len(vectors) // 39, 1)))
+        quantizer = faiss.IndexFlat(dimension, faiss_metric)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss_metric)
+        else:
+            # Largest sub-quantizer count up to 64 that divides the dimension
+            m = max(m for m in range(1, 65) if dimension % m == 0)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, m, 8, faiss_metric)
+        training_size = min(len(vectors), nlist * 256)
+        sample = np.random.default_rng(0).choice(len(vectors), training_size, replace=False)
+        index.train(vectors[np.sort(sample)])
+        index.nprobe = VECTOR_NPROBE
+
+    if len(vectors):
+        index.add(vectors)
+    return index
+
+
+def search_parameters(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    selector: Optional[faiss.IDSelector] = None
+):
+    """Per-query search parameters for approximate or filtered searches, None for plain exact ones"""
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(nprobe=nprobe or VECTOR_NPROBE, sel=selector)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or VECTOR_EF_SEARCH, sel=selector)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = None) -> List[Tuple[int, float]]:
+    """Fuse ranked lists of ids: each id scores the sum of 1 / (k + rank) over the lists holding it
+
+    Returns (id, score) pairs, best first, with scores scaled so that an id
+    ranked first in every list scores 1.
+    """
+    k = HYBRID_RRF_K if k is None else k
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    best = len(rankings) / (k + 1)
+    return sorted(((item, score / best) for item, score in scores.items()), key=lambda pair: pair[1], reverse=True)
+
+
+_versions = itertools.count(1)
+
+
+class VectorDBLocked(RuntimeError):
+    """Another process has the vector store open"""
+
 
 class LocalVectorDB:
-    def __init__(self, dimension: int = 768, index_path: str = "vector_db"):
+    def __init__(
+        self,
+        dimension: int = 768,
+        index_path: str = VECTOR_DB_PATH,
+        background_checkpoints: bool = True,
+        index_type: str = None,
+        index_threshold: int = None,
+        metric: str = None
+    ):
         """Initialize FAISS index
         Args:
             dimension: Size of embedding vectors (768 for mxbai-embed-large)
             index_path: Directory to store the index and metadata
+            background_checkpoints: Run a thread that periodically checkpoints the log
+            index_type: Index to switch to once the corpus is large enough (see INDEX_TYPES)
+            index_threshold: Number of vectors at which the flat index is rebuilt as `index_type`
+            metric: "cosine" or "l2" for a new store, an existing one keeps its own
         """
         self.dimension = dimension
+        self.index_type = index_type or VECTOR_INDEX_TYPE
+        self.index_threshold = VECTOR_INDEX_THRESHOLD if index_threshold is None else index_threshold
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {self.index_type}, expected one of {INDEX_TYPES}")
         self.index_path = Path(index_path)
         self.index_file = self.index_path / "faiss.index"
-        self.metadata_file = self.index_path / "metadata.json"
-        
+        self.metadata_file = self.index_path / "metadata.db"
+
+        # Writers and searches share the index, checkpoints only hold the lock to snapshot it
+        self._lock = threading.RLock()
+        self._checkpoint_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._rebuilding = False
+        self._index_changed = False
+        # Changes whenever search results may change, so callers can cache them
+        self.version = next(_versions)
+
         # Create directory if it doesn't exist
         self.index_path.mkdir(parents=True, exist_ok=True)
-        
+        # One process at a time: each one keeps its own index in memory and
+        # would overwrite the other's logs and checkpoints
+        lock_vector_db(self.index_path)
+
         # Initialize or load the index
         if self.index_file.exists():
             print("🟢 Loading existing FAISS index...")
             self.index = faiss.read_index(str(self.index_file))
-            with open(self.metadata_file, 'r') as f:
-                self.metadata = json.load(f)
+            self.dimension = self.index.d
+            self.metric = "cosine" if self.index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+            if self.metric != (metric or VECTOR_METRIC):
+                print(f"🟡 FAISS index uses {self.metric} scoring, run `python -m backend.vector_db --migrate-cosine` to convert it")
         else:
             print("🟡 Creating new FAISS index...")
-            self.index = faiss.IndexFlatL2(dimension)
-            self.metadata = []
+            self.metric = metric or VECTOR_METRIC
+            if self.metric not in METRICS:
+                raise ValueError(f"Unknown metric {self.metric}, expected one of {tuple(METRICS)}")
+            self.index = build_index("flat", np.empty((0, dimension), dtype='float32'), dimension, self.metric)
+
+        self._import_legacy_metadata()
+        self.metadata = MetadataStore(self.metadata_file)
+        self.pending = self._replay_logs()
+        self._open_log()
+        if self.pending:
+            self.checkpoint()
+        self._maybe_rebuild()
+
+        self._checkpointer = None
+        if background_checkpoints:
+            self._checkpointer = threading.Thread(target=self._checkpoint_loop, name="vector-db-checkpoint", daemon=True)
+            self._checkpointer.start()
 
     def add_vectors(self, vectors: List[List[float]], metadata_list: List[Dict[str, Any]]) -> None:
         """Add vectors and their metadata to the index
@@ -41,61 +211,444 @@ class LocalVectorDB:
         """
         try:
             # Convert vectors to numpy array
-            vectors_np = np.array(vectors).astype('float32')
-            
-            # Add vectors to FAISS index
-            self.index.add(vectors_np)
-            
-            # Add metadata
-            self.metadata.extend(metadata_list)
-            
-            # Save index and metadata
-            self._save_index()
-            
+            vectors_np = np.ascontiguousarray(vectors, dtype='float32')
+            # Checked before anything is logged: a wrong-width record would corrupt every later replay
+            if vectors_np.ndim != 2 or vectors_np.shape[1] != self.dimension:
+                raise ValueError(f"Expected vectors of dimension {self.dimension}, got shape {vectors_np.shape}")
+            if len(vectors_np) != len(metadata_list):
+                raise ValueError(f"Got {len(vectors_np)} vectors for {len(metadata_list)} metadata entries")
+            if not np.isfinite(vectors_np).all():
+                raise ValueError("Vectors contain NaN or infinite values")
+            if self.metric == "cosine":
+                faiss.normalize_L2(vectors_np)
+
+            with self._lock:
+                # Log the vectors and commit the metadata first so both survive a crash
+                self._vector_log.write(vectors_np.tobytes())
+                self._vector_log.flush()
+                # On disk before the metadata commit, or a power loss could leave rows without vectors
+                os.fsync(self._vector_log.fileno())
+                self.metadata.append(metadata_list)
+
+                # Add vectors to FAISS index
+                self.index.add(vectors_np)
+                self.version = next(_versions)
+                self.pending += len(metadata_list)
+                pending = self.pending
+
+            if pending >= VECTOR_DB_CHECKPOINT_VECTORS:
+                self.checkpoint()
+            self._maybe_rebuild()
+
             print(f"🟢 Successfully added {len(vectors)} vectors to FAISS index")
         except Exception as e:
             print(f"🔴 Error adding vectors to FAISS index: {str(e)}")
             raise
 
-    def search(self, query_vector: List[float], k: int = 5) -> List[Dict[str, Any]]:
+    def search(
+        self,
+        query_vector: List[float],
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
         """Search for similar vectors
         Args:
             query_vector: Query embedding vector
             k: Number of results to return
+            nprobe: Inverted lists visited by IVF indexes (defaults to VECTOR_NPROBE)
+            ef_search: Candidate list size for HNSW indexes (defaults to VECTOR_EF_SEARCH)
+            filters: Only search frames of these "video_paths"/"task_ids" and
+                between "time_start" and "time_end" (see MetadataStore.select)
         Returns:
-            List of metadata for the k most similar vectors
+            List of metadata for the k most similar vectors, with a cosine
+            `score` (cosine stores) or an L2 `distance` (l2 stores)
         """
         try:
-            # Convert query vector to numpy array
-            query_np = np.array([query_vector]).astype('float32')
-            
-            # Search the index
-            distances, indices = self.index.search(query_np, k)
-            
-            # Get metadata for results
-            results = []
-            for idx, dist in zip(indices[0], distances[0]):
-                if idx < len(self.metadata):  # Check if index is valid
-                    result = self.metadata[idx].copy()
-                    result['distance'] = float(dist)  # Add distance score
-                    results.append(result)
-            
-            return results
+            return self._vector_results(self._vector_hits(query_vector, k, nprobe, ef_search, filters))
         except Exception as e:
             print(f"🔴 Error searching FAISS index: {str(e)}")
             raise
 
-    def _save_index(self) -> None:
-        """Save the FAISS index and metadata to disk"""
+    def hybrid_search(
+        self,
+        query_vector: List[float],
+        query_text: str,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        budget: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search by vector and by BM25 over the frame descriptions, fused by reciprocal rank
+        Args:
+            query_vector: Query embedding vector
+            query_text: Query text, matched against descriptions
+            k: Number of results to return, and of candidates taken from each search
+            nprobe, ef_search, filters: See `search`
+            budget: Seconds the text search may take (defaults to HYBRID_LEXICAL_BUDGET_MS)
+        Returns:
+            Like `search` when the text matches nothing or runs out of time.
+            Otherwise metadata of the k best fused hits, with the fused `score`
+            (between 0 and 1), their `vector_rank` and `lexical_rank` (None
+            when absent from that search) and `bm25` score
+        """
         try:
-            faiss.write_index(self.index, str(self.index_file))
-            with open(self.metadata_file, 'w') as f:
-                json.dump(self.metadata, f)
-            print("🟢 Saved FAISS index and metadata to disk")
+            vector_hits = self._vector_hits(query_vector, k, nprobe, ef_search, filters)
+            budget = HYBRID_LEXICAL_BUDGET_MS / 1000 if budget is None else budget
+            lexical_hits = self.metadata.search_text(query_text, k, timeout=budget, filters=filters)
+            if lexical_hits is None:
+                print(f"🟡 Text search exceeded its {budget * 1000:.0f}ms budget, using vector results only")
+            if not lexical_hits:
+                return self._vector_results(vector_hits)
+
+            vector_ids = [int(idx) for idx, _ in vector_hits]
+            lexical_ids = [idx for idx, _ in lexical_hits]
+            bm25 = dict(lexical_hits)
+            fused = reciprocal_rank_fusion([vector_ids, lexical_ids])[:k]
+            results = self.metadata.get([idx for idx, _ in fused])
+            for result, (idx, score) in zip(results, fused):
+                result['score'] = score
+                result['vector_rank'] = vector_ids.index(idx) + 1 if idx in vector_ids else None
+                result['lexical_rank'] = lexical_ids.index(idx) + 1 if idx in bm25 else None
+                result['bm25'] = bm25.get(idx)
+            return results
         except Exception as e:
-            print(f"🔴 Error saving FAISS index: {str(e)}")
+            print(f"🔴 Error in hybrid search: {str(e)}")
             raise
 
+    def _vector_hits(
+        self,
+        query_vector: List[float],
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[int, float]]:
+        """(id, distance or similarity) of the k nearest vectors matching `filters`, nearest first"""
+        # Convert query vector to numpy array
+        query_np = np.array([query_vector]).astype('float32')
+        if self.metric == "cosine":
+            faiss.normalize_L2(query_np)
+
+        # Search the index (the selection is made under the lock, so it covers the same vectors)
+        with self._lock:
+            mask = self.metadata.select(filters)
+            if mask is None:
+                params = search_parameters(self.index, nprobe, ef_search)
+                distances, indices = self.index.search(query_np, k, params=params)
+            elif mask.sum() <= FILTER_EXACT_MAX_VECTORS:
+                distances, indices = self._search_subset(query_np, np.flatnonzero(mask), k)
+            else:
+                bitmap = np.packbits(mask, bitorder="little")
+                selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+                params = search_parameters(self.index, nprobe, ef_search, selector)
+                distances, indices = self.index.search(query_np, k, params=params)
+
+        # Skip the -1 padding of short result lists
+        return [(idx, dist) for idx, dist in zip(indices[0], distances[0]) if 0 <= idx < len(self.metadata)]
+
+    def _search_subset(self, query_np: np.ndarray, ids: np.ndarray, k: int):
+        """Exact search among the vectors `ids`, with the same output as Index.search"""
+        if not len(ids):
+            return np.empty((1, 0), dtype='float32'), np.empty((1, 0), dtype='int64')
+        if isinstance(self.index, faiss.IndexIVF) and self.index.direct_map.type == faiss.DirectMap.NoMap:
+            # Lets IVF indexes reconstruct vectors by id, maintained on later adds
+            self.index.make_direct_map()
+        vectors = self.index.reconstruct_batch(ids)
+        distances, positions = faiss.knn(query_np, vectors, min(k, len(ids)), metric=METRICS[self.metric])
+        return distances, ids[positions]
+
+    def _vector_results(self, hits: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        """Metadata of vector hits, with their score or distance"""
+        results = self.metadata.get([idx for idx, _ in hits])
+        for result, (idx, dist) in zip(results, hits):
+            if self.metric == "cosine":
+                result['score'] = float(dist)  # Inner product of unit vectors
+            else:
+                result['distance'] = float(dist)  # Add distance score
+        return results
+
+    def checkpoint(self) -> None:
+        """Write the index to disk and drop the log it now contains
+
+        Metadata is committed to SQLite as it is added, so only the index
+        needs checkpointing.
+        """
+        with self._checkpoint_lock:
+            with self._lock:
+                if not self.pending and not self._index_changed:
+                    return
+                self._index_changed = False
+                # Snapshot under the lock, write outside it so searches aren't blocked
+                index_bytes = faiss.serialize_index(self.index)
+                count = self.index.ntotal
+                self.pending = 0
+                self._vector_log.close()
+                self._open_log()
+
+            try:
+                # Logs are only dropped once the index file holds their entries, so
+                # a crash in between is repaired by the replay on the next start
+                self._write_atomic(self.index_file, index_bytes.tobytes())
+                for base, vector_log in self._list_logs():
+                    if base < count:
+                        vector_log.unlink(missing_ok=True)
+                        # Metadata log of stores written before metadata.db
+                        vector_log.with_suffix(".jsonl").unlink(missing_ok=True)
+                print(f"🟢 Checkpointed FAISS index with {count} vectors to disk")
+            except Exception as e:
+                print(f"🔴 Error saving FAISS index: {str(e)}")
+                raise
+
+    def close(self) -> None:
+        """Stop the background checkpoints and flush everything to disk"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._checkpointer is not None:
+            self._checkpointer.join()
+        self.checkpoint()
+        with self._lock:
+            self._vector_log.close()
+            self.metadata.close()
+        _unlock_vector_db(self.index_path)
+
+    def convert_to_cosine(self) -> None:
+        """Renormalise the stored vectors and rebuild the index for cosine scoring
+
+        Vectors are read back from the index, so no re-embedding is needed. An
+        IVF-PQ index only holds compressed vectors, so it is converted from
+        their approximate reconstruction.
+        """
+        with self._checkpoint_lock, self._lock:
+            if self.metric == "cosine":
+                print("🟢 FAISS index already uses cosine scoring")
+                return
+
+            index = self.index
+            if isinstance(index, faiss.IndexIVF):
+                index.make_direct_map()
+            vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.empty((0, self.dimension), dtype='float32')
+            faiss.normalize_L2(vectors)
+
+            if isinstance(index, faiss.IndexHNSW):
+                index_type = "hnsw"
+            elif isinstance(index, faiss.IndexIVFPQ):
+                index_type = "ivf_pq"
+            elif isinstance(index, faiss.IndexIVF):
+                index_type = "ivf_flat"
+            else:
+                index_type = "flat"
+            self.index = build_index(index_type, vectors, self.dimension, "cosine")
+            self.metric = "cosine"
+            self._index_changed = True
+            self.version = next(_versions)
+        self.checkpoint()
+        print(f"🟢 Converted {len(vectors)} vectors to cosine scoring ({index_type} index)")
+
+    def _maybe_rebuild(self) -> None:
+        """Start converting the flat index once the corpus crosses the threshold"""
+        with self._lock:
+            if (self.index_type == "flat" or self._rebuilding
+                    or not isinstance(self.index, faiss.IndexFlat)
+                    or self.index.ntotal < max(self.index_threshold, 1)):
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_index, name="vector-db-rebuild", daemon=True).start()
+
+    def _rebuild_index(self) -> None:
+        """Train and fill the approximate index without blocking searches and inserts"""
+        try:
+            with self._lock:
+                count = self.index.ntotal
+                vectors = self.index.reconstruct_n(0, count)
+            print(f"🟡 Building {self.index_type} FAISS index from {count} vectors...")
+            index = build_index(self.index_type, vectors, self.dimension, self.metric)
+
+            with self._lock:
+                # Catch up with the vectors added while training
+                if self.index.ntotal > count:
+                    index.add(self.index.reconstruct_n(count, self.index.ntotal - count))
+                self.index = index
+                self._index_changed = True
+                self.version = next(_versions)
+            print(f"🟢 Switched to {self.index_type} FAISS index")
+        except Exception as e:
+            # Stay on the flat index until restart rather than retrying on every insert
+            print(f"🔴 Error building {self.index_type} FAISS index: {str(e)}")
+
+    def _checkpoint_loop(self) -> None:
+        while not self._closed.wait(VECTOR_DB_CHECKPOINT_INTERVAL):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                print(f"🔴 Background checkpoint failed: {str(e)}")
+
+    def _list_logs(self):
+        """Write-ahead logs as (id of their first vector, vector file), oldest first"""
+        logs = []
+        for vector_log in self.index_path.glob("wal_*.vectors"):
+            base = int(vector_log.stem.split("_")[1])
+            logs.append((base, vector_log))
+        return sorted(logs)
+
+    def _open_log(self) -> None:
+        """Start a new log whose first entry is the next vector id"""
+        base = self.index.ntotal
+        # Anything already at this name holds no complete entry (or it would have been replayed)
+        self._vector_log = open(self.index_path / f"wal_{base}.vectors", 'wb')
+        self._sync_directory()
+
+    def _sync_directory(self) -> None:
+        """Make files created in the store survive a power loss"""
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.index_path, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _replay_logs(self) -> int:
+        """Re-add logged vectors missing from the checkpointed index, returns how many"""
+        if len(self.metadata) < self.index.ntotal:
+            raise Exception(f"FAISS index has {self.index.ntotal} vectors but {len(self.metadata)} metadata entries")
+
+        replayed = 0
+        for base, vector_log in self._list_logs():
+            vectors = np.fromfile(vector_log, dtype='float32')
+            # A crash can leave a torn last write, and vectors whose metadata was
+            # never committed: keep only entries present in both
+            count = min(len(vectors) // self.dimension, len(self.metadata) - base)
+            skip = self.index.ntotal - base
+            if 0 <= skip < count:
+                vectors = vectors[:count * self.dimension].reshape(count, self.dimension)
+                self.index.add(vectors[skip:])
+                replayed += count - skip
+
+        if self.index.ntotal != len(self.metadata):
+            raise Exception(f"FAISS index has {self.index.ntotal} vectors but {len(self.metadata)} metadata entries")
+        if replayed:
+            print(f"🟡 Replayed {replayed} vectors from the FAISS write-ahead log")
+        return replayed
+
+    def _import_legacy_metadata(self) -> None:
+        """Move metadata from metadata.json and the JSON logs of older stores into metadata.db
+
+        The JSON file is only renamed once the import is committed, so an
+        interrupted import is simply redone on the next start.
+        """
+        legacy_file = self.index_path / "metadata.json"
+        legacy_logs = sorted(
+            (int(log.stem.split("_")[1]), log) for log in self.index_path.glob("wal_*.jsonl")
+        )
+        if not legacy_file.exists() and (self.metadata_file.exists() or not legacy_logs):
+            return
+
+        print("🟡 Migrating FAISS metadata to SQLite...")
+        for suffix in ("", "-wal", "-shm"):
+            Path(str(self.metadata_file) + suffix).unlink(missing_ok=True)
+        store = MetadataStore(self.metadata_file)
+        metadata = []
+        if legacy_file.exists():
+            with open(legacy_file, 'r') as f:
+                metadata = json.load(f)
+        for base, log in legacy_logs:
+            with open(log, 'r') as f:
+                entries = [json.loads(line) for line in f if line.endswith('\n')]
+            if base <= len(metadata):
+                metadata.extend(entries[len(metadata) - base:])
+        store.append(metadata)
+        store.close()
+        if legacy_file.exists():
+            legacy_file.rename(legacy_file.with_suffix(".json.bak"))
+        print(f"🟢 Migrated metadata for {len(metadata)} vectors to {self.metadata_file}")
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
     def __len__(self) -> int:
         """Return the number of vectors in the index"""
-        return self.index.ntotal
\ No newline at end of file
+        return self.index.ntotal
+
+
+_instances: Dict[str, LocalVectorDB] = {}
+_instances_lock = threading.Lock()
+_writer_locks: Dict[str, Any] = {}
+_writer_locks_lock = threading.Lock()
+
+
+def lock_vector_db(index_path: str = VECTOR_DB_PATH) -> None:
+    """Take the single-writer lock of the store at `index_path` for this process, or raise VectorDBLocked
+
+    Opening a store takes it; processes that will write to a store can take
+    it up front to fail before doing any work. Held until the store is closed.
+    """
+    path = Path(index_path)
+    path.mkdir(parents=True, exist_ok=True)
+    key = str(path.resolve())
+    with _writer_locks_lock:
+        if key in _writer_locks:
+            return
+        lock_file = open(path / "writer.lock", 'a+')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                raise VectorDBLocked(
+                    f"{index_path} is open in another process (the API, `python -m backend.ingest` or "
+                    "another server worker); local mode supports a single writer"
+                )
+        _writer_locks[key] = lock_file
+
+
+def _unlock_vector_db(index_path: str) -> None:
+    with _writer_locks_lock:
+        lock_file = _writer_locks.pop(str(Path(index_path).resolve()), None)
+    if lock_file is not None:
+        lock_file.close()
+
+
+def get_vector_db(dimension: Optional[int] = None, index_path: str = VECTOR_DB_PATH) -> LocalVectorDB:
+    """Return the long-lived LocalVectorDB for `index_path`, opening it on first use.
+
+    `dimension` is only used when the index does not exist on disk yet.
+    """
+    key = str(Path(index_path).resolve())
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = LocalVectorDB(dimension=dimension or 768, index_path=index_path)
+        return _instances[key]
+
+
+@atexit.register
+def close_vector_dbs() -> None:
+    """Checkpoint and close every open LocalVectorDB"""
+    with _instances_lock:
+        for vector_db in _instances.values():
+            vector_db.close()
+        _instances.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Maintenance tasks for the local FAISS vector database')
+    parser.add_argument('--path', default=VECTOR_DB_PATH, help=f'Vector database directory (default: {VECTOR_DB_PATH})')
+    parser.add_argument('--migrate-cosine', action='store_true', help='Convert an L2 index to normalised vectors with cosine scoring, in place')
+    args = parser.parse_args()
+
+    if args.migrate_cosine:
+        vector_db = LocalVectorDB(index_path=args.path, background_checkpoints=False)
+        vector_db.convert_to_cosine()
+        vector_db.close()
+    else:
+        parser.print_help()
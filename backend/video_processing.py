@@ -3,123 +3,336 @@ import base64
 import cv2
 import aiohttp
 import asyncio
+import time
 from fastapi import WebSocket
-from typing import Dict, List, Any
+from typing import Awaitable, Callable, Dict, List, Any
 import pinecone
-from groq import Groq
-from transformers import AutoModel
 import faiss
 import numpy as np
 from pathlib import Path
 import json
-from .vector_db import LocalVectorDB
+from .vector_db import get_vector_db, VECTOR_DB_PATH
+from .frame_sampler import get_video_info, sample_frames, sample_scene_changes, mark_duplicates
+from .frame_encoding import ThumbnailWriter
+from .decode_pool import parallel_samples, prepare_samples, use_parallel_decode
+from .embedding_service import EmbeddingBatcher, concurrent_encoder, chunked, PINECONE_UPSERT_BATCH
+from .embedding_models import encode_texts, load_embedding_model, JINA_MODEL_NAME
+from .dedup import dedup_encoder, get_frame_index
+from .clients import get_groq_client, get_ollama_client
+from .inference_cache import cached_encoder, get_inference_cache, sha256_hex
+from .frame_windows import WindowBuilder, is_window, WINDOW_DB_PATH, WINDOW_NAMESPACE
+from .jobs import get_job_queue
+
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_VISION_MODEL = "llava"
+OLLAMA_EMBED_MODEL = "mxbai-embed-large"
+GROQ_VISION_MODEL = "llama-3.2-11b-vision-preview"
+CAPTION_PROMPT = "Describe this image in detail."
+
+# Pipeline tuning: workers per stage and size of the queues between stages.
+# The queues are what bound memory: decoding stops once they are full.
+CAPTION_CONCURRENCY = int(os.getenv("CAPTION_CONCURRENCY", "4"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "2"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+# Frame sampling: "fixed" captions a frame every SAMPLE_INTERVAL seconds,
+# "adaptive" only at scene changes, bounded by SCENE_MIN/MAX_INTERVAL.
+# Either way, samples closer than DUPLICATE_THRESHOLD to the previously
+# captioned frame reuse its caption.
+SAMPLING_MODE = os.getenv("SAMPLING_MODE", "fixed")
+SAMPLE_INTERVAL = float(os.getenv("SAMPLE_INTERVAL", "2.0"))
+SCENE_MIN_INTERVAL = float(os.getenv("SCENE_MIN_INTERVAL", "1.0"))
+SCENE_MAX_INTERVAL = float(os.getenv("SCENE_MAX_INTERVAL", "10.0"))
+SCENE_THRESHOLD = float(os.getenv("SCENE_THRESHOLD", "0.1"))
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.02"))
+
+_STAGE_DONE = object()
 
 
 # Background task to process video
-async def process_video(task_id: str, video_path: str, pinecone_index: pinecone.Index, connections: Dict[str, WebSocket], is_local: bool = False):
+async def process_video(
+    task_id: str,
+    video_path: str,
+    pinecone_index: pinecone.Index,
+    connections: Dict[str, WebSocket],
+    is_local: bool = False,
+    caption_concurrency: int = None,
+    embed_concurrency: int = None,
+    queue_size: int = None,
+    sampling_mode: str = None,
+    checkpoint: Dict[str, Any] = None,
+    decode_processes: int = None,
+    on_checkpoint: Callable[[Dict[str, Any], int], Awaitable[None]] = None,
+    embed_batch_size: int = None,
+    embed_flush_interval: float = None
+) -> Dict[str, Any]:
+    """Process a video as a decode -> caption -> embed/upsert pipeline.
+
+    Each stage runs its own workers and hands work to the next one through a
+    bounded asyncio queue, so captioning requests overlap with decoding and
+    embedding while at most `queue_size` frames wait between two stages.
+
+    Frames matching a recently captioned frame by perceptual hash (only an
+    identical hash in other videos by default) reuse its caption and embedding.
+
+    Long videos sampled at a fixed interval are decoded by `decode_processes`
+    processes (default DECODE_PROCESSES), one keyframe-aligned range each.
+
+    Sliding windows of consecutive frames (see WINDOW_FRAMES) are embedded
+    alongside the frames as soon as all their frames are described.
+
+    Once frames are stored, `on_checkpoint(checkpoint, progress)` is awaited
+    with the sampled frames completed so far; passing that checkpoint back
+    as `checkpoint` resumes the video after them.
+
+    Returns per-video sampling stats, including how many vision model calls
+    were saved compared to captioning a frame every SAMPLE_INTERVAL seconds,
+    and the time spent decoding and captioning (summed over workers).
+    Descriptions are embedded and stored `embed_batch_size` at a time, or
+    after `embed_flush_interval` seconds (see EMBED_BATCH_SIZE).
+    """
+    sampling_mode = sampling_mode or SAMPLING_MODE
+    caption_concurrency = caption_concurrency or CAPTION_CONCURRENCY
+    embed_concurrency = embed_concurrency or EMBED_CONCURRENCY
+    queue_size = queue_size or PIPELINE_QUEUE_SIZE
+
     try:
         print(f"🟢 Starting video processing. Local mode: {is_local}")
         
         # Check if Ollama is running when in local mode
         if is_local:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get('http://localhost:11434/api/version') as response:
-                        if response.status != 200:
-                            raise Exception("Ollama server not responding")
-                        version = await response.json()
-                        print(f"🟢 Connected to Ollama version: {version.get('version')}")
+                version = json.loads(await get_ollama_client().request("GET", f'{OLLAMA_URL}/api/version', "version"))
+                print(f"🟢 Connected to Ollama version: {version.get('version')}")
             except Exception as e:
-                error_msg = f"Failed to connect to Ollama server: {str(e)}"
-                print(f"🔴 {error_msg}")
-                await send_progress(task_id, -1, error=error_msg, connections=connections)
-                return
-
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise Exception(f"Failed to open video file: {video_path}")
+                raise Exception(f"Failed to connect to Ollama server: {str(e)}")
 
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_interval = int(fps * 2)  # every 2 seconds
+        loop = asyncio.get_running_loop()
+        video_info = await loop.run_in_executor(None, get_video_info, video_path, SAMPLE_INTERVAL)
+        frame_count = max(video_info["frame_count"], 1)
+        stats = {
+            "sampling_mode": sampling_mode,
+            "sampled_frames": 0,
+            "llm_calls": 0,
+            "reused_captions": 0,
+            "frame_hash_hits": 0,
+            "cached_captions": 0,
+            "fixed_interval_calls": video_info["total_samples"],
+            "resumed_frames": 0,
+            "failed_frames": 0,
+            "failed_embeddings": 0,
+            "windows": 0,
+            "failed_windows": 0,
+            "decode_seconds": 0.0,
+            "caption_seconds": 0.0,
+        }
 
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        total_frames = frame_count // frame_interval
+        # Make sure the shared embedding model is loaded if using remote processing
+        if not is_local:
+            await load_embedding_model()
 
-        frame_number = 0
-        frames_metadata = []  # Store metadata for local processing
+        frame_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        progress = 0
+        thumbnails = ThumbnailWriter()
+        vision_model = OLLAMA_VISION_MODEL if is_local else GROQ_VISION_MODEL
+        frame_index = get_frame_index(vision_model)
+        # Sampled frames already stored: all below next_frame, plus those in done
+        next_frame = checkpoint["next_frame"] if checkpoint else 0
+        done_frames = set(checkpoint["done"]) if checkpoint else set()
+        inference_cache = get_inference_cache()
+        windows = WindowBuilder(first_frame=next_frame)
 
-        # Load embedding model only if using remote processing
-        embedding_model = None
-        if not is_local:
-            embedding_model = AutoModel.from_pretrained(
-                'jinaai/jina-embeddings-v2-base-en',
-                trust_remote_code=True
-            )
+        async def decode_stage():
+            """Decode sampled frames in a worker thread (or the decode pool) and queue them for captioning."""
+            if sampling_mode == "adaptive":
+                samples = prepare_samples(sample_scene_changes(
+                    video_path,
+                    min_interval=SCENE_MIN_INTERVAL,
+                    max_interval=SCENE_MAX_INTERVAL,
+                    scene_threshold=SCENE_THRESHOLD
+                ))
+            elif use_parallel_decode(frame_count / video_info["fps"], sampling_mode, decode_processes):
+                samples = parallel_samples(video_path, SAMPLE_INTERVAL, decode_processes)
+            else:
+                samples = prepare_samples(sample_frames(video_path, SAMPLE_INTERVAL))
+            # Samples arrive JPEG-encoded, with their signature and perceptual hash
+            frames = mark_duplicates(samples, DUPLICATE_THRESHOLD, signature=lambda sample: sample[3])
 
-        async with aiohttp.ClientSession() as session:
-            while frame_number * frame_interval < frame_count:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number * frame_interval)
-                ret, frame = cap.read()
-                if not ret:
-                    print(f"Failed to read frame at position {frame_number * frame_interval}")
+            frame_number = 0
+            reference = None  # Last frame sent to the vision model
+            caption = None  # Its caption, queued with each frame reusing it rather than kept per frame
+            while True:
+                start = time.perf_counter()
+                sample = await loop.run_in_executor(None, next, frames, None)
+                stats["decode_seconds"] += time.perf_counter() - start
+                if sample is None:
                     break
-
-                timestamp = frame_number * frame_interval / fps
+                video_frame, timestamp, jpeg, _, frame_hash, duplicate = sample
+                stats["sampled_frames"] += 1
+                if frame_number < next_frame or frame_number in done_frames:
+                    stats["resumed_frames"] += 1
+                    windows.skip(frame_number)
+                    frame_number += 1
+                    continue
                 print(f"Processing frame {frame_number}: {timestamp:.2f} seconds")
+                if not duplicate or reference is None:
+                    reference = frame_number
+                    caption = loop.create_future()
 
-                # Process the frame
-                frame_filename = f"frames/{task_id}_frame_{frame_number}.jpg"
-                cv2.imwrite(frame_filename, frame)
-
-                with open(frame_filename, "rb") as image_file:
-                    encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+                # Encoded once in memory: the caption request and the thumbnail share the buffer
+                frame_filename = await thumbnails.write(f"frames/{task_id}_frame_{frame_number}.jpg", jpeg)
+                encoded_string = base64.b64encode(jpeg).decode('utf-8')
+                await frame_queue.put((frame_number, video_frame, timestamp, frame_filename, encoded_string, reference, caption, frame_hash))
+                frame_number += 1
 
+        async def caption_stage():
+            """Describe queued frames with the vision model."""
+            while True:
+                item = await frame_queue.get()
+                if item is _STAGE_DONE:
+                    break
+                frame_number, video_frame, timestamp, frame_filename, encoded_string, reference, caption, frame_hash = item
                 try:
-                    # Get frame description
-                    frame_description = await get_frame_description(encoded_string, is_local)
+                    if reference == frame_number:
+                        start = time.perf_counter()
+                        try:
+                            description = frame_index.find_caption(frame_hash, video_path)
+                            if description is not None:
+                                stats["frame_hash_hits"] += 1
+                            else:
+                                # Exact image matches survive restarts in the persistent cache
+                                image_hash = sha256_hex(encoded_string)
+                                if inference_cache:
+                                    description = inference_cache.get_caption(image_hash, vision_model, CAPTION_PROMPT)
+                                if description is not None:
+                                    stats["cached_captions"] += 1
+                                else:
+                                    stats["llm_calls"] += 1
+                                    description = await get_frame_description(encoded_string, is_local)
+                                    if inference_cache:
+                                        inference_cache.put_caption(image_hash, vision_model, CAPTION_PROMPT, description)
+                                frame_index.add_caption(frame_hash, description, video_path)
+                            caption.set_result(description)
+                        except Exception as e:
+                            caption.set_exception(e)
+                        stats["caption_seconds"] += time.perf_counter() - start
+                    else:
+                        stats["reused_captions"] += 1
+                    frame_description = await asyncio.shield(caption)
                     print(f"Frame {frame_number} description: {frame_description[:100]}...")
+                except Exception as e:
+                    print(f"Error processing frame {frame_number}: {str(e)}")
+                    stats["failed_frames"] += 1
+                    windows.skip(frame_number)
+                    continue
 
-                    # Create metadata for this frame
-                    metadata = {
-                        "description": frame_description,
-                        "frame_number": frame_number,
-                        "frame_path": frame_filename,
-                        "task_id": task_id,
-                        "timestamp": timestamp,
-                        "video_path": video_path
-                    }
+                await embed_queue.put((video_frame, {
+                    "description": frame_description,
+                    "frame_number": frame_number,
+                    "frame_path": frame_filename,
+                    "task_id": task_id,
+                    "timestamp": timestamp,
+                    "video_path": video_path
+                }))
 
-                    if is_local:
-                        frames_metadata.append(metadata)
-                    else:
-                        await process_remote_frame(
-                            frame_description,
-                            metadata,
-                            embedding_model,
-                            pinecone_index,
-                            task_id,
-                            frame_number
-                        )
-
-                    # Update progress
-                    progress = int((frame_number + 1) / total_frames * 100)
-                    await send_progress(task_id, progress, connections=connections)
+        async def embed_stage(batcher: EmbeddingBatcher):
+            """Batch described frames for embedding and storage in FAISS or Pinecone."""
+            nonlocal progress
+            while True:
+                item = await embed_queue.get()
+                if item is _STAGE_DONE:
+                    break
+                video_frame, metadata = item
+                await batcher.add(metadata["description"], metadata)
+                for window in windows.add(metadata):
+                    stats["windows"] += 1
+                    await batcher.add(window["description"], window)
+
+                # Frames finish out of order, so only ever move progress forward
+                progress = max(progress, min(int((video_frame + 1) / frame_count * 100), 99))
+                await send_progress(task_id, progress, connections=connections)
+            await batcher.close()
+
+        async def run_stage(workers, next_queue, next_workers):
+            """Run a stage's workers, then tell the next stage there is no more work."""
+            await asyncio.gather(*workers)
+            for _ in range(next_workers):
+                await next_queue.put(_STAGE_DONE)
 
+        async def checkpoint_sink(vectors, metadata):
+            """Store a batch's frames, advance the resume point past every contiguously stored frame, then store its windows"""
+            nonlocal next_frame
+            levels = {False: ([], []), True: ([], [])}
+            for vector, item in zip(vectors, metadata):
+                levels[is_window(item)][0].append(vector)
+                levels[is_window(item)][1].append(item)
+            if levels[False][0]:
+                await store_frames(*levels[False])
+            # Windows don't count towards the resume point, frames do
+            done_frames.update(item["frame_number"] for item in levels[False][1])
+            while next_frame in done_frames:
+                done_frames.discard(next_frame)
+                next_frame += 1
+            if on_checkpoint:
+                await on_checkpoint({"next_frame": next_frame, "done": sorted(done_frames)}, progress)
+            if levels[True][0]:
+                # The frames are stored: losing their windows must not fail them too
+                try:
+                    await store_windows(*levels[True])
                 except Exception as e:
-                    print(f"Error processing frame {frame_number}: {str(e)}")
-                    continue
+                    stats["failed_windows"] += len(levels[True][0])
+                    print(f"🔴 Error storing {len(levels[True][0])} windows: {str(e)}")
 
-                frame_number += 1
-                await asyncio.sleep(0.1)
+        def count_failures(metadata):
+            """Tell the frames of a batch that could not be embedded or stored from its windows"""
+            failed_windows = sum(map(is_window, metadata))
+            stats["failed_windows"] += failed_windows
+            stats["failed_embeddings"] += len(metadata) - failed_windows
 
-        cap.release()
+        if is_local:
+            embed_model = OLLAMA_EMBED_MODEL
+            encode = concurrent_encoder(get_ollama_embedding, embed_concurrency)
+            store_frames = process_local_frames
+            store_windows = lambda vectors, metadata: process_local_frames(vectors, metadata, WINDOW_DB_PATH)
+        else:
+            embed_model = JINA_MODEL_NAME
+            encode = encode_texts
+            store_frames = lambda vectors, metadata: upsert_remote_frames(pinecone_index, vectors, metadata)
+            store_windows = lambda vectors, metadata: upsert_remote_frames(pinecone_index, vectors, metadata, WINDOW_NAMESPACE)
+        # Frame index first (in memory, near-duplicate frames), then the persistent cache
+        if inference_cache:
+            encode = cached_encoder(encode, inference_cache, embed_model)
+        encode = dedup_encoder(encode, frame_index, embed_model)
+        batcher = EmbeddingBatcher(
+            encode, checkpoint_sink,
+            batch_size=embed_batch_size, flush_interval=embed_flush_interval, max_in_flight=embed_concurrency,
+            on_failure=count_failures
+        )
+
+        stages = [
+            run_stage([decode_stage()], frame_queue, caption_concurrency),
+            run_stage([caption_stage() for _ in range(caption_concurrency)], embed_queue, 1),
+            embed_stage(batcher),
+        ]
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Batches must not be stored past this point, after the job's last checkpoint
+            batcher.cancel()
+            await thumbnails.flush()
 
-        # If local processing, handle all frames at once after the loop
-        if is_local and frames_metadata:
-            await process_local_frames(frames_metadata)
+        stats["saved_llm_calls"] = stats["fixed_interval_calls"] - stats["llm_calls"]
+        stats["embedding"] = batcher.stats
+        print(f"🟢 Sampling stats for {task_id}: {stats}")
 
-        await send_progress(task_id, 100, connections=connections)
+        await send_progress(task_id, 100, connections=connections, stats=stats)
         print("Video processing completed successfully")
+        return stats
 
     except Exception as e:
         error_message = f"Error in video processing: {str(e)}"
@@ -127,16 +340,19 @@ async def process_video(task_id: str, video_path: str, pinecone_index: pinecone.
         await send_progress(task_id, -1, error=error_message, connections=connections)
         raise
 
-async def send_progress(task_id: str, progress: int, error: str = "", connections: Dict[str, WebSocket] = None):
+async def send_progress(task_id: str, progress: int, error: str = "", connections: Dict[str, WebSocket] = None, stats: Dict[str, Any] = None):
     """Send progress update through WebSocket with better error handling"""
     try:
         if connections and task_id in connections:
             websocket = connections[task_id]
             try:
-                await websocket.send_json({
+                message = {
                     "progress": progress,
                     "error": error
-                })
+                }
+                if stats:
+                    message["stats"] = stats
+                await websocket.send_json(message)
                 print(f"🟢 Progress update sent: {progress}%{' Error: ' + error if error else ''}")
             except Exception as e:
                 print(f"🔴 Failed to send WebSocket message: {str(e)}")
@@ -148,52 +364,7 @@ async def get_frame_description(frame_base64: str, is_local: bool = False) -> st
     if is_local:
         try:
             print("🔵 Calling local Ollama LLaVa model...")
-            async with aiohttp.ClientSession() as session:
-                async with session.post('http://localhost:11434/api/generate', 
-                    json={
-                        "model": "llava",
-                        "prompt": "Describe this image in detail.",
-                        "images": [frame_base64],
-                        "stream": False  # Add this to get a single response
-                    },
-                    headers={'Accept': 'application/json'}  # Explicitly request JSON
-                ) as response:
-                    print(f"🔵 Ollama response status: {response.status}")
-                    
-                    # Read the raw response text
-                    response_text = await response.text()
-                    print(f"🔵 Raw response: {response_text[:200]}...")  # Print first 200 chars
-                    
-                    try:
-                        # Try to parse as single JSON
-                        result = await response.json()
-                        return result.get('response', 'No description available')
-                    except json.JSONDecodeError as e:
-                        print(f"🔴 JSON decode error: {str(e)}")
-                        
-                        # Handle streaming response format
-                        try:
-                            # Split by newlines and parse each line as JSON
-                            lines = response_text.strip().split('\n')
-                            full_response = ''
-                            for line in lines:
-                                if line.strip():
-                                    try:
-                                        json_response = json.loads(line)
-                                        if 'response' in json_response:
-                                            full_response += json_response['response']
-                                    except json.JSONDecodeError:
-                                        print(f"🔴 Couldn't parse line: {line}")
-                                        continue
-                            
-                            if full_response:
-                                return full_response
-                            else:
-                                raise ValueError("No valid response found in stream")
-                        except Exception as stream_error:
-                            print(f"🔴 Error parsing stream: {str(stream_error)}")
-                            raise
-                        
+            return await _ollama_describe(frame_base64)
         except aiohttp.ClientError as e:
             print(f"🔴 Network error calling Ollama: {str(e)}")
             raise
@@ -203,14 +374,14 @@ async def get_frame_description(frame_base64: str, is_local: bool = False) -> st
     else:
         try:
             print("🔵 Calling remote GROQ API...")
-            client = Groq()
-            completion = client.chat.completions.create(
-                model="llama-3.2-11b-vision-preview",
+            completion = await get_groq_client().chat(
+                "describe",
+                model=GROQ_VISION_MODEL,
                 messages=[
                     {
                         "role": "user",
                         "content": [
-                            {"type": "text", "text": "Describe this image in detail."},
+                            {"type": "text", "text": CAPTION_PROMPT},
                             {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{frame_base64}"}}
                         ]
                     }
@@ -222,67 +393,89 @@ async def get_frame_description(frame_base64: str, is_local: bool = False) -> st
             print(f"🔴 Error calling GROQ API: {str(e)}")
             raise
 
-async def process_remote_frame(
-    frame_description: str,
-    metadata: Dict[str, Any],
-    embedding_model,
+async def _ollama_describe(frame_base64: str) -> str:
+    """Ask the local LLaVa model for a frame description."""
+    response_text = await get_ollama_client().request("POST", f'{OLLAMA_URL}/api/generate', "describe", {
+        "model": OLLAMA_VISION_MODEL,
+        "prompt": CAPTION_PROMPT,
+        "images": [frame_base64],
+        "stream": False  # Add this to get a single response
+    })
+    print(f"🔵 Raw response: {response_text[:200]}...")  # Print first 200 chars
+
+    try:
+        # Try to parse as single JSON
+        result = json.loads(response_text)
+        return result.get('response', 'No description available')
+    except json.JSONDecodeError as e:
+        print(f"🔴 JSON decode error: {str(e)}")
+
+        # Handle streaming response format
+        try:
+            # Split by newlines and parse each line as JSON
+            lines = response_text.strip().split('\n')
+            full_response = ''
+            for line in lines:
+                if line.strip():
+                    try:
+                        json_response = json.loads(line)
+                        if 'response' in json_response:
+                            full_response += json_response['response']
+                    except json.JSONDecodeError:
+                        print(f"🔴 Couldn't parse line: {line}")
+                        continue
+
+            if full_response:
+                return full_response
+            else:
+                raise ValueError("No valid response found in stream")
+        except Exception as stream_error:
+            print(f"🔴 Error parsing stream: {str(stream_error)}")
+            raise
+
+async def get_ollama_embedding(text: str) -> List[float]:
+    """Embed a text with the local mxbai-embed-large model."""
+    response_text = await get_ollama_client().request("POST", f'{OLLAMA_URL}/api/embeddings', "embed", {
+        "model": OLLAMA_EMBED_MODEL,
+        "prompt": text
+    })
+    return json.loads(response_text)['embedding']
+
+async def upsert_remote_frames(
     pinecone_index: pinecone.Index,
-    task_id: str,
-    frame_number: int
+    embeddings: List[List[float]],
+    frames_metadata: List[Dict[str, Any]],
+    namespace: str = None
 ) -> None:
-    """Process a frame using remote services (GROQ + Pinecone)"""
-    # Generate embedding using Jina
-    frame_description_embedding = embedding_model.encode(frame_description).tolist()
-
-    # Upsert single vector to Pinecone
-    upsert_response = pinecone_index.upsert(
-        vectors=[{
-            "id": f"{task_id}_frame_{frame_number}",
-            "values": frame_description_embedding,
-            "metadata": metadata
-        }]
-    )
-    print(f"Pinecone upsert response for frame {frame_number}: {upsert_response}")
+    """Upsert embedded frames (or windows, to their namespace) to Pinecone in chunks of PINECONE_UPSERT_BATCH vectors"""
+    loop = asyncio.get_running_loop()
+    vectors = [{
+        "id": f"{metadata['task_id']}_{'window' if is_window(metadata) else 'frame'}_{metadata['frame_number']}",
+        "values": embedding,
+        "metadata": metadata
+    } for embedding, metadata in zip(embeddings, frames_metadata)]
+
+    for chunk in chunked(vectors, PINECONE_UPSERT_BATCH):
+        upsert_response = await loop.run_in_executor(None, lambda: pinecone_index.upsert(vectors=chunk, namespace=namespace))
+        print(f"Pinecone upsert response for {len(chunk)} frames: {upsert_response}")
+    # Searches in every process cache responses per version of the index
+    await loop.run_in_executor(None, get_job_queue().bump_version)
 
 async def process_local_frames(
-    frames_metadata: List[Dict[str, Any]]
+    embeddings: List[List[float]],
+    frames_metadata: List[Dict[str, Any]],
+    index_path: str = VECTOR_DB_PATH
 ) -> None:
-    """Process all frames using local services (Ollama + FAISS)"""
-    embeddings = []
-    metadata_list = []
-    
-    # Get the first embedding to determine dimension
-    async with aiohttp.ClientSession() as session:
-        async with session.post('http://localhost:11434/api/embeddings', json={
-            "model": "mxbai-embed-large",
-            "prompt": frames_metadata[0]["description"]
-        }) as response:
-            result = await response.json()
-            first_embedding = result['embedding']
-            embedding_dim = len(first_embedding)
-            print(f"🟢 Detected embedding dimension: {embedding_dim}")
-            
-            # Initialize vector DB with correct dimension
-            vector_db = LocalVectorDB(dimension=embedding_dim)
-            
-            # Add first embedding
-            embeddings.append(first_embedding)
-            metadata_list.append(frames_metadata[0])
-            
-            # Process remaining frames
-            for metadata in frames_metadata[1:]:
-                async with session.post('http://localhost:11434/api/embeddings', json={
-                    "model": "mxbai-embed-large",
-                    "prompt": metadata["description"]
-                }) as response:
-                    result = await response.json()
-                    embedding = result['embedding']
-                    embeddings.append(embedding)
-                    metadata_list.append(metadata)
-    
+    """Store embedded frames in the local FAISS database at `index_path`"""
+    embedding_dim = len(embeddings[0])
+    print(f"🟢 Detected embedding dimension: {embedding_dim}")
+
+    # Shared vector DB, created with the right dimension on first use
+    vector_db = get_vector_db(dimension=embedding_dim, index_path=index_path)
+
     try:
         # Insert embeddings into FAISS
-        vector_db.add_vectors(embeddings, metadata_list)
+        vector_db.add_vectors(embeddings, frames_metadata)
         print(f"🟢 Successfully inserted {len(embeddings)} embeddings into FAISS vector database")
     except Exception as e:
         print(f"🔴 Error inserting vectors: {str(e)}")
@@ -293,17 +486,11 @@ async def process_local_frames(
 async def search_similar_frames(query_description: str, k: int = 5) -> List[Dict]:
     """Search for similar frames using the local vector database"""
     # Get a sample embedding to determine dimension
-    async with aiohttp.ClientSession() as session:
-        async with session.post('http://localhost:11434/api/embeddings', json={
-            "model": "mxbai-embed-large",
-            "prompt": query_description
-        }) as response:
-            result = await response.json()
-            query_embedding = result['embedding']
-            embedding_dim = len(query_embedding)
-            
-    # Initialize vector DB with correct dimension
-    vector_db = LocalVectorDB(dimension=embedding_dim)
+    query_embedding = await get_ollama_embedding(query_description)
+    embedding_dim = len(query_embedding)
+
+    # Shared vector DB, created with the right dimension on first use
+    vector_db = get_vector_db(dimension=embedding_dim)
     
     # Search in FAISS
     results = vector_db.search(query_embedding, k)
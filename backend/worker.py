@@ -0,0 +1,186 @@
+"""Worker pool for queued video processing jobs.
+
+    python -m backend.worker --workers 4
+
+Each worker process claims jobs from the shared queue (backend/jobs.py)
+and runs them through `process_video`, checkpointing as frames are stored
+so a retried or abandoned job resumes after its last stored frame.
+"""
+import os
+os.environ['KMP_DUPLICATE_LIB_OK']='True'
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import asyncio
+import multiprocessing
+import signal
+import socket
+import sys
+from typing import Any, Dict
+
+import pinecone
+from pinecone import Pinecone
+
+from .jobs import JobQueue, JOB_LEASE_SECONDS, get_job_queue
+from .dedup import get_video_registry
+from .video_processing import process_video
+
+IS_LOCAL = os.getenv("LOCAL", "false").lower() == "true"
+
+# Worker processes started by `python -m backend.worker`, and how often an
+# idle worker checks the queue for new jobs.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+PINECONE_INDEX_NAME = "groq-video-analyzer"
+
+
+def open_pinecone_index() -> pinecone.Index:
+    """Connect to the Pinecone index, creating it on first use"""
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    if PINECONE_INDEX_NAME not in pc.list_indexes().names():
+        pc.create_index(
+            name=PINECONE_INDEX_NAME,
+            spec=pinecone.IndexSpec(
+                dimension=768,
+                metric='cosine'
+            )
+        )
+    return pc.Index(PINECONE_INDEX_NAME)
+
+
+async def keep_alive(queue: JobQueue, task_id: str, worker: str) -> None:
+    """Renew a job's lease while it runs, also between checkpoints"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 4)
+        # Queue writes wait for other processes' transactions: keep them off the event loop
+        if not await loop.run_in_executor(None, queue.heartbeat, task_id, worker):
+            print(f"🟡 Worker {worker} lost its lease on job {task_id}")
+
+
+async def run_job(queue: JobQueue, job: Dict[str, Any], pinecone_index: pinecone.Index = None, **options) -> str:
+    """Process one claimed job and record the outcome, returns the job's new state
+
+    `options` are passed on to `process_video`. Queue updates only apply
+    while the job is still leased to the worker that claimed it; once the
+    lease is lost to another worker, the job is left alone and "lost" is
+    returned.
+    """
+    task_id, worker = job["task_id"], job["worker"]
+    print(f"🟢 Worker {worker} running job {task_id} (attempt {job['attempts']}/{job['max_attempts']})")
+    if job["checkpoint"]:
+        print(f"🟢 Resuming job {task_id} from sampled frame {job['checkpoint']['next_frame']}")
+
+    loop = asyncio.get_running_loop()
+    checkpoint_lock = asyncio.Lock()
+    latest = {}
+
+    async def save_checkpoint(checkpoint: Dict[str, Any], progress: int) -> None:
+        # Batches checkpoint concurrently: write one at a time, always the newest
+        latest.update(checkpoint=checkpoint, progress=progress)
+        async with checkpoint_lock:
+            if latest:
+                checkpoint, progress = latest.pop("checkpoint"), latest.pop("progress")
+                await loop.run_in_executor(None, queue.heartbeat, task_id, worker, progress, checkpoint)
+
+    heartbeat = asyncio.ensure_future(keep_alive(queue, task_id, worker))
+    try:
+        stats = await process_video(
+            task_id,
+            job["video_path"],
+            pinecone_index,
+            None,
+            is_local=job["is_local"],
+            checkpoint=job["checkpoint"],
+            on_checkpoint=save_checkpoint,
+            **options
+        )
+        # Frames whose caption or embedding failed weren't stored: retry for them, and once out of
+        # attempts fail the job rather than report a partially indexed video as done. Lost windows
+        # only cost search recall, and aren't worth processing the video again
+        missing = stats["failed_frames"] + stats["failed_embeddings"]
+        if missing:
+            raise Exception(f"{missing} frames could not be processed")
+    except asyncio.CancelledError:
+        queue.release(task_id, worker)
+        raise
+    except Exception as e:
+        state = await loop.run_in_executor(None, queue.fail, task_id, worker, str(e))
+        if state is None:
+            print(f"🟡 Job {task_id} failed after worker {worker} lost its lease: {str(e)}")
+            return "lost"
+        print(f"🔴 Job {task_id} failed: {str(e)} ({'will retry' if state == 'queued' else 'giving up'})")
+        if state == "failed" and job["content_hash"]:
+            get_video_registry().set_status(job["content_hash"], "failed")
+        return state
+    finally:
+        heartbeat.cancel()
+
+    if not await loop.run_in_executor(None, queue.complete, task_id, worker, stats):
+        print(f"🟡 Job {task_id} finished after worker {worker} lost its lease, left to its new owner")
+        return "lost"
+    if job["content_hash"]:
+        get_video_registry().set_status(job["content_hash"], "done")
+    print(f"🟢 Job {task_id} done")
+    return "done"
+
+
+async def run_worker(worker_id: str, pinecone_index: pinecone.Index = None) -> None:
+    """Claim and run jobs one at a time until cancelled"""
+    queue = get_job_queue()
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await loop.run_in_executor(None, queue.claim, worker_id)
+        if job is None:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            continue
+        await run_job(queue, job, pinecone_index)
+
+
+def worker_process(worker_id: str) -> None:
+    """Entry point of one worker process: run jobs until SIGTERM/SIGINT"""
+    async def main():
+        pinecone_index = await asyncio.get_running_loop().run_in_executor(None, open_pinecone_index)
+        task = asyncio.ensure_future(run_worker(worker_id, pinecone_index))
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            asyncio.get_running_loop().add_signal_handler(signum, task.cancel)
+        try:
+            await task
+        except asyncio.CancelledError:
+            print(f"🟡 Worker {worker_id} stopped")
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run video processing jobs from the queue")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="Worker processes")
+    args = parser.parse_args()
+
+    if IS_LOCAL:
+        # The FAISS store has a single writer, the API process, which runs local jobs itself
+        print("🔴 Local jobs are run by the API process (API_JOB_WORKERS), the worker pool needs Pinecone")
+        sys.exit(1)
+
+    host = socket.gethostname()
+    processes = [
+        multiprocessing.Process(target=worker_process, args=(f"{host}-{os.getpid()}-{i}",))
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    print(f"🟢 Started {len(processes)} workers")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Workers got the SIGINT too and give their running jobs back to the queue
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare fixed-interval and scene-change sampling on a clip with known cuts.
+
+    python -m benchmarks.bench_adaptive_sampling --duration 120
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from backend.frame_sampler import mark_duplicates, sample_frames, sample_scene_changes
+from benchmarks.synthetic import make_cut_video
+
+
+def evaluate(samples, cut_times, tolerance):
+    """Count vision model calls and how many cuts got a sample right after them."""
+    start = time.perf_counter()
+    timestamps, calls = [], 0
+    for _, timestamp, _, duplicate in samples:
+        timestamps.append(timestamp)
+        calls += not duplicate
+    elapsed = time.perf_counter() - start
+
+    timestamps = np.array(timestamps)
+    detected = sum(
+        bool(np.any((timestamps >= cut) & (timestamps <= cut + tolerance)))
+        for cut in cut_times
+    )
+    return len(timestamps), calls, detected, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=120.0)
+    parser.add_argument("--shots", type=int, default=12, help="Number of hard cuts in the clip")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Seconds after a cut within which it counts as detected")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    fps = 25
+    cut_times = sorted((rng.integers(fps, int((args.duration - 1) * fps), args.shots) / fps).tolist())
+    video_path = make_cut_video(
+        os.path.join(tempfile.gettempdir(), f"bench_cuts_{int(args.duration)}s_{args.shots}.mp4"),
+        cut_times,
+        duration=args.duration,
+        fps=fps
+    )
+    print(f"Video: {video_path}, cuts at {cut_times}")
+
+    modes = {
+        "fixed 2s": lambda: mark_duplicates(sample_frames(video_path, 2.0)),
+        "adaptive": lambda: mark_duplicates(sample_scene_changes(video_path)),
+    }
+    for name, samples in modes.items():
+        sampled, calls, detected, elapsed = evaluate(samples(), cut_times, args.tolerance)
+        print(f"{name:>9}: {sampled} samples, {calls} vision model calls "
+              f"({sampled - calls} captions reused), {detected}/{len(cut_times)} cuts "
+              f"sampled within {args.tolerance}s, decode {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
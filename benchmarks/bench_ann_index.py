@@ -0,0 +1,67 @@
+"""Recall vs. latency of the LocalVectorDB index types on synthetic 768-d vectors.
+
+Vectors are drawn from a Gaussian mixture so that, like real caption
+embeddings, they form clusters instead of filling the space uniformly.
+
+    python -m benchmarks.bench_ann_index --size 200000 --queries 500
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from backend.vector_db import build_index, search_parameters
+
+
+def synthetic_vectors(rng, count: int, dimension: int, clusters: int, centers=None):
+    if centers is None:
+        centers = rng.standard_normal((clusters, dimension)).astype(np.float32) * 4
+    labels = rng.integers(0, len(centers), count)
+    return centers[labels] + rng.standard_normal((count, dimension)).astype(np.float32), centers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors, centers = synthetic_vectors(rng, args.size, args.dimension, args.clusters)
+    queries, _ = synthetic_vectors(rng, args.queries, args.dimension, args.clusters, centers)
+
+    exact = faiss.IndexFlatL2(args.dimension)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    sweeps = {
+        "flat": [{}],
+        "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+        "ivf_flat": [{"nprobe": n} for n in (1, 4, 16, 64)],
+        "ivf_pq": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    }
+    print(f"{args.size} vectors, {args.dimension}-d, recall@{args.k} over {args.queries} queries")
+    for index_type, settings in sweeps.items():
+        start = time.perf_counter()
+        index = build_index(index_type, vectors, args.dimension)
+        build_seconds = time.perf_counter() - start
+        print(f"{index_type}: built in {build_seconds:.1f}s")
+        for setting in settings:
+            params = search_parameters(index, **setting)
+            # Single-query calls, like the search endpoint makes
+            start = time.perf_counter()
+            for query in queries:
+                index.search(query[None, :], args.k, params=params)
+            per_query_ms = (time.perf_counter() - start) / len(queries) * 1000
+            _, found = index.search(queries, args.k, params=params)
+            recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+            label = ", ".join(f"{key}={value}" for key, value in setting.items()) or "exact"
+            print(f"    {label:>16}: recall {recall:.3f}, {per_query_ms:.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
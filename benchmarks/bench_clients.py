@@ -0,0 +1,96 @@
+"""Provider client behaviour against the stub backend with injected 429s and 503s.
+
+Each scenario sends the same caption requests through backend/clients.py
+and reports how many succeeded, the retries it took, the achieved request
+rate and the latency histogram percentiles. The first scenario opens a
+new aiohttp session per call, as the Ollama path did before.
+
+    python -m benchmarks.bench_clients --calls 200 --rate-limit-rate 0.1 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import base64
+import os
+import time
+
+import aiohttp
+
+from backend import clients
+from benchmarks.stub_backend import start_stub_backend
+
+IMAGE = base64.b64encode(os.urandom(30 * 1024)).decode()
+
+
+async def unpooled_describe(url: str) -> str:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{url}/api/generate", json={"model": "llava", "prompt": "Describe", "images": [IMAGE]}) as response:
+            response.raise_for_status()
+            return await response.text()
+
+
+async def run(name: str, calls: int, concurrency: int, call):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            try:
+                await call(i)
+                return True
+            except Exception:
+                return False
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[one(i) for i in range(calls)])
+    elapsed = time.perf_counter() - start
+    print(f"{name:>32} | {sum(results):>4}/{calls} ok in {elapsed:6.2f}s ({calls / elapsed:6.1f} calls/sec)", end="")
+
+
+def report(client: clients.ProviderClient, operation: str):
+    metrics = client.metrics()
+    latency = metrics["latency"][operation]
+    print(f" | retries {metrics['retries']:>3}, 429s {metrics['rate_limited']:>3}, errors {metrics['errors']:>2}"
+          f" | p50 <= {latency['p50'] * 1000:.0f} ms, p95 <= {latency['p95'] * 1000:.0f} ms")
+
+
+async def main(args):
+    runner, url, stub = await start_stub_backend(
+        caption_latency=args.latency,
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate
+    )
+    os.environ.setdefault("GROQ_API_KEY", "stub")
+    os.environ["GROQ_BASE_URL"] = url
+    clients.CLIENT_RETRY_BACKOFF = args.backoff
+    try:
+        await run("new session per call (previous)", args.calls, args.concurrency, lambda i: unpooled_describe(url))
+        print()
+
+        ollama = clients.HTTPClient("Ollama", 0, 1)
+        payload = {"model": "llava", "prompt": "Describe", "images": [IMAGE]}
+        await run("pooled Ollama client", args.calls, args.concurrency,
+                  lambda i: ollama.request("POST", f"{url}/api/generate", "describe", payload))
+        report(ollama, "describe")
+        await ollama.close()
+
+        groq_client = clients.GroqClient("Groq", args.groq_rate, args.groq_burst)
+        messages = [{"role": "user", "content": [{"type": "text", "text": "Describe"}]}]
+        await run(f"Groq client at {args.groq_rate:g} req/s", args.groq_calls, args.concurrency,
+                  lambda i: groq_client.chat("describe", model="stub", messages=messages))
+        report(groq_client, "describe")
+        await groq_client.close()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub latency of a successful call")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--backoff", type=float, default=0.05, help="CLIENT_RETRY_BACKOFF for the run")
+    parser.add_argument("--groq-calls", type=int, default=40)
+    parser.add_argument("--groq-rate", type=float, default=10.0, help="Token bucket rate of the Groq client")
+    parser.add_argument("--groq-burst", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
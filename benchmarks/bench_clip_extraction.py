@@ -0,0 +1,82 @@
+"""Latency and CPU cost of the sequence extraction modes on a synthetic video.
+
+For every mode, clips are cut at several offsets of the same file; the
+time to the first byte, the total time and the CPU time (this process plus
+its ffmpeg children) are averaged. A second pass runs `--concurrency`
+extractions at once, as when several users preview results together.
+
+    python -m benchmarks.bench_clip_extraction --duration 120 --clip 10
+"""
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+
+from backend.clip_extractor import CLIP_MODES, stream_clip
+from benchmarks.synthetic import make_test_video
+
+
+def cpu_seconds() -> float:
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+async def extract(video_path: str, start: float, end: float, mode: str):
+    begin = time.perf_counter()
+    chunks = await stream_clip(video_path, start, end, mode)
+    first_byte = None
+    size = 0
+    if hasattr(chunks, "__aiter__"):
+        async for chunk in chunks:
+            first_byte = first_byte or time.perf_counter() - begin
+            size += len(chunk)
+    else:
+        for chunk in chunks:
+            first_byte = first_byte or time.perf_counter() - begin
+            size += len(chunk)
+    return first_byte, time.perf_counter() - begin, size
+
+
+async def run(args):
+    video_path = make_test_video(
+        os.path.join(tempfile.gettempdir(), f"bench_clips_{int(args.duration)}s.mp4"),
+        duration=args.duration
+    )
+    offsets = [args.duration * i / (args.clips + 1) for i in range(1, args.clips + 1)]
+
+    for mode in args.modes:
+        cpu = cpu_seconds()
+        results = [await extract(video_path, start, start + args.clip, mode) for start in offsets]
+        cpu = (cpu_seconds() - cpu) / len(offsets)
+        first_byte = sum(r[0] for r in results) / len(results) * 1000
+        total = sum(r[1] for r in results) / len(results) * 1000
+        size = sum(r[2] for r in results) / len(results) / 1024
+
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            extract(video_path, offsets[i % len(offsets)], offsets[i % len(offsets)] + args.clip, mode)
+            for i in range(args.concurrency)
+        ])
+        concurrent = (time.perf_counter() - start) * 1000
+
+        print(f"{mode:>8} | first byte {first_byte:8.1f} ms | complete {total:8.1f} ms | CPU {cpu:6.2f} s/clip"
+              f" | {size:7.0f} KiB | {args.concurrency} at once: {concurrent:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=120.0, help="Length of the generated video")
+    parser.add_argument("--clip", type=float, default=10.0, help="Length of every extracted sequence")
+    parser.add_argument("--clips", type=int, default=5, help="Sequences cut per mode")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", default=list(CLIP_MODES), choices=CLIP_MODES)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
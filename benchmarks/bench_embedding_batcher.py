@@ -0,0 +1,58 @@
+"""Measure EmbeddingBatcher throughput (vectors/sec) with a stubbed encoder.
+
+The stub charges a fixed cost per encode call plus a small cost per text,
+which is roughly how both a local transformer and a remote API behave.
+
+    python -m benchmarks.bench_embedding_batcher --texts 2000 --batch-sizes 1 8 32 128
+"""
+import argparse
+import asyncio
+import time
+
+from backend.embedding_service import EmbeddingBatcher
+
+
+def stub_encoder(call_latency: float, per_text_latency: float, dimension: int):
+    async def encode(texts):
+        await asyncio.sleep(call_latency + per_text_latency * len(texts))
+        return [[0.0] * dimension for _ in texts]
+    return encode
+
+
+async def stub_sink(vectors, metadata):
+    await asyncio.sleep(0)
+
+
+async def run(args):
+    for batch_size in args.batch_sizes:
+        batcher = EmbeddingBatcher(
+            stub_encoder(args.call_latency, args.per_text_latency, args.dimension),
+            stub_sink,
+            batch_size=batch_size,
+            flush_interval=args.flush_interval,
+            max_in_flight=args.in_flight
+        )
+        start = time.perf_counter()
+        for i in range(args.texts):
+            await batcher.add(f"frame description {i}", {"frame_number": i})
+        await batcher.close()
+        elapsed = time.perf_counter() - start
+        stats = batcher.stats
+        print(f"batch size {batch_size:>4}: {stats['vectors']} vectors in {stats['batches']} batches, "
+              f"{elapsed:.2f}s ({stats['vectors'] / elapsed:.0f} vectors/sec)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--call-latency", type=float, default=0.02, help="Fixed seconds per encode call")
+    parser.add_argument("--per-text-latency", type=float, default=0.001, help="Extra seconds per text in a call")
+    parser.add_argument("--flush-interval", type=float, default=2.0)
+    parser.add_argument("--in-flight", type=int, default=2, help="Batches encoded concurrently")
+    parser.add_argument("--dimension", type=int, default=768)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
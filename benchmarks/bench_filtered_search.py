@@ -0,0 +1,89 @@
+"""Latency of filtered against unfiltered LocalVectorDB searches, and against over-fetching then discarding.
+
+The store holds `--videos` videos of equal length. Filters select one
+video, a tenth or half of the videos, or a time range across all videos.
+"post-filter" is the previous way to scope a query: search 20x k frames in
+the whole index and keep those that match.
+
+    python -m benchmarks.bench_filtered_search --size 100000 --index-types flat hnsw
+"""
+import argparse
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from backend.vector_db import LocalVectorDB
+
+
+def matches(metadata, filters) -> bool:
+    return (metadata["video_path"] in filters.get("video_paths", [metadata["video_path"]])
+            and filters.get("time_start", float("-inf")) <= metadata["timestamp"] <= filters.get("time_end", float("inf")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--videos", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-types", nargs="+", default=["flat", "hnsw"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.size, args.dimension)).astype(np.float32)
+    per_video = args.size // args.videos
+    metadata = [{
+        "description": f"Frame {i}",
+        "frame_number": i % per_video,
+        "frame_path": f"frames/bench_frame_{i}.jpg",
+        "task_id": f"task_{i // per_video}",
+        "timestamp": (i % per_video) * 2.0,
+        "video_path": f"videos/bench_{i // per_video}.mp4"
+    } for i in range(args.size)]
+    queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+    video_paths = [f"videos/bench_{v}.mp4" for v in range(args.videos)]
+    cases = {
+        "unfiltered": None,
+        "1 video": {"video_paths": video_paths[:1]},
+        f"{args.videos // 10} videos": {"video_paths": video_paths[:args.videos // 10]},
+        f"{args.videos // 2} videos": {"video_paths": video_paths[:args.videos // 2]},
+        "time range": {"time_start": 0.0, "time_end": per_video * 0.2},
+    }
+
+    for index_type in args.index_types:
+        with tempfile.TemporaryDirectory() as path:
+            vector_db = LocalVectorDB(
+                dimension=args.dimension, index_path=path, background_checkpoints=False,
+                index_type=index_type, index_threshold=args.size
+            )
+            for start in range(0, args.size, 10000):
+                vector_db.add_vectors(vectors[start:start + 10000], metadata[start:start + 10000])
+            # Wait for the background rebuild into the approximate index
+            while index_type != "flat" and isinstance(vector_db.index, faiss.IndexFlat):
+                time.sleep(0.5)
+            print(f"{index_type} ({type(vector_db.index).__name__}), {args.size} vectors, k={args.k}")
+
+            for name, filters in cases.items():
+                modes = [("filtered", lambda q: vector_db.search(q, args.k, filters=filters))]
+                if filters is not None:
+                    modes.append(("post-filter", lambda q: [
+                        m for m in vector_db.search(q, args.k * 20) if matches(m, filters)
+                    ][:args.k]))
+                for mode, search in modes:
+                    latencies, returned = [], 0
+                    for query in queries:
+                        start = time.perf_counter()
+                        results = search(query)
+                        latencies.append(time.perf_counter() - start)
+                        returned += len(results)
+                        assert filters is None or all(matches(m, filters) for m in results)
+                    print(f"    {name:>12} {mode:>11}: p50 {np.median(latencies) * 1000:6.2f}ms, "
+                          f"{returned / len(queries):4.1f} of {args.k} results")
+            vector_db.close()
+
+
+if __name__ == "__main__":
+    main()
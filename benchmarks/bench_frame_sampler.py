@@ -0,0 +1,65 @@
+"""Compare the sequential frame sampler against the old seek-per-sample loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_frame_sampler --duration 120
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+
+from backend.frame_sampler import sample_frames
+from benchmarks.synthetic import make_test_video
+
+
+def seek_loop(video_path: str, interval_seconds: float = 2.0) -> int:
+    """The sampling loop `process_video` used before the sequential sampler."""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_interval = int(fps * interval_seconds)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_number = 0
+    while frame_number * frame_interval < frame_count:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number * frame_interval)
+        ret, _ = cap.read()
+        if not ret:
+            break
+        frame_number += 1
+    cap.release()
+    return frame_number
+
+
+def sequential(video_path: str, interval_seconds: float = 2.0) -> int:
+    return sum(1 for _ in sample_frames(video_path, interval_seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=60.0, help="Length of the synthetic video in seconds")
+    parser.add_argument("--interval", type=float, default=2.0, help="Sampling interval in seconds")
+    parser.add_argument("--gop", type=int, default=250, help="Keyframe interval of the synthetic video")
+    parser.add_argument("--video", help="Benchmark an existing file instead of a synthetic one")
+    args = parser.parse_args()
+
+    video_path = args.video or make_test_video(
+        os.path.join(tempfile.gettempdir(), f"bench_sampler_{int(args.duration)}s_g{args.gop}.mp4"),
+        duration=args.duration,
+        gop=args.gop
+    )
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    print(f"Video: {video_path} ({frame_count} frames)")
+    for name, fn in [("seek per sample", seek_loop), ("sequential grab", sequential)]:
+        start = time.perf_counter()
+        samples = fn(video_path, args.interval)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>16}: {samples} samples in {elapsed:.2f}s "
+              f"({frame_count / elapsed:.0f} decoded frames/sec of video)")
+
+
+if __name__ == "__main__":
+    main()
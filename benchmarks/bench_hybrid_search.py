@@ -0,0 +1,119 @@
+"""Recall and latency of vector-only versus hybrid (vector + BM25) search on synthetic frame descriptions.
+
+Each description is made of words from its topic's vocabulary, and its
+vector lies near the topic's centroid, so vector search finds the right
+topic but can't tell its frames apart. One frame in `--targets-every` also
+shows a unique word (on-screen text, a name): queries for those words
+measure how often the frame comes back in the top k. Broad queries of
+common words measure the cost of long posting lists against the budget.
+
+    python -m benchmarks.bench_hybrid_search --size 100000 --queries 200
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from backend.vector_db import LocalVectorDB
+
+
+def pseudo_words(rng, count: int):
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    return ["".join(rng.choice(letters, rng.integers(4, 9))) for _ in range(count)]
+
+
+def synthetic_corpus(rng, size: int, dimension: int, topics: int, targets_every: int):
+    vocabularies = [pseudo_words(rng, 30) for _ in range(topics)]
+    centers = rng.standard_normal((topics, dimension)).astype(np.float32)
+    labels = rng.integers(0, topics, size)
+    descriptions, targets = [], {}
+    for i, label in enumerate(labels):
+        words = list(rng.choice(vocabularies[label], 12))
+        if i % targets_every == 0:
+            token = f"zq{i}x"
+            words.insert(int(rng.integers(0, len(words))), token)
+            targets[token] = i
+        descriptions.append("The frame shows " + " ".join(words) + ".")
+    return labels, centers, descriptions, targets, vocabularies
+
+
+def metadata(start: int, descriptions):
+    return [{
+        "description": description,
+        "frame_number": start + offset,
+        "frame_path": f"frames/bench_frame_{start + offset}.jpg",
+        "task_id": "bench",
+        "timestamp": (start + offset) * 2.0,
+        "video_path": f"videos/bench_{(start + offset) // 1000}.mp4"
+    } for offset, description in enumerate(descriptions)]
+
+
+def percentiles(latencies):
+    latencies_ms = sorted(seconds * 1000 for seconds in latencies)
+    return statistics.median(latencies_ms), latencies_ms[int(len(latencies_ms) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--targets-every", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    labels, centers, descriptions, targets, vocabularies = synthetic_corpus(
+        rng, args.size, args.dimension, args.topics, args.targets_every
+    )
+
+    with tempfile.TemporaryDirectory() as path:
+        vector_db = LocalVectorDB(dimension=args.dimension, index_path=path, background_checkpoints=False)
+        start = time.perf_counter()
+        for offset in range(0, args.size, 1000):
+            batch = slice(offset, min(offset + 1000, args.size))
+            vectors = centers[labels[batch]] + rng.standard_normal((len(labels[batch]), args.dimension)).astype(np.float32)
+            vector_db.add_vectors(vectors, metadata(offset, descriptions[batch]))
+        ingest = time.perf_counter() - start
+        print(f"{args.size} descriptions ingested in batches of 1000 in {ingest:.1f}s "
+              f"({args.size / ingest:.0f}/s, vectors + metadata + text index)")
+
+        tokens = list(targets)
+        chosen = rng.choice(len(tokens), min(args.queries, len(tokens)), replace=False)
+        budget = args.budget_ms / 1000
+        rare = []
+        for index in chosen:
+            token = tokens[index]
+            frame_id = targets[token]
+            # The embedding only knows the topic, the unique word is left to the text search
+            query_vector = centers[labels[frame_id]] + rng.standard_normal(args.dimension).astype(np.float32)
+            rare.append((f"sign reading {token}", query_vector, frame_id))
+        broad = []
+        for label in rng.integers(0, args.topics, args.queries):
+            words = " ".join(rng.choice(vocabularies[label], 3))
+            broad.append((f"the frame shows {words}", centers[label], None))
+
+        print(f"k={args.k}, text search budget {args.budget_ms:.0f}ms")
+        for name, queries in (("rare terms", rare), ("broad", broad)):
+            for mode in ("vector", "hybrid"):
+                latencies, found = [], 0
+                for text, query_vector, frame_id in queries:
+                    start = time.perf_counter()
+                    if mode == "vector":
+                        results = vector_db.search(query_vector, args.k)
+                    else:
+                        results = vector_db.hybrid_search(query_vector, text, args.k, budget=budget)
+                    latencies.append(time.perf_counter() - start)
+                    found += any(result["frame_number"] == frame_id for result in results)
+                p50, p95 = percentiles(latencies)
+                recall = f", target in top {args.k}: {found / len(queries):.1%}" if name == "rare terms" else ""
+                print(f"{name:>10} {mode:>6}: p50 {p50:6.2f}ms, p95 {p95:6.2f}ms{recall}")
+        vector_db.close()
+
+
+if __name__ == "__main__":
+    main()
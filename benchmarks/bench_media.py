@@ -0,0 +1,89 @@
+"""Time to first byte and seek latency of video serving over HTTP.
+
+A synthetic video is served by uvicorn through Starlette's StaticFiles (the
+previous mounts) and through MediaFiles at several chunk sizes. Each
+configuration is measured for a full download and for random 1 MiB Range
+requests, which is what a player issues when the user seeks.
+
+    python -m benchmarks.bench_media --chunk-sizes 65536 262144 1048576
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import aiohttp
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+
+from backend.media import MediaFiles
+from benchmarks.synthetic import make_test_video
+
+
+def start_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def fetch(session: aiohttp.ClientSession, url: str, headers=None):
+    start = time.perf_counter()
+    async with session.get(url, headers=headers) as response:
+        first_byte = None
+        size = 0
+        async for chunk in response.content.iter_any():
+            first_byte = first_byte or time.perf_counter() - start
+            size += len(chunk)
+    return first_byte * 1000, (time.perf_counter() - start) * 1000, size
+
+
+async def measure(base_url: str, file_size: int, seeks: int):
+    rng = np.random.default_rng(0)
+    async with aiohttp.ClientSession() as session:
+        await fetch(session, f"{base_url}/video.mp4")  # warm the page cache
+        full = [await fetch(session, f"{base_url}/video.mp4") for _ in range(3)]
+        ranges = []
+        for offset in rng.integers(0, file_size - (1 << 20), seeks):
+            headers = {"Range": f"bytes={offset}-{offset + (1 << 20) - 1}"}
+            ranges.append(await fetch(session, f"{base_url}/video.mp4", headers))
+    return np.mean(full, axis=0), np.mean(ranges, axis=0), np.percentile([r[0] for r in ranges], 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=120.0, help="Length of the generated video")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[64 * 1024, 256 * 1024, 1024 * 1024])
+    parser.add_argument("--seeks", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_media_")
+    video_path = make_test_video(os.path.join(directory, "video.mp4"), duration=args.duration)
+    file_size = os.path.getsize(video_path)
+    print(f"Serving a {file_size / 1024 ** 2:.0f} MiB video")
+
+    app = FastAPI()
+    app.mount("/static", StaticFiles(directory=directory), name="static")
+    for chunk_size in args.chunk_sizes:
+        app.mount(f"/media_{chunk_size}", MediaFiles(directory, chunk_size=chunk_size))
+    server = start_server(app, args.port)
+
+    configurations = [("StaticFiles", "static")] + [(f"MediaFiles {size // 1024} KiB", f"media_{size}") for size in args.chunk_sizes]
+    try:
+        for name, prefix in configurations:
+            full, ranges, p95 = asyncio.run(measure(f"http://127.0.0.1:{args.port}/{prefix}", file_size, args.seeks))
+            print(f"{name:>20} | full file: first byte {full[0]:6.2f} ms, {full[1]:7.1f} ms"
+                  f" ({file_size / 1024 ** 2 / full[1] * 1000:6.0f} MiB/s)"
+                  f" | 1 MiB seek: first byte {ranges[0]:5.2f} ms (p95 {p95:5.2f}), complete {ranges[1]:5.2f} ms")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
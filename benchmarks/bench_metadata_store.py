@@ -0,0 +1,81 @@
+"""Resident memory and lookup cost of the SQLite MetadataStore versus metadata.json.
+
+Each measurement runs in a fresh interpreter and reports the resident memory
+(Linux /proc) held once the metadata is loaded.
+
+    python -m benchmarks.bench_metadata_store --sizes 100000 1000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from backend.metadata_store import MetadataStore
+from benchmarks.bench_vector_db import synthetic_metadata
+
+MEASURE = """
+import json, sys, time
+import numpy as np
+from backend.metadata_store import MetadataStore
+def rss_kb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS"))
+baseline = rss_kb()
+start = time.perf_counter()
+if sys.argv[1] == "json":
+    with open(sys.argv[2]) as f:
+        metadata = json.load(f)
+    lookup = lambda ids: [metadata[i].copy() for i in ids]
+else:
+    metadata = MetadataStore(sys.argv[2])
+    lookup = metadata.get
+load_ms = (time.perf_counter() - start) * 1000
+ids = np.random.default_rng(0).integers(0, len(metadata), size=(200, 5)).tolist()
+start = time.perf_counter()
+for batch in ids:
+    lookup(batch)
+lookup_ms = (time.perf_counter() - start) * 1000 / len(ids)
+rss_mb = (rss_kb() - baseline) / 1024
+print(json.dumps({"load_ms": load_ms, "lookup_ms": lookup_ms, "rss_mb": rss_mb}))
+"""
+
+
+def measure(kind: str, path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE, kind, path],
+        check=True, capture_output=True, text=True, cwd=os.getcwd()
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as path:
+            json_path = os.path.join(path, "metadata.json")
+            db_path = os.path.join(path, "metadata.db")
+            store = MetadataStore(db_path)
+            with open(json_path, "w") as f:
+                f.write("[")
+                for start in range(0, size, 100000):
+                    chunk = synthetic_metadata(start, min(100000, size - start))
+                    store.append(chunk)
+                    f.write(("," if start else "") + json.dumps(chunk)[1:-1])
+                f.write("]")
+            store.close()
+
+            legacy = measure("json", json_path)
+            compact = measure("sqlite", db_path)
+            print(f"{size:>9} frames | RSS: {legacy['rss_mb']:7.0f} MB json -> {compact['rss_mb']:6.0f} MB sqlite"
+                  f" | load: {legacy['load_ms']:7.0f} ms -> {compact['load_ms']:6.0f} ms"
+                  f" | top-5 lookup: {legacy['lookup_ms']:.3f} ms -> {compact['lookup_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Decode throughput of one long video as the decode pool grows.
+
+Every configuration decodes, samples and JPEG-encodes the whole synthetic
+video; 1 process is the in-thread path `process_video` takes without a
+pool. The sampled frames of every configuration are checked against it.
+
+    python -m benchmarks.bench_parallel_decode --duration 600 --processes 1 2 4 8 16 32
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from backend.decode_pool import close_decode_pools, get_decode_pool, parallel_samples, prepare_samples
+from backend.frame_sampler import sample_frames
+from benchmarks.synthetic import make_test_video
+
+
+def decode(video_path: str, interval: float, processes: int, range_seconds: float):
+    if processes == 1:
+        samples = prepare_samples(sample_frames(video_path, interval))
+    else:
+        samples = parallel_samples(video_path, interval, processes, range_seconds)
+    return [(frame_number, frame_hash) for frame_number, _, _, _, frame_hash in samples]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=600.0, help="Length of the synthetic video in seconds")
+    parser.add_argument("--interval", type=float, default=2.0, help="Sampling interval in seconds")
+    parser.add_argument("--range-seconds", type=float, default=60.0, help="Length of a decode range")
+    parser.add_argument("--processes", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--video", help="Benchmark an existing file instead of a synthetic one")
+    args = parser.parse_args()
+
+    video_path = args.video or make_test_video(
+        os.path.join(tempfile.gettempdir(), f"bench_parallel_decode_{int(args.duration)}s.mp4"),
+        duration=args.duration
+    )
+    print(f"{os.cpu_count()} CPUs")
+
+    baseline = None
+    try:
+        for processes in args.processes:
+            if processes > 1:
+                # Start the pool outside the timing, like the long-lived pool of the server
+                pool = get_decode_pool(processes)
+                list(pool.map(abs, range(processes)))
+            start = time.perf_counter()
+            samples = decode(video_path, args.interval, processes, args.range_seconds)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = (samples, elapsed)
+            same = "same samples" if samples == baseline[0] else "SAMPLES DIFFER"
+            print(f"{processes:>3} processes: {len(samples)} samples in {elapsed:6.2f}s"
+                  f" ({len(samples) / elapsed:6.1f} samples/sec, {baseline[1] / elapsed:4.1f}x) | {same}")
+    finally:
+        close_decode_pools()
+
+
+if __name__ == "__main__":
+    main()
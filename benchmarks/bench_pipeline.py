@@ -0,0 +1,66 @@
+"""Run process_video end to end in local mode against the stub Ollama server.
+
+    python -m benchmarks.bench_pipeline --caption-latency 0.5 --caption-concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.stub_backend import start_stub_backend
+from benchmarks.synthetic import make_test_video
+
+
+async def run(args):
+    video_path = make_test_video(
+        os.path.join(tempfile.gettempdir(), f"bench_pipeline_{int(args.duration)}s.mp4"),
+        duration=args.duration
+    )
+    runner, url, stub = await start_stub_backend(
+        caption_latency=args.caption_latency,
+        embed_latency=args.embed_latency
+    )
+    from backend import dedup, inference_cache, video_processing
+    from backend.vector_db import close_vector_dbs
+
+    video_processing.OLLAMA_URL = url
+    # Caption every sample so the numbers reflect pipeline throughput
+    video_processing.DUPLICATE_THRESHOLD = 0.0
+    # Every run processes the same video, which must not hit the frame dedup index or the inference cache
+    dedup.FRAME_DEDUP_SIZE = 0
+    inference_cache.INFERENCE_CACHE_MAX_BYTES = 0
+    cwd = os.getcwd()
+    try:
+        for concurrency in args.caption_concurrency:
+            with tempfile.TemporaryDirectory() as workdir:
+                os.chdir(workdir)
+                os.makedirs("frames")
+                stub["stats"].update(generate=0, max_in_flight=0)
+                start = time.perf_counter()
+                await video_processing.process_video(
+                    "bench", os.path.abspath(video_path), None, {}, is_local=True,
+                    caption_concurrency=concurrency
+                )
+                elapsed = time.perf_counter() - start
+                # Each run starts from an empty store, written inside its own working directory
+                close_vector_dbs()
+                frames = stub["stats"]["generate"]
+                print(f"caption concurrency {concurrency:>2}: {frames} frames in {elapsed:.2f}s "
+                      f"({frames / elapsed:.2f} frames/sec, peak {stub['stats']['max_in_flight']} requests in flight)")
+    finally:
+        os.chdir(cwd)
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--caption-latency", type=float, default=0.5)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--caption-concurrency", type=int, nargs="+", default=[1, 4, 8])
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
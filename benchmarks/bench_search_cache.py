@@ -0,0 +1,86 @@
+"""Latency of search_video_sequences on a cache miss, on a hit, and right after new vectors invalidate it.
+
+Searches run in local mode against the stub Ollama server (query
+embeddings) and a LocalVectorDB of synthetic vectors in a temporary
+directory.
+
+    python -m benchmarks.bench_search_cache --size 100000 --queries 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_vector_db import synthetic_metadata
+from benchmarks.stub_backend import start_stub_backend
+
+
+async def timed_searches(search, queries, k: int):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        response = await search(query, is_local=True, k=k)
+        latencies.append(time.perf_counter() - start)
+        assert response["status"] == "success", response
+    return latencies
+
+
+def report(label: str, latencies):
+    latencies_us = sorted(seconds * 1e6 for seconds in latencies)
+    p95 = latencies_us[int(len(latencies_us) * 0.95) - 1]
+    print(f"{label:>12}: median {statistics.median(latencies_us):10.1f} µs, p95 {p95:10.1f} µs")
+
+
+async def run(args):
+    runner, url, _ = await start_stub_backend(embed_latency=args.embed_latency, dimension=args.dimension)
+    from backend import video_processing
+    from backend.search_cache import get_search_cache
+    from backend.sequence_finder import search_video_sequences
+    from backend.vector_db import close_vector_dbs, get_vector_db
+
+    video_processing.OLLAMA_URL = url
+    queries = [f"a person walking a dog number {i}" for i in range(args.queries)]
+    rng = np.random.default_rng(0)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            vector_db = get_vector_db(dimension=args.dimension)
+            for start in range(0, args.size, 10000):
+                count = min(10000, args.size - start)
+                vector_db.add_vectors(rng.standard_normal((count, args.dimension)).astype(np.float32).tolist(),
+                                      synthetic_metadata(start, count))
+            print(f"{vector_db.index.ntotal} vectors, {args.dimension}-d, k={args.k}, {args.queries} queries")
+
+            report("miss", await timed_searches(search_video_sequences, queries, args.k))
+            report("hit", await timed_searches(search_video_sequences, queries, args.k))
+            # Differently written queries normalise to the same entries
+            report("hit (case)", await timed_searches(search_video_sequences, [f"  {q.upper()} " for q in queries], args.k))
+
+            vector_db.add_vectors(rng.standard_normal((1, args.dimension)).astype(np.float32).tolist(),
+                                  synthetic_metadata(args.size, 1))
+            # Embeddings stay cached, results are searched again
+            report("invalidated", await timed_searches(search_video_sequences, queries, args.k))
+            print(get_search_cache().metrics())
+            close_vector_dbs()
+    finally:
+        os.chdir(cwd)
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Time to group search hits into sequences: the NumPy engine against the previous per-frame Python loop.
+
+Hits are spread over `--videos` videos, clustered around a few moments per
+video like the results of a real query. Both implementations must return
+the same sequences (with SEQUENCE_MIN_FRAMES=2, the previous behaviour).
+
+    python -m benchmarks.bench_sequence_grouping --hits 10000
+"""
+import argparse
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from backend.sequence_finder import format_timestamp, group_frames_into_sequences
+from backend.sequence_grouping import find_sequences
+
+
+def previous_create_sequence(frames, video_path):
+    start_time = frames[0]['timestamp']
+    end_time = frames[-1]['timestamp']
+    return [{
+        'video_path': video_path,
+        'frame_start': frames[0]['frame'],
+        'frame_end': frames[-1]['frame'],
+        'time_start': start_time,
+        'time_end': end_time,
+        'time_start_formatted': format_timestamp(start_time),
+        'time_end_formatted': format_timestamp(end_time),
+        'duration': end_time - start_time,
+        'frames': frames,
+        'frame_paths': [f['frame_path'] for f in frames],
+        'score': sum(f['score'] for f in frames) / len(frames),
+        'description': frames[0]['metadata']['description']
+    }]
+
+
+def previous_group_frames_into_sequences(matches):
+    """`group_frames_into_sequences` before the NumPy engine, for comparison"""
+    video_groups = defaultdict(list)
+    for match in matches:
+        video_groups[match['video_path']].append({
+            'frame': match['frame_number'],
+            'frame_path': match['frame_path'],
+            'timestamp': match['timestamp'],
+            'metadata': match,
+            'score': float(match['score']),
+            'id': str(match['frame_number'])
+        })
+    sequences = []
+    for video_path, frames in video_groups.items():
+        frames.sort(key=lambda x: x['frame'])
+        current_sequence = [frames[0]]
+        for i in range(1, len(frames)):
+            if frames[i]['frame'] <= current_sequence[-1]['frame'] + 2:
+                current_sequence.append(frames[i])
+            else:
+                if len(current_sequence) > 1:
+                    sequences.extend(previous_create_sequence(current_sequence, video_path))
+                current_sequence = [frames[i]]
+        if len(current_sequence) > 1:
+            sequences.extend(previous_create_sequence(current_sequence, video_path))
+    sequences.sort(key=lambda x: x['score'], reverse=True)
+    return sequences
+
+
+def synthetic_hits(rng, count: int, videos: int, moments: int):
+    centers = rng.integers(0, 3600, (videos, moments))
+    drawn = count * 4
+    video = rng.integers(0, videos, drawn)
+    frame = np.maximum(centers[video, rng.integers(0, moments, drawn)] + rng.normal(0, 12, drawn).astype(int), 0)
+    # One hit per frame, as a single search returns, in random order
+    _, unique = np.unique(video * 10000 + frame, return_index=True)
+    unique = rng.permutation(unique)[:count]
+    return [{
+        "description": f"Frame {f} of video {v}",
+        "frame_number": int(f),
+        "frame_path": f"frames/task_{v}_frame_{f}.jpg",
+        "task_id": f"task_{v}",
+        "timestamp": float(f) * 2.0,
+        "video_path": f"videos/video_{v}.mp4",
+        "score": float(score),
+    } for v, f, score in zip(video[unique], frame[unique], rng.uniform(0.3, 0.9, drawn)[unique])]
+
+
+def best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hits", type=int, default=10000)
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--moments", type=int, default=8)
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    matches = synthetic_hits(np.random.default_rng(0), args.hits, args.videos, args.moments)
+    previous = previous_group_frames_into_sequences(matches)
+    current = group_frames_into_sequences(matches, min_frames=2)
+    summary = lambda sequences: sorted((s['video_path'], s['frame_start'], s['frame_end'], round(s['score'], 9)) for s in sequences)
+    same = "same sequences" if summary(previous) == summary(current) else "SEQUENCES DIFFER"
+    print(f"{len(matches)} hits in {args.videos} videos -> {len(current)} sequences | {same}")
+
+    video_ids = np.array([int(m['video_path'].split('_')[1].split('.')[0]) for m in matches])
+    frames = np.array([m['frame_number'] for m in matches])
+    scores = np.array([m['score'] for m in matches])
+    timings = {
+        "previous (Python loop)": lambda: previous_group_frames_into_sequences(matches),
+        "group_frames_into_sequences": lambda: group_frames_into_sequences(matches, min_frames=2),
+        f"  top {args.top_n} sequences": lambda: group_frames_into_sequences(matches, min_frames=2, top_n=args.top_n),
+        "find_sequences (arrays only)": lambda: find_sequences(video_ids, frames, frames, scores, min_frames=2),
+    }
+    for name, function in timings.items():
+        print(f"{name:>30}: {best_of(function, args.repeat) * 1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
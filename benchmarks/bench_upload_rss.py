@@ -0,0 +1,164 @@
+"""Peak server memory while receiving large video uploads.
+
+Every scenario runs a fresh uvicorn server in a child process, uploads a
+generated file of each size and reads the server's peak RSS (VmHWM) from
+/proc. The servers wire the same upload helpers as backend/main.py, without
+the Pinecone and model setup:
+
+- legacy:     multipart upload read with `await file.read()` (previous code)
+- streaming:  multipart upload copied with `save_upload`
+- resumable:  init / PUT parts / complete through `UploadSessions`
+
+The run fails (exit status 1) when the peak RSS of a streaming or resumable
+server grows by more than `--max-growth` MiB over idle, whatever the upload
+size: a regression check for code paths that buffer whole uploads again.
+
+    python -m benchmarks.bench_upload_rss --sizes 256 1024
+    python -m benchmarks.bench_upload_rss --sizes 1024 --scenarios streaming resumable --max-growth 64
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+SCENARIOS = ("legacy", "streaming", "resumable")
+BLOCK = os.urandom(1024 * 1024)
+
+
+def serve(scenario: str, port: int) -> None:
+    import uvicorn
+    from fastapi import FastAPI, File, Request, UploadFile, Body
+    from backend.uploads import UploadSessions, save_upload
+
+    app = FastAPI()
+    sessions = UploadSessions("sessions")
+
+    @app.post("/api/upload")
+    async def upload(file: UploadFile = File(...)):
+        if scenario == "legacy":
+            with open(file.filename, "wb") as f:
+                f.write(await file.read())
+            return {}
+        return await save_upload(file, file.filename)
+
+    @app.post("/api/uploads")
+    async def init_upload(filename: str = Body(...), size: int = Body(...)):
+        return sessions.create(filename, size)
+
+    @app.put("/api/uploads/{upload_id}/parts/{index}")
+    async def upload_part(upload_id: str, index: int, request: Request):
+        return await sessions.write_part(upload_id, index, request.stream())
+
+    @app.post("/api/uploads/{upload_id}/complete")
+    async def complete(upload_id: str, sha256: str = Body(None, embed=True)):
+        return await sessions.complete(upload_id, "upload.mp4", sha256)
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def memory_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field))
+
+
+async def generate(size: int):
+    for _ in range(size // len(BLOCK)):
+        yield BLOCK
+
+
+async def upload(scenario: str, base_url: str, size: int, concurrency: int) -> None:
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        if scenario != "resumable":
+            form = aiohttp.FormData()
+            form.add_field("file", generate(size), filename="upload.mp4", content_type="video/mp4")
+            async with session.post(f"{base_url}/api/upload", data=form) as response:
+                response.raise_for_status()
+            return
+
+        async with session.post(f"{base_url}/api/uploads", json={"filename": "upload.mp4", "size": size}) as response:
+            layout = await response.json()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send_part(index: int):
+            part_size = min(layout["part_size"], size - index * layout["part_size"])
+            async with semaphore:
+                url = f"{base_url}/api/uploads/{layout['upload_id']}/parts/{index}"
+                async with session.put(url, data=BLOCK * (part_size // len(BLOCK))) as response:
+                    response.raise_for_status()
+
+        await asyncio.gather(*[send_part(i) for i in range(layout["parts"])])
+        digest = hashlib.sha256()
+        for _ in range(size // len(BLOCK)):
+            digest.update(BLOCK)
+        url = f"{base_url}/api/uploads/{layout['upload_id']}/complete"
+        async with session.post(url, json={"sha256": digest.hexdigest()}) as response:
+            response.raise_for_status()
+
+
+def run(scenario: str, size_mb: int, concurrency: int) -> float:
+    """Upload once to a fresh server and return its peak RSS growth over idle, in MiB"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {**os.environ, "PYTHONPATH": os.getcwd()}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_upload_rss", "--serve", scenario, "--port", str(port)],
+            cwd=workdir, env=env
+        )
+        try:
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            idle = memory_kb(server.pid, "VmRSS")
+            start = time.perf_counter()
+            asyncio.run(upload(scenario, f"http://127.0.0.1:{port}", size_mb * 1024 * 1024, concurrency))
+            elapsed = time.perf_counter() - start
+            peak = memory_kb(server.pid, "VmHWM")
+            print(f"{scenario:>10} | {size_mb:>6} MiB upload | server RSS idle {idle / 1024:6.0f} MiB,"
+                  f" peak {peak / 1024:6.0f} MiB (+{(peak - idle) / 1024:5.0f}) | {size_mb / elapsed:6.0f} MiB/s")
+            return (peak - idle) / 1024
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 1024], help="Upload sizes in MiB")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=4, help="Parts in flight for resumable uploads")
+    parser.add_argument("--max-growth", type=float, default=64,
+                        help="Peak RSS growth in MiB above which a streaming or resumable upload fails the run")
+    parser.add_argument("--serve", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.port)
+    failures = []
+    for size in args.sizes:
+        for scenario in args.scenarios:
+            growth = run(scenario, size, args.concurrency)
+            # The legacy server buffers whole uploads by design: it is only there for comparison
+            if scenario != "legacy" and growth > args.max_growth:
+                failures.append(f"{scenario} {size} MiB upload grew the server RSS by {growth:.0f} MiB")
+    for failure in failures:
+        print(f"🔴 {failure}, more than --max-growth {args.max_growth:g} MiB")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
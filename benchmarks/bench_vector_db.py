@@ -0,0 +1,108 @@
+"""Query latency and ingest cost of LocalVectorDB versus the old reload/rewrite approach.
+
+The old code built a new LocalVectorDB (reading faiss.index and metadata.json)
+for every search and rewrote both files on every add_vectors call.
+
+    python -m benchmarks.bench_vector_db --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from backend import vector_db as vector_db_module
+from backend.vector_db import LocalVectorDB
+
+
+def synthetic_metadata(start: int, count: int):
+    return [{
+        "description": f"Frame {i} shows a synthetic scene. " * 12,
+        "frame_number": i,
+        "frame_path": f"frames/bench_frame_{i}.jpg",
+        "task_id": "bench",
+        "timestamp": i * 2.0,
+        "video_path": f"videos/bench_{i // 1000}.mp4"
+    } for i in range(start, start + count)]
+
+
+def build_store(path: str, size: int, dimension: int, rng) -> None:
+    """Write an index of `size` random vectors in the checkpoint format."""
+    index = faiss.IndexFlatL2(dimension)
+    for start in range(0, size, 100000):
+        count = min(100000, size - start)
+        index.add(rng.random((count, dimension), dtype=np.float32))
+    faiss.write_index(index, os.path.join(path, "faiss.index"))
+    with open(os.path.join(path, "metadata.json"), "w") as f:
+        json.dump(synthetic_metadata(0, size), f)
+
+
+def legacy_search(path: str, query) -> None:
+    index = faiss.read_index(os.path.join(path, "faiss.index"))
+    with open(os.path.join(path, "metadata.json")) as f:
+        metadata = json.load(f)
+    _, indices = index.search(query, 5)
+    [metadata[i].copy() for i in indices[0]]
+
+
+def legacy_add(path: str, vectors, metadata_list) -> None:
+    index = faiss.read_index(os.path.join(path, "faiss.index"))
+    with open(os.path.join(path, "metadata.json")) as f:
+        metadata = json.load(f)
+    index.add(vectors)
+    metadata.extend(metadata_list)
+    faiss.write_index(index, os.path.join(path, "faiss.index"))
+    with open(os.path.join(path, "metadata.json"), "w") as f:
+        json.dump(metadata, f)
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--batch", type=int, default=32, help="Vectors per add_vectors call")
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    # Keep checkpoints out of the measured adds
+    vector_db_module.VECTOR_DB_CHECKPOINT_VECTORS = 1 << 62
+    vector_db_module.VECTOR_DB_CHECKPOINT_INTERVAL = 3600
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as path:
+            build_store(path, size, args.dimension, rng)
+            query = rng.random((1, args.dimension), dtype=np.float32)
+            batch = rng.random((args.batch, args.dimension), dtype=np.float32)
+            batch_metadata = synthetic_metadata(size, args.batch)
+            legacy_repeat = 3 if size < 1000000 else 1
+
+            legacy_query_ms = timed(lambda: legacy_search(path, query), legacy_repeat)
+            legacy_add_ms = timed(lambda: legacy_add(path, batch, batch_metadata), legacy_repeat)
+
+            start = time.perf_counter()
+            store = LocalVectorDB(dimension=args.dimension, index_path=path)
+            open_ms = (time.perf_counter() - start) * 1000
+            query_ms = timed(lambda: store.search(query[0].tolist(), 5), args.queries)
+            add_ms = timed(lambda: store.add_vectors(batch, batch_metadata), args.queries)
+            start = time.perf_counter()
+            store.close()
+            checkpoint_ms = (time.perf_counter() - start) * 1000
+
+            print(f"{size:>9} vectors | query: {legacy_query_ms:9.1f} ms reload -> {query_ms:7.2f} ms shared handle"
+                  f" | add {args.batch}: {legacy_add_ms:9.1f} ms rewrite -> {add_ms:7.2f} ms append"
+                  f" | open + metadata.json import {open_ms:.0f} ms, background checkpoint {checkpoint_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
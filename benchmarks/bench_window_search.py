@@ -0,0 +1,115 @@
+"""How many hits a search needs to retrieve to find a multi-frame event, with frame hits alone and with window hits.
+
+Each query has one event: `--event-frames` consecutive frames that each
+match it only weakly, hidden among `--distractors` isolated frames that
+match it a bit better. A window vector is the normalised mean of the
+vectors of its frames, standing in for the embedding of their joined
+descriptions. A query finds its event when one of the `--top` best
+sequences overlaps it.
+
+    python -m benchmarks.bench_window_search --size 100000 --queries 50
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from backend.frame_windows import WindowBuilder
+from backend.sequence_finder import group_frames_into_sequences
+from backend.vector_db import LocalVectorDB
+
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def with_similarity(rng, query: np.ndarray, similarity: float, count: int) -> np.ndarray:
+    """Unit vectors with about `similarity` cosine to `query`"""
+    noise = normalized(rng.standard_normal((count, len(query))).astype(np.float32))
+    return normalized(similarity * query + np.sqrt(1 - similarity ** 2) * noise)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--videos", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--event-frames", type=int, default=4)
+    parser.add_argument("--event-similarity", type=float, default=0.3)
+    parser.add_argument("--distractors", type=int, default=100)
+    parser.add_argument("--distractor-similarity", type=float, default=0.35)
+    parser.add_argument("--window-frames", type=int, default=4)
+    parser.add_argument("--window-stride", type=int, default=2)
+    parser.add_argument("--top", type=int, default=3)
+    parser.add_argument("--ks", type=int, nargs="+", default=[5, 20, 100, 200, 400])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    per_video = args.size // args.videos
+    vectors = normalized(rng.standard_normal((args.size, args.dimension)).astype(np.float32))
+    queries = normalized(rng.standard_normal((args.queries, args.dimension)).astype(np.float32))
+    # Plant each query's event and distractors on frames no other query uses
+    free = rng.permutation(args.size // args.event_frames) * args.event_frames
+    events = []
+    for query, slot in zip(queries, free[:args.queries]):
+        events.append(slot)
+        vectors[slot:slot + args.event_frames] = with_similarity(rng, query, args.event_similarity, args.event_frames)
+    for q, query in enumerate(queries):
+        start = args.queries + q * args.distractors
+        slots = free[start:start + args.distractors] + 1
+        vectors[slots] = with_similarity(rng, query, args.distractor_similarity, len(slots))
+
+    metadata = [{
+        "description": f"Frame {i % per_video}",
+        "frame_number": i % per_video,
+        "frame_path": f"frames/task_{i // per_video}_frame_{i % per_video}.jpg",
+        "task_id": f"task_{i // per_video}",
+        "timestamp": (i % per_video) * 2.0,
+        "video_path": f"videos/video_{i // per_video}.mp4"
+    } for i in range(args.size)]
+    window_vectors, window_metadata = [], []
+    for video in range(args.videos):
+        builder = WindowBuilder(args.window_frames, args.window_stride)
+        for i in range(video * per_video, (video + 1) * per_video):
+            for window in builder.add(metadata[i]):
+                first = video * per_video + window["frame_number"]
+                window_vectors.append(normalized(vectors[first:first + args.window_frames].mean(axis=0)))
+                window_metadata.append(window)
+    print(f"{args.size} frames, {len(window_metadata)} windows of {args.window_frames} frames, {args.queries} queries")
+
+    with tempfile.TemporaryDirectory() as frame_path, tempfile.TemporaryDirectory() as window_path:
+        frames_db = LocalVectorDB(dimension=args.dimension, index_path=frame_path, background_checkpoints=False)
+        windows_db = LocalVectorDB(dimension=args.dimension, index_path=window_path, background_checkpoints=False)
+        for start in range(0, args.size, 10000):
+            frames_db.add_vectors(vectors[start:start + 10000], metadata[start:start + 10000])
+        for start in range(0, len(window_metadata), 10000):
+            windows_db.add_vectors(np.array(window_vectors[start:start + 10000]), window_metadata[start:start + 10000])
+
+        for mode in ("frames", "frames + windows"):
+            for k in args.ks:
+                latencies, found, hits = [], 0, 0
+                for query, event in zip(queries, events):
+                    start = time.perf_counter()
+                    results = frames_db.search(query, k)
+                    if mode != "frames":
+                        results += windows_db.search(query, k)
+                    sequences = group_frames_into_sequences(results)
+                    latencies.append(time.perf_counter() - start)
+                    hits += len(results)
+                    video, frame = divmod(int(event), per_video)
+                    found += any(
+                        sequence["video_path"] == f"videos/video_{video}.mp4"
+                        and sequence["frame_start"] < frame + args.event_frames and sequence["frame_end"] >= frame
+                        for sequence in sequences[:args.top]
+                    )
+                print(f"{mode:>16} k={k:<4}: {hits / len(queries):6.1f} hits, event in top {args.top} "
+                      f"sequences {found / len(queries):6.1%}, p50 {statistics.median(latencies) * 1000:6.2f}ms")
+        frames_db.close()
+        windows_db.close()
+
+
+if __name__ == "__main__":
+    main()
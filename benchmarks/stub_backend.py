@@ -0,0 +1,139 @@
+"""Local stand-in for the Ollama and Groq HTTP APIs with injected latency.
+
+Run standalone and point the backend at it:
+    python -m benchmarks.stub_backend --port 11500 --caption-latency 1.0
+    OLLAMA_URL=http://localhost:11500 GROQ_BASE_URL=http://localhost:11500 ...
+
+`--rate-limit-rate` and `--error-rate` make that fraction of the model
+calls fail with 429 (with a Retry-After header) or 503, to exercise the
+retry logic of backend/clients.py.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+
+import numpy as np
+from aiohttp import web
+
+
+def fake_embedding(text: str, dimension: int) -> list:
+    """Deterministic pseudo-embedding so identical texts get identical vectors."""
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimension).astype("float32").tolist()
+
+
+def create_stub_app(
+    caption_latency: float = 0.5,
+    embed_latency: float = 0.05,
+    dimension: int = 1024,
+    rate_limit_rate: float = 0.0,
+    error_rate: float = 0.0,
+    retry_after: float = 0.0
+) -> web.Application:
+    """Build the stub application. `app["stats"]` counts requests per endpoint."""
+    stats = {
+        "generate": 0, "embeddings": 0, "chat": 0, "in_flight": 0, "max_in_flight": 0,
+        "rate_limited": 0, "errors": 0
+    }
+    rng = random.Random(0)
+
+    async def delayed(kind: str, latency: float):
+        # Injected failures are answered at once, like a provider rejecting a request
+        draw = rng.random()
+        if draw < rate_limit_rate:
+            stats["rate_limited"] += 1
+            raise web.HTTPTooManyRequests(
+                headers={"Retry-After": str(retry_after)}, text='{"error": "rate limited"}', content_type="application/json"
+            )
+        if draw < rate_limit_rate + error_rate:
+            stats["errors"] += 1
+            raise web.HTTPServiceUnavailable(text='{"error": "unavailable"}', content_type="application/json")
+        stats[kind] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            stats["in_flight"] -= 1
+
+    async def version(request):
+        return web.json_response({"version": "stub"})
+
+    async def generate(request):
+        body = await request.json()
+        await delayed("generate", caption_latency)
+        image_hash = hashlib.sha256(body["images"][0].encode()).hexdigest()[:12]
+        return web.json_response({"response": f"A synthetic frame {image_hash}", "done": True})
+
+    async def embeddings(request):
+        body = await request.json()
+        await delayed("embeddings", embed_latency)
+        return web.json_response({"embedding": fake_embedding(body["prompt"], dimension)})
+
+    async def embed(request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await delayed("embeddings", embed_latency)
+        return web.json_response({"embeddings": [fake_embedding(t, dimension) for t in texts]})
+
+    async def chat(request):
+        await request.json()
+        await delayed("chat", caption_latency)
+        return web.json_response({
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "A synthetic frame"}
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        })
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app["stats"] = stats
+    app.router.add_get("/api/version", version)
+    app.router.add_post("/api/generate", generate)
+    app.router.add_post("/api/embeddings", embeddings)
+    app.router.add_post("/api/embed", embed)
+    app.router.add_post("/openai/v1/chat/completions", chat)
+    return app
+
+
+async def start_stub_backend(port: int = 0, **kwargs):
+    """Start the stub on localhost and return (runner, base_url, app)."""
+    app = create_stub_app(**kwargs)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--caption-latency", type=float, default=0.5)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of calls answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 503")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After of the 429 responses, in seconds")
+    args = parser.parse_args()
+    web.run_app(
+        create_stub_app(
+            args.caption_latency, args.embed_latency, args.dimension,
+            args.rate_limit_rate, args.error_rate, args.retry_after
+        ),
+        host="127.0.0.1",
+        port=args.port
+    )
+
+
+if __name__ == "__main__":
+    main()
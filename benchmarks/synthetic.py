@@ -0,0 +1,79 @@
+import os
+import subprocess
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from backend.clip_extractor import find_ffmpeg
+
+
+def make_test_video(
+    path: str,
+    duration: float = 60.0,
+    fps: int = 30,
+    width: int = 1280,
+    height: int = 720,
+    gop: int = 250
+) -> str:
+    """Generate a synthetic H.264 video (x264 defaults to long GOPs, like real footage).
+
+    Falls back to OpenCV's mp4v writer when no ffmpeg binary is available.
+    """
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    ffmpeg = find_ffmpeg()
+    if ffmpeg:
+        subprocess.run([
+            ffmpeg, "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-g", str(gop), "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-shortest", path
+        ], check=True)
+        return path
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for i in range(int(duration * fps)):
+        frame = background.copy()
+        x = (i * 7) % (width - 100)
+        cv2.rectangle(frame, (x, 100), (x + 100, 200), (0, 0, 255), -1)
+        cv2.putText(frame, str(i), (50, height - 50), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def make_cut_video(
+    path: str,
+    cut_times: List[float],
+    duration: float = 60.0,
+    fps: int = 25,
+    width: int = 640,
+    height: int = 360
+) -> str:
+    """Generate a video made of static shots separated by hard cuts at `cut_times`.
+
+    Each shot is a distinct random pattern with a little sensor noise, which
+    approximates talking-head or surveillance footage.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    rng = np.random.default_rng(0)
+    boundaries = [int(t * fps) for t in sorted(cut_times)]
+    shot = None
+    for i in range(int(duration * fps)):
+        if shot is None or i in boundaries:
+            shot = cv2.resize(
+                rng.integers(0, 255, (height // 20, width // 20, 3), dtype=np.uint8),
+                (width, height),
+                interpolation=cv2.INTER_NEAREST
+            )
+        noise = rng.integers(-3, 4, shot.shape, dtype=np.int16)
+        writer.write(np.clip(shot.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    writer.release()
+    return path
@@ -32,7 +32,14 @@ const AnalyzeModal = ({ isOpen, onClose, videoFile }) => {
           throw new Error('Upload failed');
         }
 
-        const { task_id } = await response.json();
+        const { task_id, duplicate, status } = await response.json();
+
+        // The same video was already analyzed, nothing to wait for
+        if (duplicate && status === 'done') {
+          setAnalyzeProgress(100);
+          setAnalyzeComplete(true);
+          return;
+        }
 
         // WebSocket connection
         const ws = new WebSocket(getWebSocketUrl(task_id));
@@ -7,6 +7,7 @@ from fastapi import FastAPI, HTTPException
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from backend.media import MediaFiles
 
 def load_env():
     parser = argparse.ArgumentParser(description='Run the local server with environment configuration')
@@ -48,6 +49,9 @@ app.add_middleware(
 from backend.main import app as backend_app
 for route in backend_app.routes:
     app.routes.append(route)
+# ...and its startup/shutdown handlers: the job workers, and closing the vector store, decode pools and clients
+app.router.on_startup.extend(backend_app.router.on_startup)
+app.router.on_shutdown.extend(backend_app.router.on_shutdown)
 
 # Explicit root handler
 @app.get("/")
@@ -67,9 +71,9 @@ async def debug_info():
 
 # Mount static files in correct order
 app.mount("/static", StaticFiles(directory="frontend/build/static"), name="static")
-app.mount("/frames", StaticFiles(directory="frames"), name="frames")
-app.mount("/videos", StaticFiles(directory="videos"), name="videos")
-app.mount("/video_sample_to_test", StaticFiles(directory="video_sample_to_test"), name="video_sample_to_test")
+app.mount("/frames", MediaFiles(directory="frames"), name="frames")
+app.mount("/videos", MediaFiles(directory="videos"), name="videos")
+app.mount("/video_sample_to_test", MediaFiles(directory="video_sample_to_test"), name="video_sample_to_test")
 # Mount the rest of the build directory for other assets
 app.mount("/", StaticFiles(directory="frontend/build"), name="frontend")
 